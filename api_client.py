@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Small client for api_server, for scripts and for trying the service.
+
+    python -m api_client "G1-12/1000/301-12-12/302-12-12" [...] [--antall 2] [--xlsx FIL]
+
+resolves the summary lines, prints the Visma lines of the order (TSV) and,
+with --xlsx, saves the output workbook.
+"""
+
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+
+from catalog_files import DEFAULT_PORT
+
+
+class ApiError(Exception):
+    """An error response from api_server."""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class ApiClient:
+    def __init__(self, base_url=f"http://127.0.0.1:{DEFAULT_PORT}", timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            request.add_header("Content-Type", "application/json")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                content_type = response.headers.get("Content-Type", "")
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            try:
+                message = json.loads(body)["error"]
+            except Exception:
+                message = body.decode("utf-8", "replace")
+            raise ApiError(e.code, message) from None
+        if content_type.startswith("application/json"):
+            return json.loads(body)
+        return body
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def resolve(self, lines, material=None, suggest=False):
+        """One result per summary line (Prod.no and Beskrivelse of the hose
+        and couplings, size, length, status, optionally suggestions)."""
+        return self._request(
+            "POST", "/resolve", {"lines": list(lines), "material": material, "suggest": suggest}
+        )["results"]
+
+    def order(self, rows, fmt="json", options=None, pressure_details=None):
+        """The order for batch rows (dicts with the batch template columns).
+        fmt "json" returns a dict; "xlsx", "tsv" and "csv" return bytes."""
+        return self._request("POST", "/order", {
+            "rows": list(rows),
+            "options": options or {},
+            "pressure_details": pressure_details or {},
+            "format": fmt,
+        })
+
+    def certificates(self, rows=None, text=None, pressure_details=None):
+        """Certificate workbook (xlsx bytes) for [Prod.no, Beskrivelse,
+        Antall] rows or pasted TSV text."""
+        payload = {"pressure_details": pressure_details or {}}
+        if text is not None:
+            payload["text"] = text
+        else:
+            payload["rows"] = [list(row) for row in rows]
+        return self._request("POST", "/certificates", payload)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m api_client", description=__doc__.split("\n\n")[0])
+    parser.add_argument("lines", nargs="+", help="slangebeskrivelser")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    parser.add_argument("--antall", default="1")
+    parser.add_argument("--lager", default="3")
+    parser.add_argument("--xlsx", help="lagre Output-arbeidsboken hit")
+    args = parser.parse_args(argv)
+
+    client = ApiClient(args.url)
+    try:
+        for result in client.resolve(args.lines, suggest=True):
+            print(f"{result['status']:12} {result['Slangebeskrivelse']}")
+            for label, found in result.get("suggestions", {}).items():
+                print(f"{'':12}   {label}: " + ", ".join(str(s["Prod.no"]) for s in found))
+
+        rows = [{"Slangebeskrivelse": line, "Antall": args.antall, "Lager": args.lager} for line in args.lines]
+        sys.stdout.write(client.order(rows, fmt="tsv").decode("utf-8"))
+        if args.xlsx:
+            with open(args.xlsx, "wb") as f:
+                f.write(client.order(rows, fmt="xlsx"))
+            print(f"Lagret {args.xlsx}")
+    except (ApiError, OSError) as e:
+        print(f"Feil: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
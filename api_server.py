@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+"""Local HTTP API over core, with the catalog kept in memory.
+
+    python -m api_server [--host 127.0.0.1] [--port 8765] [--threads 8]
+
+Uses only the standard library (http.server) on top of core. Requests are
+handled on a fixed thread pool; the catalog, its indexes and the parsed
+templates stay loaded between requests, and the catalog is reloaded when
+either catalog workbook changes on disk.
+
+    GET  /health         catalog version
+    POST /resolve        {"lines": [summary line, ...], "material": null | "stål" | "syrefast",
+                          "suggest": false}
+    POST /order          {"rows": [{"Slangebeskrivelse": ..., "Antall": ..., "POS.nr": ...,
+                                    "Kundes delnummer": ..., "Lager": ...}, ...],
+                          "options": {"trykktest", "prikling", "abs_cert", "dnv"},
+                          "pressure_details": {"kunde", "kundens_best_nr", "hydra_ordre_nr"},
+                          "format": "json" | "xlsx" | "tsv" | "csv"}
+    POST /certificates   {"rows": [[Prod.no, Beskrivelse, Antall], ...]} or {"text": pasted TSV},
+                         "pressure_details": {...}  -> xlsx
+
+/order builds the same lines as "Excel – flere slanger" and, for "xlsx", the
+same workbook. Errors come back as {"error": message} with status 400
+(the request is malformed, see BadRequest) or 500 (anything else). See
+api_client for a small client.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import math
+import numbers
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pandas as pd
+
+import core
+from catalog_files import CERT_TEMPLATE, DEFAULT_PORT, FIRST_FILE, SECOND_FILE, SLUTT_TEMPLATE, load_catalog
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+BATCH_COLUMNS = ["Slangebeskrivelse", "Antall", "POS.nr", "Kundes delnummer", "Lager"]
+ORDER_OPTIONS = ("trykktest", "prikling", "abs_cert", "dnv")
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class BadRequest(Exception):
+    """A request the client has to fix; answered with status 400. Any other
+    exception from a handler is a server error (500)."""
+
+
+class CatalogHolder:
+    """The resident catalog, reloaded when either workbook changes (the
+    same size/mtime check as load_catalog in the app)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._catalog = None
+
+    def get(self):
+        try:
+            stamp = tuple((os.stat(p).st_size, os.stat(p).st_mtime_ns) for p in (FIRST_FILE, SECOND_FILE))
+        except OSError:
+            stamp = None
+        with self._lock:
+            if self._catalog is None or stamp != self._stamp:
+                self._catalog = load_catalog()
+                self._stamp = stamp
+            return self._catalog
+
+
+def _plain(value):
+    """`value` with numpy/pandas scalars and NaN turned into JSON types."""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return None if math.isnan(value) else value
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(value)
+
+
+def _row_field(row, column):
+    return None if row is None else _plain(row.get(column))
+
+
+def _resolution_json(res):
+    record = {
+        column: _plain(res[column])
+        for column in core.RESOLUTION_COLUMNS
+        if not column.endswith("_row")
+    }
+    record["hose_beskrivelse"] = _row_field(res["hose_row"], "Beskrivelse")
+    record["coupling1_beskrivelse"] = _row_field(res["coupling1_row"], "Beskrivelse")
+    record["coupling2_beskrivelse"] = _row_field(res["coupling2_row"], "Beskrivelse")
+    return record
+
+
+def _batch_frame(rows):
+    if not isinstance(rows, list):
+        raise BadRequest('"rows" must be a list')
+    records = []
+    for row in rows:
+        if isinstance(row, dict):
+            records.append([row.get(c, "") for c in BATCH_COLUMNS])
+        elif isinstance(row, list):
+            records.append((row + [""] * len(BATCH_COLUMNS))[:len(BATCH_COLUMNS)])
+        elif row is None or isinstance(row, (str, int, float)):
+            records.append([row] + [""] * (len(BATCH_COLUMNS) - 1))
+        else:
+            raise BadRequest('each row must be an object, a list or a summary line')
+    return pd.DataFrame(records, columns=BATCH_COLUMNS, dtype=object)
+
+
+def _pressure_details(body):
+    details = body.get("pressure_details") or {}
+    if not isinstance(details, dict):
+        raise BadRequest('"pressure_details" must be an object')
+    return {key: str(details.get(key, "") or "") for key in ("kunde", "kundens_best_nr", "hydra_ordre_nr")}
+
+
+def _stamp():
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+# Route handlers: (holder, body) -> (status, content type, payload, filename)
+
+def handle_health(holder, body):
+    catalog = holder.get()
+    return 200, "application/json", {"status": "ok", "catalog_version": catalog.version}, None
+
+
+def handle_resolve(holder, body):
+    lines = body.get("lines")
+    if not isinstance(lines, list):
+        raise BadRequest('"lines" must be a list of summary lines')
+    material = body.get("material")
+    if material is not None and not isinstance(material, str):
+        raise BadRequest('"material" must be null or a string')
+    catalog = holder.get()
+    resolved = core.find_matches_for_many(
+        ["" if line is None else str(line) for line in lines], catalog, material_pref=material
+    )
+    results = []
+    for line, res in zip(lines, resolved.to_dict("records")):
+        record = _resolution_json(res)
+        if body.get("suggest") and res["status"] not in ("ok", "empty"):
+            record["suggestions"] = _plain(core.suggest_for_summary(
+                str(line), catalog, result=(res["hose_row"], res["coupling1_row"])
+            ))
+        results.append(record)
+    return 200, "application/json", {"results": results}, None
+
+
+def handle_order(holder, body):
+    options = body.get("options") or {}
+    if not isinstance(options, dict):
+        raise BadRequest('"options" must be an object')
+    unknown = set(options) - set(ORDER_OPTIONS)
+    if unknown:
+        raise BadRequest(f"unknown options: {', '.join(sorted(unknown))}")
+    options = {key: bool(options.get(key, False)) for key in ORDER_OPTIONS}
+    fmt = body.get("format", "json")
+    if not isinstance(fmt, str) or (fmt not in ("json", "xlsx") and fmt not in core.EXPORT_FORMATS):
+        raise BadRequest(f"unknown format: {fmt}")
+
+    pressure_details = _pressure_details(body)
+    order = core.build_batch_order(
+        _batch_frame(body.get("rows")), holder.get(), pressure_details=pressure_details, **options
+    )
+    rows = [line.as_row() for line in order.lines]
+
+    if fmt == "xlsx":
+        buffer = io.BytesIO()
+        core.write_batch_workbook(order, buffer, CERT_TEMPLATE, SLUTT_TEMPLATE, pressure_details)
+        return 200, XLSX_MIME, buffer.getvalue(), f"output_{_stamp()}.xlsx"
+    if fmt in core.EXPORT_FORMATS:
+        mime = "text/tab-separated-values" if fmt == "tsv" else "text/csv"
+        return 200, f"{mime}; charset=utf-8", core.order_text(rows, fmt), f"visma_{_stamp()}.{fmt}"
+    return 200, "application/json", {
+        "lines": [_plain(line._asdict()) for line in order.lines],
+        "visma": [_plain(core.format_output_row(row)) for row in rows],
+        "certificates": len(order.certificates),
+        "unresolved": [_resolution_json(res) for res in order.unresolved],
+    }, None
+
+
+def handle_certificates(holder, body):
+    if isinstance(body.get("text"), str):
+        rows = core.iter_certificate_rows_text(body["text"])
+    elif isinstance(body.get("rows"), list) and all(isinstance(row, list) for row in body["rows"]):
+        rows = ((row + [None, None, None])[:3] for row in body["rows"])
+    else:
+        raise BadRequest('give "rows" ([Prod.no, Beskrivelse, Antall] lists) or "text" (TSV)')
+
+    certificates = core.iter_certificates(rows, holder.get(), _pressure_details(body))
+    first = next(certificates, None)
+    if first is None:
+        raise BadRequest("no assemblies with a hose from the catalog")
+    buffer = io.BytesIO()
+    core.write_certificate_workbook(CERT_TEMPLATE, itertools.chain([first], certificates), buffer)
+    return 200, XLSX_MIME, buffer.getvalue(), f"sertifikater_{_stamp()}.xlsx"
+
+
+ROUTES = {
+    ("GET", "/health"): handle_health,
+    ("POST", "/resolve"): handle_resolve,
+    ("POST", "/order"): handle_order,
+    ("POST", "/certificates"): handle_certificates,
+}
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    server_version = "SlangeAPI/1.0"
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        start = time.perf_counter()
+        path = self.path.split("?", 1)[0]
+        handler = ROUTES.get((method, path))
+        if handler is None:
+            known = any(route_path == path for _, route_path in ROUTES)
+            self._send(405 if known else 404, "application/json", {"error": f"{method} {path} not supported"})
+            return
+
+        try:
+            body = {}
+            if method == "POST":
+                body = self._read_body()
+                if body is None:
+                    return
+            status, content_type, payload, filename = handler(self.server.catalog_holder, body)
+        except BadRequest as e:
+            status, content_type, payload, filename = 400, "application/json", {"error": str(e)}, None
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, path, e)
+            status, content_type, payload, filename = 500, "application/json", {"error": str(e)}, None
+
+        self._send(status, content_type, payload, filename, time.perf_counter() - start)
+
+    def _read_body(self):
+        """The JSON object in the request body, or None when a 413 has
+        already been sent. Raises BadRequest for anything else unusable."""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise BadRequest("invalid Content-Length") from None
+        if length < 0:
+            raise BadRequest("invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            self._send(413, "application/json", {"error": "request body too large"})
+            return None
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise BadRequest(f"request body is not valid JSON: {e}") from None
+        if not isinstance(body, dict):
+            raise BadRequest("request body must be a JSON object")
+        return body
+
+    def _send(self, status, content_type, payload, filename=None, seconds=None):
+        if content_type == "application/json":
+            payload = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        if filename:
+            self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+        if seconds is not None:
+            self.send_header("Server-Timing", f"app;dur={seconds * 1000:.1f}")
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles each connection on a fixed-size thread pool
+    (ThreadingHTTPServer starts a new thread per connection instead)."""
+
+    def __init__(self, address, handler_class, threads=8, catalog_holder=None):
+        super().__init__(address, handler_class)
+        self.catalog_holder = catalog_holder or CatalogHolder()
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="api")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, threads=8):
+    """A PooledHTTPServer with the catalog and templates already loaded."""
+    server = PooledHTTPServer((host, port), ApiRequestHandler, threads=threads)
+    server.catalog_holder.get()
+    core.load_template(CERT_TEMPLATE)
+    core.load_template(SLUTT_TEMPLATE)
+    core.load_template_package(CERT_TEMPLATE)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m api_server", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--threads", type=int, default=8, help="requests handled at the same time")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    server = make_server(args.host, args.port, args.threads)
+    print(f"Katalog lastet ({time.perf_counter() - start:.2f} s), lytter på http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""Convert filled order templates without the Streamlit app.
+
+    python -m batch_convert ORDRE.xlsx [ORDRE2.xlsx ...] [--out MAPPE] [--jobs N]
+    python -m batch_convert MAPPE --trykktest --kunde "Kunde AS"
+
+Accepts filled MAL_slangebeskrivelse_flere_rader.xlsx files (one summary
+line per row, as in "Excel – flere slanger") and filled
+MAL_Lim_inn_rader_for_Sertifikat.xlsx files (Visma lines split by "1" rows,
+as in the certificate mode), or folders of them. The kind of file is told
+from its header row. Each input gets one output workbook, written to
+--out (default: an "output" folder next to the input), and one timing line.
+
+The catalog is loaded once and shared by every file; with --jobs N the
+files are converted by N worker processes.
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+
+import core
+from catalog_files import CERT_TEMPLATE, SLUTT_TEMPLATE, load_catalog
+
+# Suffixes of the workbooks this tool writes; skipped when scanning a folder
+# so an --out inside the input folder is not converted again.
+OUTPUT_SUFFIXES = {"batch": "_output", "certificate": "_sertifikater"}
+
+
+def input_kind(path):
+    """"batch" for a summary-line template, "certificate" for a Prod.no
+    template, None for anything else (judged by the first row)."""
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        header = next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+    finally:
+        wb.close()
+    names = {str(v).strip() for v in header if v is not None}
+    if "Slangebeskrivelse" in names:
+        return "batch"
+    if "Prod.no" in names:
+        return "certificate"
+    return None
+
+
+def collect_inputs(paths):
+    """The .xlsx files named in `paths`, with folders expanded (not
+    recursively, skipping Excel lock files and this tool's own outputs)."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(
+                p for p in sorted(path.glob("*.xlsx"))
+                if not p.name.startswith("~$")
+                and not p.stem.endswith(tuple(OUTPUT_SUFFIXES.values()))
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def convert_file(path, out_dir, catalog, options, pressure_details):
+    """Convert one input file. Returns (output path, summary text); raises
+    ValueError for files that are not order templates or give no output."""
+    path = Path(path)
+    kind = input_kind(path)
+    if kind is None:
+        raise ValueError("verken Slangebeskrivelse- eller Prod.no-kolonne i første rad")
+
+    out_dir = Path(out_dir) if out_dir else path.parent / "output"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"{path.stem}{OUTPUT_SUFFIXES[kind]}.xlsx"
+    part_path = out_path.with_name(out_path.name + ".part")
+
+    try:
+        if kind == "batch":
+            import_df = pd.read_excel(path)
+            order = core.build_batch_order(
+                import_df, catalog, pressure_details=pressure_details, **options
+            )
+            if not order.lines:
+                raise ValueError("ingen rader generert")
+            core.write_batch_workbook(order, part_path, CERT_TEMPLATE, SLUTT_TEMPLATE, pressure_details)
+            summary = f"{len(order.lines)} linjer"
+            if order.certificates:
+                summary += f", {len(order.certificates)} sertifikater"
+            if order.unresolved:
+                summary += f", {len(order.unresolved)} ikke funnet"
+        else:
+            certificates = core.iter_certificates(
+                core.iter_certificate_rows_xlsx(path), catalog, pressure_details
+            )
+            first = next(certificates, None)
+            if first is None:
+                raise ValueError("ingen slanger funnet i katalogen")
+            count = core.write_certificate_workbook(
+                CERT_TEMPLATE, itertools.chain([first], certificates), part_path
+            )
+            summary = f"{count} sertifikater"
+        os.replace(part_path, out_path)
+    finally:
+        if part_path.exists():
+            part_path.unlink()
+
+    return out_path, summary
+
+
+_worker_catalog = None
+
+
+def _init_worker(catalog):
+    global _worker_catalog
+    _worker_catalog = catalog
+
+
+def _convert_in_worker(path, out_dir, options, pressure_details):
+    start = time.perf_counter()
+    out_path, summary = convert_file(path, out_dir, _worker_catalog, options, pressure_details)
+    return out_path, summary, time.perf_counter() - start
+
+
+def convert_files(files, out_dir, options, pressure_details, jobs=1, catalog=None):
+    """Convert `files`, yielding (path, output path or None, summary or
+    error text, seconds) as each one finishes."""
+    catalog = catalog or load_catalog()
+    jobs = max(1, min(jobs or 1, len(files)))
+
+    if jobs == 1:
+        for path in files:
+            start = time.perf_counter()
+            try:
+                out_path, summary = convert_file(path, out_dir, catalog, options, pressure_details)
+            except Exception as e:
+                yield path, None, str(e), time.perf_counter() - start
+            else:
+                yield path, out_path, summary, time.perf_counter() - start
+        return
+
+    # spawn: the same start method as the resolver pool in core.
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(catalog,),
+    ) as pool:
+        futures = {
+            pool.submit(_convert_in_worker, path, out_dir, options, pressure_details): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                out_path, summary, seconds = future.result()
+            except Exception as e:
+                yield path, None, str(e), 0.0
+            else:
+                yield path, out_path, summary, seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m batch_convert",
+        description="Konverter utfylte MAL-filer (flere slanger / sertifikat) uten Streamlit.",
+    )
+    parser.add_argument("paths", nargs="+", help="MAL-filer (.xlsx) eller mapper med dem")
+    parser.add_argument("--out", help='mappe for resultatfilene (standard: "output" ved siden av hver fil)')
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="antall filer som konverteres samtidig")
+    parser.add_argument("--katalog", help="mappe med Slanger_hylser.xlsx og kuplinger_316.xlsx (standard: de medfølgende)")
+    parser.add_argument("--trykktest", action="store_true", help="legg til trykktest (flere slanger)")
+    parser.add_argument("--prikling", action="store_true", help="legg til prikling (flere slanger)")
+    parser.add_argument("--abs", dest="abs_cert", action="store_true", help="Type Approval (ABS)")
+    parser.add_argument("--dnv", action="store_true", help="Type Approval (DNV)")
+    parser.add_argument("--kunde", default="")
+    parser.add_argument("--kundens-best-nr", default="")
+    parser.add_argument("--hydra-ordre-nr", default="")
+    args = parser.parse_args(argv)
+
+    files = collect_inputs(args.paths)
+    if not files:
+        print("Ingen .xlsx-filer funnet.", file=sys.stderr)
+        return 1
+
+    options = dict(trykktest=args.trykktest, prikling=args.prikling, abs_cert=args.abs_cert, dnv=args.dnv)
+    pressure_details = {
+        "kunde": args.kunde,
+        "kundens_best_nr": args.kundens_best_nr,
+        "hydra_ordre_nr": args.hydra_ordre_nr,
+    }
+
+    start = time.perf_counter()
+    catalog = load_catalog(args.katalog)
+    print(f"Katalog lastet ({time.perf_counter() - start:.2f} s)")
+
+    failed = 0
+    for path, out_path, summary, seconds in convert_files(
+        files, args.out, options, pressure_details, jobs=args.jobs, catalog=catalog
+    ):
+        if out_path is None:
+            failed += 1
+            print(f"FEIL  {path}: {summary}")
+        else:
+            print(f"{seconds:6.2f} s  {path} -> {out_path} ({summary})")
+
+    print(f"{len(files) - failed} av {len(files)} filer konvertert på {time.perf_counter() - start:.2f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
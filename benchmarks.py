@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for the core hot paths at 1x, 10x and 100x the shipped data.
+
+    python -m benchmarks [--scales 1 10 100] [--repeat 3] [--out bench_results.json]
+    python -m benchmarks --baseline bench_baseline.json [--threshold 0.15]
+
+Measured, at every scale:
+
+    find_matches_from_summary   every order line, summary cache cleared
+    build_batch_order           the BOM for the order, with trykktest
+    output_workbook             create_output_workbook + save_output_workbook
+    add_certificate_sheet       one openpyxl certificate sheet per assembly
+                                (copy_sheet_with_formatting)
+    certificate_grouping        iter_certificates over the order's Visma lines
+
+The 1x workload is the shipped catalog (Slanger_hylser.xlsx and
+kuplinger_316.xlsx), or the one in --catalog, and an order with one
+assembly per hose in it. At Nx every hose and coupling sheet holds N
+copies of its rows and the order N copies of its lines; copy k gets its
+own Prod.no and an "Rk" tag on its codes, so the copies resolve to their
+own rows instead of being served from the first copy.
+
+A full run at 100x takes several minutes, most of it in
+add_certificate_sheet; use --scales and --only to narrow it down.
+
+Results go to --out as JSON. With --baseline the run is compared to an
+earlier result file and the exit status is 1 if anything got slower than
+--threshold allows.
+"""
+
+import argparse
+import io
+import json
+import numbers
+import platform
+import re
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import core
+from catalog_files import CERT_TEMPLATE, load_catalog
+
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_OUT = "bench_results.json"
+LENGTHS = (500, 750, 1000, 1250, 1500, 2000, 2500, 3000)
+LAGER = ("3", "1", "5")
+PRESSURE_DETAILS = {"kunde": "Bench AS", "kundens_best_nr": "B-1", "hydra_ordre_nr": "H-1"}
+
+
+# -------------------------------------------------
+# SCALED WORKLOADS
+# -------------------------------------------------
+
+def _tag(copy_no, width):
+    return f"R{copy_no:0{width}d}" if copy_no else ""
+
+
+def _tag_code(text, tag):
+    """`text` with `tag` appended to its first word (the product code)."""
+    if not tag or not isinstance(text, str) or not text.strip():
+        return text
+    code, sep, rest = text.strip().partition(" ")
+    return f"{code}{tag}{sep}{rest}"
+
+
+def _copy_prod_no(prod_no, copy_no):
+    # Leading 1xx keeps copies clear of the 900xx service numbers.
+    if not copy_no:
+        return prod_no
+    if isinstance(prod_no, numbers.Integral):
+        return (100 + copy_no) * 1_000_000 + int(prod_no)
+    if isinstance(prod_no, str):
+        return f"{prod_no}-R{copy_no}"
+    return prod_no
+
+
+def _scaled_sheet(df, factor, width):
+    copies = [df]
+    for copy_no in range(1, factor):
+        tag = _tag(copy_no, width)
+        replica = df.copy()
+        if "Prod.no" in replica.columns:
+            replica["Prod.no"] = [_copy_prod_no(p, copy_no) for p in replica["Prod.no"]]
+        if "Beskrivelse" in replica.columns:
+            replica["Beskrivelse"] = [_tag_code(b, tag) for b in replica["Beskrivelse"]]
+        copies.append(replica)
+    return pd.concat(copies, ignore_index=True)
+
+
+def scaled_catalog(catalog, factor):
+    """A CatalogStore with `factor` copies of the hose sheet and of every
+    coupling sheet (the MONT, Trykktest, Prikling and ABS Sert. sheets are
+    kept as they are)."""
+    if factor == 1:
+        return catalog
+    width = len(str(factor - 1))
+    first_sheets = dict(catalog.first_sheets)
+    first_sheets[catalog.hose_sheet_name] = _scaled_sheet(catalog.df1, factor, width)
+    second_sheets = {name: _scaled_sheet(df, factor, width) for name, df in catalog.df2_all.items()}
+    return core.CatalogStore(first_sheets, second_sheets, version=f"{catalog.version}-x{factor}")
+
+
+def _first_word(text):
+    return str(text).strip().split(" ", 1)[0]
+
+
+def base_order_rows(catalog):
+    """One batch row per hose in the (unscaled) catalog: the hose with two
+    couplings from a coupling sheet of its size, lengths, quantities, angles
+    and warehouses varied by position. Returns (hose code, length, Kupling
+    1 code, Kupling 2 code, angle, Antall, Lager) tuples."""
+    sheets_by_size = {}
+    for sheet_name, df in catalog.df2_all.items():
+        m = re.match(r"Kuplinger\s+(\d{1,3})", sheet_name)
+        if m:
+            sheets_by_size.setdefault(m.group(1).zfill(2), []).append(df)
+
+    rows = []
+    for i, hose in enumerate(catalog.df1.to_dict("records")):
+        size = str(hose["Dimensjon"]).zfill(2)
+        sheets = sheets_by_size.get(size)
+        k1 = k2 = ""
+        if sheets:
+            descs = sheets[i % len(sheets)]["Beskrivelse"].tolist()
+            k1 = _first_word(descs[i % len(descs)])
+            k2 = _first_word(descs[(i * 7 + 3) % len(descs)])
+        rows.append((
+            _first_word(hose["Beskrivelse"]), LENGTHS[i % len(LENGTHS)], k1, k2,
+            "90" if i % 4 == 3 else "", str(1 + i % 3), LAGER[i % len(LAGER)],
+        ))
+    return rows
+
+
+def scaled_order(base_rows, factor):
+    """The batch table (DataFrame) for `factor` copies of `base_rows`,
+    copy k referring to copy k of the catalog (see scaled_catalog)."""
+    width = len(str(factor - 1)) if factor > 1 else 1
+    records = []
+    for copy_no in range(factor):
+        tag = _tag(copy_no, width)
+        for hose, length, k1, k2, angle, antall, lager in base_rows:
+            parts = [hose + tag, str(length), k1 + tag if k1 else "", k2 + tag if k2 else ""]
+            if angle:
+                parts.append(angle)
+            records.append(["/".join(parts), antall, str(len(records) + 1), "", lager])
+    return pd.DataFrame(
+        records, columns=["Slangebeskrivelse", "Antall", "POS.nr", "Kundes delnummer", "Lager"], dtype=object
+    )
+
+
+class Workload:
+    """Catalog, batch table, order and certificate input at one scale."""
+
+    def __init__(self, base_catalog, base_rows, factor):
+        self.factor = factor
+        self.catalog = scaled_catalog(base_catalog, factor)
+        self.import_df = scaled_order(base_rows, factor)
+        self.lines = self.import_df["Slangebeskrivelse"].tolist()
+        self.order = core.build_batch_order(
+            self.import_df, self.catalog, trykktest=True, pressure_details=PRESSURE_DETAILS
+        )
+        self.output_rows = [line.as_row() for line in self.order.lines]
+        self.certificate_rows = [(line.prod_no, line.beskrivelse, line.antall) for line in self.order.lines]
+        self.catalog.hose_prod_no_index()
+        self.catalog.coupling_prod_no_index()
+        core.load_template(CERT_TEMPLATE)
+
+
+def _clear_caches():
+    core.clear_summary_cache()
+    core.parse_summary_line.cache_clear()
+
+
+# -------------------------------------------------
+# BENCHMARKS
+# -------------------------------------------------
+
+# Each benchmark takes a Workload and returns the number of items it
+# handled; the caches it must not profit from are cleared before each run.
+
+def bench_find_matches(w):
+    catalog = w.catalog
+    for line in w.lines:
+        core.find_matches_from_summary(line, catalog.df1, catalog.df2_all, catalog=catalog)
+    return len(w.lines)
+
+
+def bench_build_batch_order(w):
+    order = core.build_batch_order(w.import_df, w.catalog, trykktest=True, pressure_details=PRESSURE_DETAILS)
+    return len(order.lines)
+
+
+def bench_output_workbook(w):
+    wb = core.create_output_workbook()
+    core.save_output_workbook(wb, io.BytesIO(), w.output_rows)
+    return len(w.output_rows)
+
+
+def bench_add_certificate_sheet(w):
+    wb = core.create_output_workbook()
+    for i, certificate_data in enumerate(w.order.certificates, start=1):
+        core.add_certificate_sheet(wb, CERT_TEMPLATE, certificate_data, f"Sertifikat {i}")
+    return len(w.order.certificates)
+
+
+def bench_certificate_grouping(w):
+    return sum(1 for _ in core.iter_certificates(w.certificate_rows, w.catalog, PRESSURE_DETAILS))
+
+
+BENCHMARKS = {
+    "find_matches_from_summary": bench_find_matches,
+    "build_batch_order": bench_build_batch_order,
+    "output_workbook": bench_output_workbook,
+    "add_certificate_sheet": bench_add_certificate_sheet,
+    "certificate_grouping": bench_certificate_grouping,
+}
+
+
+def time_benchmark(func, workload, repeat):
+    """Run `func` `repeat` times on `workload`; returns (items, seconds per run)."""
+    runs = []
+    items = 0
+    for _ in range(repeat):
+        _clear_caches()
+        start = time.perf_counter()
+        items = func(workload)
+        runs.append(time.perf_counter() - start)
+    return items, runs
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, names=None, repeat=3, catalog_dir=None, log=print):
+    """Run the benchmarks in `names` (default: all) at each scale and return
+    the result document written by main(). `catalog_dir` is a folder with
+    other catalog workbooks, such as a synthetic one (see synthetic)."""
+    names = list(names or BENCHMARKS)
+    base_catalog = load_catalog(catalog_dir)
+    base_rows = base_order_rows(base_catalog)
+
+    results = []
+    for factor in scales:
+        start = time.perf_counter()
+        workload = Workload(base_catalog, base_rows, factor)
+        log(
+            f"{factor}x: {len(workload.catalog.df1)} slanger, "
+            f"{sum(len(df) for df in workload.catalog.df2_all.values())} kuplinger, "
+            f"{len(workload.lines)} ordrelinjer ({time.perf_counter() - start:.1f} s oppsett)"
+        )
+        for name in names:
+            items, runs = time_benchmark(BENCHMARKS[name], workload, repeat)
+            result = {
+                "name": name,
+                "scale": factor,
+                "items": items,
+                "median_s": statistics.median(runs),
+                "min_s": min(runs),
+                "runs_s": runs,
+            }
+            results.append(result)
+            log(f"  {name:28} {result['median_s'] * 1000:10.1f} ms  ({items} stk)")
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "catalog": str(catalog_dir) if catalog_dir else "shipped",
+        "catalog_version": base_catalog.version,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=0.15):
+    """(name, scale, baseline median, current median, ratio, verdict) for
+    every benchmark in both documents; verdict is "slower" or "faster" when
+    the medians differ by more than `threshold`, else ""."""
+    previous = {(r["name"], r["scale"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = previous.get((result["name"], result["scale"]))
+        if old is None:
+            continue
+        ratio = result["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        verdict = "slower" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        rows.append((result["name"], result["scale"], old["median_s"], result["median_s"], ratio, verdict))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES), help="catalog/order multipliers")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="run only these benchmarks")
+    parser.add_argument("--catalog", help="folder with Slanger_hylser.xlsx and kuplinger_316.xlsx (default: the shipped ones)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (the median is reported)")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="result file (JSON)")
+    parser.add_argument("--baseline", help="earlier result file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    document = run_benchmarks(args.scales, args.only, max(1, args.repeat), args.catalog)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"Resultater lagret i {args.out}")
+
+    if baseline is None:
+        return 0
+    rows = compare(document, baseline, args.threshold)
+    print(f"\nMot {args.baseline} ({baseline.get('created', '?')}):")
+    for name, scale, old, new, ratio, verdict in rows:
+        print(f"  {name:28} {scale:>4}x {old * 1000:10.1f} -> {new * 1000:10.1f} ms  {ratio:5.2f}x  {verdict}")
+    return 1 if any(verdict == "slower" for *_, verdict in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""The catalog workbooks and certificate templates shipped next to the
+code, and the API service's port, shared by the command-line tools, the
+API service and its client."""
+
+from pathlib import Path
+
+# Port api_server listens on by default, and api_client connects to.
+DEFAULT_PORT = 8765
+
+BASE_DIR = Path(__file__).resolve().parent
+FIRST_FILE = BASE_DIR / "Slanger_hylser.xlsx"
+SECOND_FILE = BASE_DIR / "kuplinger_316.xlsx"
+CERT_TEMPLATE = BASE_DIR / "Mal Trykktest Sertikat.xlsx"
+SLUTT_TEMPLATE = BASE_DIR / "Mal sluttkontroll slanger.xlsx"
+
+
+def load_catalog(catalog_dir=None):
+    """The catalog workbooks in `catalog_dir` (default: the shipped ones
+    next to this file), with the snapshot cache kept beside them."""
+    # Imported here so api_client, which only needs DEFAULT_PORT, does not
+    # pull in core and pandas.
+    import core
+
+    catalog_dir = Path(catalog_dir) if catalog_dir else BASE_DIR
+    return core.CatalogStore.load(
+        str(catalog_dir / FIRST_FILE.name),
+        str(catalog_dir / SECOND_FILE.name),
+        cache_dir=str(catalog_dir / core.CATALOG_CACHE_DIR),
+    )
@@ -5,14 +5,45 @@ Created on Tue Feb 24 11:32:50 2026
 @author: eivind
 """
 
+import numpy as np
 import pandas as pd
 import openpyxl
 import os
 import re
+import json
+import logging
+import bisect
+import csv
+import numbers
+import functools
+import heapq
+import itertools
+import multiprocessing
+import hashlib
+import io
+import math
+import threading
+import time
+import uuid
+import weakref
+import zipfile
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
-from datetime import datetime as dt
+from datetime import date, datetime as dt
+from xml.sax.saxutils import escape as xml_escape
+from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.drawing.image import Image
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.worksheet.merge import MergedCellRange
 
 
+logger = logging.getLogger(__name__)
+
 # -------------------------------------------------
 # SHARED CONSTANTS
 # -------------------------------------------------
@@ -35,24 +66,339 @@ def clean_columns(df):
 
 
 def load_main_data(first_file_path, second_file_path):
-    df1 = clean_columns(pd.read_excel(first_file_path, sheet_name=0))
-    df2_all = pd.read_excel(second_file_path, sheet_name=None)
+    first_sheets = read_workbook_sheets(first_file_path)
+    df1 = clean_columns(next(iter(first_sheets.values())))
+    df2_all = read_workbook_sheets(second_file_path)
     for key in df2_all:
         df2_all[key] = clean_columns(df2_all[key])
     return df1, df2_all
 
 
 def load_support_sheets(first_file_path):
-    mont_df = clean_columns(pd.read_excel(first_file_path, sheet_name="MONT"))
-    trykktest_df = clean_columns(pd.read_excel(first_file_path, sheet_name="Trykktest"))
-    prikling_df = clean_columns(pd.read_excel(first_file_path, sheet_name="Prikling"))
+    sheets = read_workbook_sheets(first_file_path)
+    mont_df = clean_columns(sheets["MONT"])
+    trykktest_df = clean_columns(sheets["Trykktest"])
+    prikling_df = clean_columns(sheets["Prikling"])
     return mont_df, trykktest_df, prikling_df
 
 
+# -------------------------------------------------
+# CATALOG SNAPSHOT
+# -------------------------------------------------
+
+# Compiled Parquet copies of the catalog workbooks live here, one folder per
+# source file. Safe to delete - it is rebuilt on the next load.
+CATALOG_CACHE_DIR = ".catalog_cache"
+_SNAPSHOT_FORMAT = 1
+_SNAPSHOT_MANIFEST = "manifest.json"
+
+
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_fingerprint(path):
+    """Size, mtime and content hash of a source file - the snapshot key."""
+    stat = os.stat(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _sha256_file(path),
+    }
+
+
+def _snapshot_dir(path, cache_dir):
+    abs_path = os.path.abspath(path)
+    tag = hashlib.sha1(abs_path.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}-{tag}")
+
+
+def _read_manifest(snap_dir):
+    try:
+        with open(os.path.join(snap_dir, _SNAPSHOT_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception:
+        return None
+    if manifest.get("format") != _SNAPSHOT_FORMAT:
+        return None
+    return manifest
+
+
+def _write_manifest(snap_dir, manifest):
+    tmp_path = os.path.join(snap_dir, f"{_SNAPSHOT_MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, os.path.join(snap_dir, _SNAPSHOT_MANIFEST))
+
+
+def _snapshot_is_fresh(manifest, path, snap_dir):
+    """Cheap size+mtime check first; only hash the file when the mtime moved
+    (e.g. a redeploy touched it). Unchanged content re-stamps the manifest so
+    the next start takes the cheap path again."""
+    source = manifest.get("source", {})
+    stat = os.stat(path)
+    if stat.st_size != source.get("size"):
+        return False
+    if stat.st_mtime_ns == source.get("mtime_ns"):
+        return True
+    if _sha256_file(path) != source.get("sha256"):
+        return False
+    try:
+        manifest["source"]["mtime_ns"] = stat.st_mtime_ns
+        _write_manifest(snap_dir, manifest)
+    except Exception:
+        pass
+    return True
+
+
+def compile_workbook_snapshot(path, cache_dir=CATALOG_CACHE_DIR):
+    """Parse every sheet of an Excel workbook once with openpyxl and store
+    them as Parquet files next to a manifest keyed by the source file's
+    size, mtime and SHA-256. Returns the parsed sheets.
+
+    Failing to write the snapshot (read-only disk, missing pyarrow) is not an
+    error - it is logged as a warning and the freshly parsed sheets are
+    returned either way.
+    """
+    fingerprint = file_fingerprint(path)
+    sheets = pd.read_excel(path, sheet_name=None)
+
+    snap_dir = _snapshot_dir(path, cache_dir)
+    try:
+        os.makedirs(snap_dir, exist_ok=True)
+        # File names carry the content hash so a running process that still
+        # reads the previous manifest never sees half-rewritten files.
+        prefix = fingerprint["sha256"][:12]
+        entries = []
+        for i, (name, df) in enumerate(sheets.items()):
+            file_name = f"{prefix}_{i:03d}.parquet"
+            df.to_parquet(os.path.join(snap_dir, file_name))
+            entries.append([name, file_name])
+
+        _write_manifest(snap_dir, {
+            "format": _SNAPSHOT_FORMAT,
+            "source": fingerprint,
+            "sheets": entries,
+        })
+
+        keep = {file_name for _, file_name in entries} | {_SNAPSHOT_MANIFEST}
+        for old in os.listdir(snap_dir):
+            if old not in keep and old.endswith(".parquet"):
+                try:
+                    os.remove(os.path.join(snap_dir, old))
+                except OSError:
+                    pass
+    except Exception as e:
+        logger.warning("Could not write the catalog snapshot for %s to %s: %s", path, snap_dir, e)
+
+    return sheets
+
+
+def _read_snapshot_sheet(path):
+    """One sheet from its Parquet file. Parquet gives blank cells in object
+    columns back as None where pd.read_excel has NaN; they are turned back
+    into NaN so a warm start sees the same frames as a cold one."""
+    df = pd.read_parquet(path)
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].where(df[column].notna(), np.nan)
+    return df
+
+
+def read_workbook_sheets(path, cache_dir=CATALOG_CACHE_DIR):
+    """Return {sheet name: DataFrame} for every sheet in the workbook, in
+    workbook order - from the Parquet snapshot when the source file is
+    unchanged, otherwise by parsing the xlsx and compiling a new snapshot."""
+    snap_dir = _snapshot_dir(path, cache_dir)
+    manifest = _read_manifest(snap_dir)
+    if manifest is not None:
+        try:
+            if _snapshot_is_fresh(manifest, path, snap_dir):
+                return {
+                    name: _read_snapshot_sheet(os.path.join(snap_dir, file_name))
+                    for name, file_name in manifest["sheets"]
+                }
+        except Exception:
+            pass
+    return compile_workbook_snapshot(path, cache_dir)
+
+
+def _snapshot_source_hash(path, cache_dir=CATALOG_CACHE_DIR):
+    """SHA-256 of a catalog source file, taken from its snapshot manifest
+    (just validated by read_workbook_sheets) when there is one."""
+    manifest = _read_manifest(_snapshot_dir(path, cache_dir))
+    if manifest is not None:
+        source = manifest.get("source", {})
+        if source.get("size") == os.stat(path).st_size and source.get("sha256"):
+            return source["sha256"]
+    return _sha256_file(path)
+
+
+def compile_catalog(first_file_path, second_file_path, cache_dir=CATALOG_CACHE_DIR):
+    """Compile both catalog workbooks up front (e.g. as a deploy step) so the
+    first page load after a restart does not pay for openpyxl parsing."""
+    compile_workbook_snapshot(first_file_path, cache_dir)
+    compile_workbook_snapshot(second_file_path, cache_dir)
+
+
+# -------------------------------------------------
+# CATALOG STORE
+# -------------------------------------------------
+
+class CatalogStore:
+    """All catalog sheets the app works with, each workbook read once.
+
+    Slanger_hylser.xlsx holds the hose sheet (sheet 0, "Slange+Hylse") plus
+    the MONT, Trykktest, Prikling and "ABS Sert." support sheets;
+    kuplinger_316.xlsx holds one "Kuplinger <size>(<variant>)" sheet per
+    coupling set. One instance is shared by every session, so the frames
+    here must be treated as read-only - copy before filtering in place.
+    """
+
+    def __init__(self, first_sheets, second_sheets, version=None):
+        # Token identifying this exact catalog content. Anything cached on
+        # top of the catalog (see SummaryCache) is keyed on it.
+        self.version = version or f"mem-{uuid.uuid4().hex}"
+
+        self.first_sheets = {name: clean_columns(df) for name, df in first_sheets.items()}
+        self.df2_all = {name: clean_columns(df) for name, df in second_sheets.items()}
+
+        self.df1 = next(iter(self.first_sheets.values()))
+        self.slange_hylse_df = self.first_sheets["Slange+Hylse"]
+        self.mont_df = self.first_sheets["MONT"]
+        self.trykktest_df = self.first_sheets["Trykktest"]
+        self.prikling_df = self.first_sheets["Prikling"]
+        self.abs_sert_df = self.first_sheets["ABS Sert."]
+
+        self.slange_hylse_index = build_slange_hylse_index(self.slange_hylse_df)
+        self.hose_index = HoseIndex(self.df1)
+        self.coupling_index = CouplingIndex(self.df2_all)
+
+        self._lazy_lock = threading.Lock()
+        self._suggestion_indexes = {}
+        self._hose_prod_nos = None
+        self._coupling_prod_nos = None
+
+    def __getstate__(self):
+        # Sent to worker processes: leave out the lock and the lazily built
+        # indexes (workers rebuild them if they ever need them).
+        state = self.__dict__.copy()
+        del state["_lazy_lock"]
+        state["_suggestion_indexes"] = {}
+        state["_hose_prod_nos"] = None
+        state["_coupling_prod_nos"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lazy_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, first_file_path, second_file_path, cache_dir=CATALOG_CACHE_DIR):
+        first_sheets = read_workbook_sheets(first_file_path, cache_dir)
+        second_sheets = read_workbook_sheets(second_file_path, cache_dir)
+        version = hashlib.sha256(
+            (
+                _snapshot_source_hash(first_file_path, cache_dir)
+                + _snapshot_source_hash(second_file_path, cache_dir)
+            ).encode("ascii")
+        ).hexdigest()[:16]
+        catalog = cls(first_sheets, second_sheets, version=version)
+        # Built in the background (about a second on a catalog ten times the
+        # shipped one), so the first unresolved line does not wait for it.
+        threading.Thread(
+            target=catalog.build_suggestion_indexes, name="suggestion-indexes", daemon=True
+        ).start()
+        return catalog
+
+    def build_suggestion_indexes(self):
+        for kind in ("hose", "coupling"):
+            self.suggestion_index(kind)
+
+    def suggestion_index(self, kind):
+        """SimilarityIndex over hoses (kind="hose") or couplings
+        (kind="coupling"). Catalogs from load() build both in a background
+        thread; a caller that gets here first builds it (or waits for the
+        build already running)."""
+        with self._lazy_lock:
+            index = self._suggestion_indexes.get(kind)
+            if index is None:
+                if kind == "hose":
+                    entries = [
+                        (
+                            (row.get("Beskrivelse", ""), row.get("Beskrivelse_2", "")),
+                            {"Prod.no": row.get("Prod.no"), "Beskrivelse": row.get("Beskrivelse"), "sheet": None},
+                        )
+                        for row in self.df1.to_dict("records")
+                    ]
+                else:
+                    entries = []
+                    seen = set()
+                    for sheet_name, df in self.df2_all.items():
+                        for row in df.to_dict("records"):
+                            key = (row.get("Prod.no"), row.get("Beskrivelse"))
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                            entries.append((
+                                (row.get("Beskrivelse", ""),),
+                                {"Prod.no": key[0], "Beskrivelse": key[1], "sheet": sheet_name},
+                            ))
+                index = SimilarityIndex(entries)
+                self._suggestion_indexes[kind] = index
+            return index
+
+    @property
+    def hose_sheet_name(self):
+        return next(iter(self.first_sheets))
+
+    def hose_prod_no_index(self):
+        """normalize_prod_no(Prod.no) -> row dict for the hose sheet; the
+        first row wins. Built on first use, once per catalog."""
+        with self._lazy_lock:
+            if self._hose_prod_nos is None:
+                self._hose_prod_nos = _prod_no_rows([self.df1])
+            return self._hose_prod_nos
+
+    def coupling_prod_no_index(self):
+        """normalize_prod_no(Prod.no) -> row dict over every coupling sheet,
+        in workbook order; the first sheet a Prod.no appears in wins. Kept
+        apart from hose_prod_no_index, so a Prod.no that is also on the
+        hose sheet still finds its coupling row."""
+        with self._lazy_lock:
+            if self._coupling_prod_nos is None:
+                self._coupling_prod_nos = _prod_no_rows(self.df2_all.values())
+            return self._coupling_prod_nos
+
+    def get_cert_row(self, prod_no):
+        """Look up a row in the "ABS Sert." sheet by Prod.no (column A)."""
+        col_a = self.abs_sert_df.columns[0]
+        matches = self.abs_sert_df[
+            self.abs_sert_df[col_a].astype(str).str.strip() == str(prod_no)
+        ]
+        return matches.iloc[0] if not matches.empty else None
+
+
 # -------------------------------------------------
 # LOOKUPS
 # -------------------------------------------------
 
+def _prod_no_rows(frames):
+    index = {}
+    for df in frames:
+        if "Prod.no" not in df.columns:
+            continue
+        for row in df.to_dict("records"):
+            prod_no = row["Prod.no"]
+            if prod_no is None or (not isinstance(prod_no, str) and pd.isna(prod_no)):
+                continue
+            index.setdefault(normalize_prod_no(prod_no), row)
+    return index
+
+
 def detect_material(kupling1_desc):
     """Auto-detect stål vs syrefast from the Kupling 1 description.
 
@@ -82,7 +428,7 @@ def normalize_prod_no(val):
     return s
 
 
-def determine_coupling_sheet_name(selected_row, material, type_approval, first_file_path):
+def determine_coupling_sheet_name(selected_row, material, type_approval, catalog):
     """Work out which 'Kuplinger <size>(...)' sheet applies to a chosen hose.
 
     Mirrors the sheet-selection rules used in "Velg Slange og Kuplinger":
@@ -94,36 +440,20 @@ def determine_coupling_sheet_name(selected_row, material, type_approval, first_f
     """
     size = str(selected_row["Dimensjon"]).zfill(2)
 
+    try:
+        col_k_val, col_l_val = catalog.slange_hylse_index.get(
+            selected_row.get("Prod.no"), (None, None)
+        )
+    except Exception:
+        col_k_val, col_l_val = None, None
+
     if material == "syrefast":
-        try:
-            slange_hylse_df = clean_columns(
-                pd.read_excel(first_file_path, sheet_name="Slange+Hylse")
-            )
-            prod_no = selected_row.get("Prod.no")
-            match = slange_hylse_df.loc[slange_hylse_df["Prod.no"] == prod_no]
-            if not match.empty and len(slange_hylse_df.columns) > 11:
-                col_l_val = str(match.iloc[0, 11])
-                if "5" in col_l_val:
-                    return f"Kuplinger {size}(5-316)"
-            return f"Kuplinger {size}(316)"
-        except Exception:
-            return f"Kuplinger {size}(316)"
+        if col_l_val is not None and "5" in col_l_val:
+            return f"Kuplinger {size}(5-316)"
+        return f"Kuplinger {size}(316)"
 
     # material == "stål"
-    gates_in_k = False
-    if type_approval:
-        try:
-            slange_hylse_df = clean_columns(
-                pd.read_excel(first_file_path, sheet_name="Slange+Hylse")
-            )
-            prod_no = selected_row.get("Prod.no")
-            match = slange_hylse_df.loc[slange_hylse_df["Prod.no"] == prod_no]
-            if not match.empty and len(slange_hylse_df.columns) > 10:
-                col_k_val = str(match.iloc[0, 10])
-                if "Gates" in col_k_val:
-                    gates_in_k = True
-        except Exception:
-            pass
+    gates_in_k = col_k_val is not None and "Gates" in col_k_val
 
     if type_approval and gates_in_k:
         return f"Kuplinger {size}(M-st)"
@@ -136,6 +466,28 @@ def determine_coupling_sheet_name(selected_row, material, type_approval, first_f
     return f"Kuplinger {size}(st)"
 
 
+def build_slange_hylse_index(slange_hylse_df):
+    """Map Prod.no -> (column K text, column L text) of the Slange+Hylse sheet.
+
+    Column K (produsent) says whether a hose is a Gates hose, column L
+    whether a syrefast hose takes the 5-316 coupling set. The first row wins
+    for a repeated Prod.no, and a column the sheet does not have maps to None.
+    Keys are the raw Prod.no values, so they compare exactly like the old
+    `df["Prod.no"] == prod_no` filter did.
+    """
+    ncols = len(slange_hylse_df.columns)
+    prod_pos = slange_hylse_df.columns.get_loc("Prod.no")
+    index = {}
+    for row in slange_hylse_df.itertuples(index=False, name=None):
+        prod_no = row[prod_pos]
+        if pd.isna(prod_no) or prod_no in index:
+            continue
+        col_k = str(row[10]) if ncols > 10 else None
+        col_l = str(row[11]) if ncols > 11 else None
+        index[prod_no] = (col_k, col_l)
+    return index
+
+
 def get_trykktest_prodno(size, length, trykktest_df):
     if size is None:
         return None
@@ -263,54 +615,491 @@ def _multiply_row_quantity(row, multiplier):
     return row
 
 
+# -------------------------------------------------
+# SEARCH INDEXES
+# -------------------------------------------------
+
+def _strip_dashes(x):
+    """Remove dashes so 'G12-24-90' and 'G122490' compare as equal.
+    Used only for the Kupling 1 / Kupling 2 lookups."""
+    return str(x).replace("-", "").strip()
+
+
+class SubstringIndex:
+    """Trigram inverted index answering "which texts contain this substring".
+
+    A pattern of three characters or more is answered from the posting list
+    of its rarest trigram and then verified with a plain `in`, so a lookup
+    costs a handful of string compares instead of one per text. Shorter
+    patterns fall back to a scan. Ids come back in ascending order, i.e. in
+    the order the texts were given.
+    """
+
+    N = 3
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        postings = {}
+        n = self.N
+        for doc_id, text in enumerate(self.texts):
+            for gram in {text[i:i + n] for i in range(len(text) - n + 1)}:
+                postings.setdefault(gram, []).append(doc_id)
+        self._postings = postings
+
+    def __len__(self):
+        return len(self.texts)
+
+    def find(self, pattern):
+        texts = self.texts
+        n = self.N
+        if len(pattern) < n:
+            return [i for i, text in enumerate(texts) if pattern in text]
+
+        rarest = None
+        for i in range(len(pattern) - n + 1):
+            posting = self._postings.get(pattern[i:i + n])
+            if posting is None:
+                return []
+            if rarest is None or len(posting) < len(rarest):
+                rarest = posting
+        if len(pattern) == n:
+            return list(rarest)
+        return [i for i in rarest if pattern in texts[i]]
+
+
+class HoseIndex:
+    """Substring index over Beskrivelse and Beskrivelse_2 of the hose sheet.
+
+    Both columns of a row go into one SubstringIndex as neighbouring texts
+    (2*row and 2*row+1), so the lowest hit id is always the first matching
+    row in sheet order - the same row the old df1.iterrows() scan stopped
+    at. A prefix match is a substring match at position 0, so one index
+    covers both of the old startswith/in tests.
+    """
+
+    def __init__(self, df1):
+        self._df = df1
+        self._rows = {}
+        descs = df1["Beskrivelse"].tolist() if "Beskrivelse" in df1.columns else [""] * len(df1)
+        descs_2 = df1["Beskrivelse_2"].tolist() if "Beskrivelse_2" in df1.columns else [""] * len(df1)
+        texts = []
+        for b, b2 in zip(descs, descs_2):
+            texts.append(str(b).strip())
+            texts.append(str(b2).strip())
+        self._index = SubstringIndex(texts)
+
+    def first_position(self, part1):
+        """Position of the first hose row whose Beskrivelse or Beskrivelse_2
+        contains part1, or None."""
+        hits = self._index.find(part1)
+        return hits[0] // 2 if hits else None
+
+    def row(self, pos):
+        # Rows are handed out read-only (see SummaryCache), so one Series
+        # per catalog row is enough - .iloc on the wide hose sheet is slow.
+        row = self._rows.get(pos)
+        if row is None:
+            row = self._rows[pos] = self._df.iloc[pos]
+        return row
+
+    def first_match(self, part1):
+        pos = self.first_position(part1)
+        return self.row(pos) if pos is not None else None
+
+
+class CouplingIndex:
+    """Dash-insensitive substring index over the Beskrivelse column of every
+    coupling sheet, used by find_matches_from_summary.
+
+    All sheets share one SubstringIndex; a hit is mapped back to its sheet
+    and row position through the per-sheet offsets.
+    """
+
+    def __init__(self, df2_all):
+        self._names = []
+        self._frames = {}
+        self._rows = {}
+        self._offsets = []
+        texts = []
+        for sheet_name, df in df2_all.items():
+            dfc = clean_columns(df) if isinstance(df, pd.DataFrame) else df
+            if "Beskrivelse" in dfc.columns:
+                descs = dfc["Beskrivelse"].tolist()
+            else:
+                descs = [""] * len(dfc)
+            self._offsets.append(len(texts))
+            self._names.append(sheet_name)
+            self._frames[sheet_name] = dfc
+            texts.extend(_strip_dashes(str(d).strip()) for d in descs)
+        self._index = SubstringIndex(texts)
+
+    def _hits_by_sheet(self, pattern_nodash):
+        """{sheet position: [row positions]} for rows containing the pattern."""
+        hits = {}
+        for doc_id in self._index.find(pattern_nodash):
+            sheet_pos = bisect.bisect_right(self._offsets, doc_id) - 1
+            hits.setdefault(sheet_pos, []).append(doc_id - self._offsets[sheet_pos])
+        return hits
+
+    def row(self, sheet_name, pos):
+        row = self._rows.get((sheet_name, pos))
+        if row is None:
+            row = self._rows[(sheet_name, pos)] = self._frames[sheet_name].iloc[pos]
+        return row
+
+    def find_candidates(self, part3, part4):
+        """Return (candidate_sheets, candidate_sheets_single) exactly as the
+        old row-by-row scan produced them, as (sheet name, row position[,
+        row position]) tuples - rows are only materialized (see row()) for
+        the candidate that is finally picked.
+
+        That scan walked each sheet top to bottom, overwriting found1/found2
+        on every hit and stopping once Kupling 1 (and Kupling 2, if given)
+        had both been seen. So with Kupling 2 given, each side ends up as its
+        last hit at or before the row where the later of the two first hits
+        sits; without it, Kupling 1 is simply the first hit.
+        """
+        candidate_sheets = []
+        candidate_sheets_single = []
+
+        part3_nodash = _strip_dashes(part3) if part3 else None
+        part4_nodash = _strip_dashes(part4) if part4 else None
+        if not part3_nodash:
+            return candidate_sheets, candidate_sheets_single
+
+        hits3 = self._hits_by_sheet(part3_nodash)
+        hits4 = self._hits_by_sheet(part4_nodash) if part4_nodash else {}
+
+        for sheet_pos in sorted(hits3):
+            sheet_name = self._names[sheet_pos]
+            rows3 = hits3[sheet_pos]
+            if not part4:
+                candidate_sheets_single.append((sheet_name, rows3[0]))
+                continue
+            rows4 = hits4.get(sheet_pos)
+            if not rows4:
+                continue
+            stop = max(rows3[0], rows4[0])
+            pos1 = rows3[bisect.bisect_right(rows3, stop) - 1]
+            pos2 = rows4[bisect.bisect_right(rows4, stop) - 1]
+            candidate_sheets.append((sheet_name, pos1, pos2))
+
+        return candidate_sheets, candidate_sheets_single
+
+
+class SimilarityIndex:
+    """Character-trigram index for "did you mean" suggestions.
+
+    Every catalog entry is indexed by its lower-cased description and by the
+    product code it starts with, each both as written and with dashes
+    removed, so "g1210" still finds "G1-12". Scores
+    are the Dice coefficient of the padded trigram sets (1.0 = identical).
+    A query reads the rarest posting lists first and looks at the clock
+    every _BUDGET_STRIDE documents, inside posting lists as well as while
+    scoring: counting stops at half the time budget, scoring at the full
+    budget (after at least one stride), so a query stays close to its
+    budget on any catalog size. The ranking is built from the documents
+    scored by then, and only those go through the final top-k heap.
+    """
+
+    # Documents counted between two looks at the clock.
+    _BUDGET_STRIDE = 256
+
+    def __init__(self, entries):
+        # entries: list of (description texts, payload dict)
+        self.payloads = []
+        self._doc_entry = []
+        self._doc_size = []
+        postings = {}
+        for entry_id, (texts, payload) in enumerate(entries):
+            self.payloads.append(payload)
+            forms = set()
+            for text in texts:
+                text = str(text).strip().lower()
+                if text and text != "nan":
+                    # The code at the start of a description ("g1-12",
+                    # "301-12-12") is what users type, so it gets its own
+                    # entry and short queries are not drowned by long texts.
+                    for form in (text, text.split()[0]):
+                        forms.add(form)
+                        forms.add(form.replace("-", ""))
+            for form in forms:
+                grams = _trigrams(form)
+                doc_id = len(self._doc_entry)
+                self._doc_entry.append(entry_id)
+                self._doc_size.append(len(grams))
+                for gram in grams:
+                    postings.setdefault(gram, []).append(doc_id)
+        self._postings = postings
+
+    def search(self, query, k=5, budget_ms=25.0):
+        """Top-k payloads (each with a "score" added), best first, from
+        the evidence gathered within `budget_ms` (see the class docstring)."""
+        start = time.perf_counter()
+        count_deadline = start + budget_ms / 2000.0
+        deadline = start + budget_ms / 1000.0
+        stride = self._BUDGET_STRIDE
+        query = str(query or "").strip().lower()
+        best = {}
+        for form in {query, query.replace("-", "")}:
+            grams = _trigrams(form)
+            if not grams:
+                continue
+            lists = sorted(
+                (self._postings[g] for g in grams if g in self._postings), key=len
+            )
+            overlap = {}
+            out_of_time = False
+            for posting in lists:
+                for offset in range(0, len(posting), stride):
+                    if time.perf_counter() > count_deadline:
+                        out_of_time = True
+                        break
+                    for doc_id in posting[offset:offset + stride]:
+                        overlap[doc_id] = overlap.get(doc_id, 0) + 1
+                if out_of_time:
+                    break
+            counted = iter(overlap.items())
+            for chunk in iter(lambda: list(itertools.islice(counted, stride)), []):
+                for doc_id, count in chunk:
+                    score = 2.0 * count / (len(grams) + self._doc_size[doc_id])
+                    entry_id = self._doc_entry[doc_id]
+                    if score > best.get(entry_id, 0.0):
+                        best[entry_id] = score
+                if time.perf_counter() > deadline:
+                    break
+
+        top = heapq.nlargest(k, best.items(), key=lambda item: (item[1], -item[0]))
+        return [dict(self.payloads[entry_id], score=round(score, 3)) for entry_id, score in top]
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
 # -------------------------------------------------
 # SUMMARY PARSING
 # -------------------------------------------------
 
-def find_matches_from_summary(first_line, df1, df2_all, material_pref=None):
-    """Parse summary line and find matching rows from dataframes"""
-    part1 = part2 = part3 = part4 = angle = None
-    length_int = None
-    
-    s = first_line.strip()
-    s = s.replace("°", "")
-    parts = s.split("/")
-    
-    if len(parts) >= 4:
-        part1, part2, part3, part4 = parts[0], parts[1], parts[2], parts[3]
-        if len(parts) >= 5:
-            angle = parts[4]
-    else:
-        if len(parts) >= 2:
-            part1 = parts[0]
-            part2 = parts[1]
-        if len(parts) >= 3:
-            part3 = parts[2]
-        if len(parts) >= 4:
-            part4 = parts[3]
+# Slange/Lengde/Kupling 1/Kupling 2[/Vinkel], split on "/" exactly like the
+# old str.split("/") code: a line without any "/" has no fields at all, and
+# anything after the fifth field is ignored. The "x2" double marker is part
+# of the grammar:
+# - a Kupling 1 field ending in x2/X2 (e.g. "3010606x2") means "this coupling,
+#   doubled" -> the suffix is dropped so the real code matches normally, and
+#   the missing Kupling 2 is mirrored + doubled when the order is built.
+# - a Kupling 2 field that IS just "x2"/"X2" (e.g. ".../3010606/x2") says the
+#   same thing as its own segment -> treated as if Kupling 2 were not given.
+_SUMMARY_RE = re.compile(
+    r"""
+    (?P<hose>[^/]*)
+    /(?P<length>[^/]*)
+    (?:
+        /(?P<k1>[^/]*?)(?P<k1_x2>(?<=[^/])[xX]2)?(?=/|\Z)
+        (?:
+            /(?:(?P<k2_x2>\s*[xX]2\s*(?=/|\Z))|(?P<k2>[^/]*))
+            (?:/(?P<angle>[^/]*))?
+        )?
+    )?
+    """,
+    re.VERBOSE,
+)
+_NON_DIGIT_RE = re.compile(r"\D")
+
+
+class ParsedSummary:
+    """Immutable result of parsing one Slangebeskrivelse.
+
+    Fields are None when the line does not have them. `length` is the digits
+    of the Lengde field as an int, `kupling1` has any x2 suffix removed and
+    `doubled` records that an x2 marker was present.
+    """
+
+    __slots__ = ("hose", "length_text", "length", "kupling1", "kupling2", "angle", "doubled")
+
+    def __init__(self, hose=None, length_text=None, length=None, kupling1=None,
+                 kupling2=None, angle=None, doubled=False):
+        values = (hose, length_text, length, kupling1, kupling2, angle, doubled)
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ParsedSummary is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("ParsedSummary is immutable")
+
+    def _astuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
 
+    def __eq__(self, other):
+        if not isinstance(other, ParsedSummary):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def __hash__(self):
+        return hash(self._astuple())
+
+    def __reduce__(self):
+        return (ParsedSummary, self._astuple())
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ParsedSummary({fields})"
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_summary_line(first_line):
+    """Parse a Slangebeskrivelse such as "G12-24/1000/3011212/3021212/90°"."""
+    m = _SUMMARY_RE.match(first_line.strip().replace("°", ""))
+    if m is None:
+        return ParsedSummary()
+
+    length_text = m.group("length")
     try:
-        length_int = int(re.sub(r'\D', '', part2)) if part2 is not None else None
-    except Exception:
-        length_int = None
-
-    # "x2" / "X2" double-marker handling:
-    # - Kupling 1 field ending in x2/X2 (e.g. "3010606x2") means "this coupling,
-    #   doubled" -> strip the suffix so the real code matches normally; Kupling 2
-    #   is already absent in this form, so the existing "second coupling missing
-    #   -> mirror + double" logic below takes care of the rest.
-    # - Kupling 2 field that IS just "x2"/"X2" (e.g. ".../3010606/x2") means the
-    #   same thing spelled out as its own segment -> treat it as if Kupling 2
-    #   were not given at all.
-    if part3:
-        v3 = str(part3)
-        if len(v3) > 2 and v3[-2:].lower() == "x2":
-            part3 = v3[:-2].rstrip("- ")
-
-    if part4:
-        v4 = str(part4).strip()
-        if v4.lower() == "x2":
-            part4 = None
+        length = int(_NON_DIGIT_RE.sub("", length_text))
+    except ValueError:
+        length = None
+
+    kupling1 = m.group("k1")
+    if m.group("k1_x2"):
+        kupling1 = kupling1.rstrip("- ")
+
+    return ParsedSummary(
+        hose=m.group("hose"),
+        length_text=length_text,
+        length=length,
+        kupling1=kupling1,
+        kupling2=m.group("k2"),
+        angle=m.group("angle"),
+        doubled=bool(m.group("k1_x2") or m.group("k2_x2")),
+    )
+
+
+def parse_summary_lines(lines):
+    """parse_summary_line for a list/Series of lines (non-strings are str()'d)."""
+    return [parse_summary_line(line if isinstance(line, str) else str(line)) for line in lines]
+
+
+class SummaryCache:
+    """Bounded LRU of find_matches_from_summary results.
+
+    Keys are (normalized summary line, material preference, catalog
+    version). Seeing a new catalog version drops everything cached for the
+    old one, so a changed catalog never serves stale rows. The cached
+    tuples hold the catalog's own row Series - callers must not modify them.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._data.clear()
+                self._version = version
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, version, value):
+        with self._lock:
+            if version != self._version:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "version": self._version,
+            }
+
+
+_summary_cache = SummaryCache()
+
+
+def summary_cache_info():
+    """Hit/miss counters and fill level of the summary-line cache."""
+    return _summary_cache.info()
+
+
+def clear_summary_cache():
+    _summary_cache.clear()
+
+
+def _normalize_summary_line(first_line):
+    # Everything find_matches_from_summary does starts from this string, so
+    # it is a safe cache key.
+    return first_line.strip().replace("°", "")
+
+
+def find_matches_from_summary(first_line, df1, df2_all, material_pref=None, catalog=None):
+    """Parse summary line and find matching rows from dataframes.
+
+    Pass the CatalogStore the frames came from as `catalog` to use its
+    prebuilt search indexes and the shared result cache; without it the
+    indexes are built for this call only and nothing is cached.
+    """
+    if catalog is None:
+        return _find_matches_uncached(first_line, df1, df2_all, material_pref, None)
+
+    key = (_normalize_summary_line(first_line), material_pref or None)
+    result = _summary_cache.get(key, catalog.version)
+    if result is None:
+        result = _find_matches_uncached(first_line, df1, df2_all, material_pref, catalog)
+        _summary_cache.put(key, catalog.version, result)
+    return result
+
+
+def _find_matches_uncached(first_line, df1, df2_all, material_pref, catalog):
+    """find_matches_from_summary without the result cache."""
+    hose_index = catalog.hose_index if catalog is not None else HoseIndex(df1)
+    coupling_index = catalog.coupling_index if catalog is not None else CouplingIndex(df2_all)
+    located = _locate_matches(first_line, material_pref, hose_index, coupling_index)
+    return _materialize_matches(located, hose_index, coupling_index)
+
+
+def _materialize_matches(located, hose_index, coupling_index):
+    """Turn _locate_matches positions into the find_matches_from_summary
+    tuple of catalog rows."""
+    hose_pos, sheet_name_found, pos1, pos2, size_str, length_int, detected_material = located
+    selected_row = hose_index.row(hose_pos) if hose_pos is not None else None
+    second_row1 = coupling_index.row(sheet_name_found, pos1) if pos1 is not None else None
+    second_row2 = coupling_index.row(sheet_name_found, pos2) if pos2 is not None else None
+    return selected_row, second_row1, second_row2, sheet_name_found, size_str, length_int, detected_material
+
+
+def _locate_matches(first_line, material_pref, hose_index, coupling_index):
+    """Resolve a summary line to row positions: (hose row, coupling sheet,
+    Kupling 1 row, Kupling 2 row, size, length, detected material).
+    Positions are small and cheap to pickle, unlike the rows themselves."""
+    parsed = parse_summary_line(first_line)
+    part1, part3, part4 = parsed.hose, parsed.kupling1, parsed.kupling2
+    length_int = parsed.length
 
     # Auto-detect stål/syrefast from Kupling 1 so the caller doesn't have to
     # ask the user for it (Quick mode / Excel batch mode). An explicit
@@ -321,29 +1110,7 @@ def find_matches_from_summary(first_line, df1, df2_all, material_pref=None):
         material_pref = detected_material
 
     # Find selected_first_row
-    selected_row = None
-    if part1:
-        for _, row in df1.iterrows():
-            b = str(row.get("Beskrivelse", "")).strip()
-            b2 = str(row.get("Beskrivelse_2", "")).strip()
-            if b.startswith(part1) or b2.startswith(part1) or part1 in b2 or part1 in b:
-                selected_row = row
-                break
-
-    second_row1 = second_row2 = None
-    sheet_name_found = None
-    size_str = None
-
-    def norm_key(x):
-        return str(x).strip()
-
-    def strip_dashes(x):
-        """Remove dashes so 'G12-24-90' and 'G122490' compare as equal.
-        Used only for the Kupling 1 / Kupling 2 lookups below."""
-        return str(x).replace("-", "").strip()
-
-    part3_nodash = strip_dashes(part3) if part3 else None
-    part4_nodash = strip_dashes(part4) if part4 else None
+    hose_pos = hose_index.first_position(part1) if part1 else None
 
     preferred_marker = None
     if material_pref:
@@ -353,28 +1120,9 @@ def find_matches_from_summary(first_line, df1, df2_all, material_pref=None):
         elif "stål" in mp or "stal" in mp or "st" in mp:
             preferred_marker = "st"
 
-    # Collect candidates where BOTH couplings are found in the same sheet
-    candidate_sheets = []
-    # Collect candidates where only coupling 1 is found (single-coupling summary lines)
-    candidate_sheets_single = []
-
-    for sheet_name, df in df2_all.items():
-        dfc = clean_columns(df) if isinstance(df, pd.DataFrame) else df
-        found1 = None
-        found2 = None
-        for _, r in dfc.iterrows():
-            desc = norm_key(r.get("Beskrivelse", ""))
-            desc_nodash = strip_dashes(desc)
-            if part3_nodash and (desc_nodash.startswith(part3_nodash) or part3_nodash in desc_nodash):
-                found1 = r
-            if part4_nodash and (desc_nodash.startswith(part4_nodash) or part4_nodash in desc_nodash):
-                found2 = r
-            if found1 is not None and (found2 is not None or not part4):
-                break
-        if found1 is not None and found2 is not None:
-            candidate_sheets.append((sheet_name, found1, found2))
-        elif found1 is not None and not part4:
-            candidate_sheets_single.append((sheet_name, found1))
+    # Candidates where BOTH couplings are found in the same sheet, and
+    # candidates where only coupling 1 is found (single-coupling summary lines)
+    candidate_sheets, candidate_sheets_single = coupling_index.find_candidates(part3, part4)
 
     def pick_preferred(candidates_with_two):
         if preferred_marker:
@@ -398,19 +1146,556 @@ def find_matches_from_summary(first_line, df1, df2_all, material_pref=None):
         return None
 
     if candidate_sheets:
-        picked = pick_preferred(candidate_sheets)
-        sheet_name_found, second_row1, second_row2 = picked
+        sheet_name_found, pos1, pos2 = pick_preferred(candidate_sheets)
         size_str = extract_size(sheet_name_found)
-        return selected_row, second_row1, second_row2, sheet_name_found, size_str, length_int, detected_material
+        return hose_pos, sheet_name_found, pos1, pos2, size_str, length_int, detected_material
 
     if candidate_sheets_single:
-        picked = pick_preferred_single(candidate_sheets_single)
-        sheet_name_found, second_row1 = picked
-        second_row2 = None
+        sheet_name_found, pos1 = pick_preferred_single(candidate_sheets_single)
         size_str = extract_size(sheet_name_found)
-        return selected_row, second_row1, second_row2, sheet_name_found, size_str, length_int, detected_material
+        return hose_pos, sheet_name_found, pos1, None, size_str, length_int, detected_material
+
+    return hose_pos, None, None, None, None, length_int, detected_material
+
+
+def suggest_catalog_entries(query, catalog, kind="hose", k=5, budget_ms=25.0):
+    """Closest hose or coupling entries for a description that did not
+    resolve - a list of {"Prod.no", "Beskrivelse", "sheet", "score"}."""
+    if not query or not str(query).strip():
+        return []
+    return catalog.suggestion_index(kind).search(query, k=k, budget_ms=budget_ms)
+
+
+def suggest_for_summary(first_line, catalog, result=None, k=5, budget_ms=25.0):
+    """"Did you mean" lists for the parts of a summary line that did not
+    resolve, keyed "Slange" / "Kupling 1" / "Kupling 2". Pass the
+    find_matches_from_summary result if you already have it (only its
+    first two items, the hose and Kupling 1 rows, are looked at)."""
+    if result is None:
+        result = find_matches_from_summary(
+            first_line, catalog.df1, catalog.df2_all, catalog=catalog
+        )
+    selected_row, second_row1 = result[0], result[1]
+    parsed = parse_summary_line(first_line)
+
+    suggestions = {}
+    if selected_row is None and parsed.hose:
+        suggestions["Slange"] = suggest_catalog_entries(parsed.hose, catalog, "hose", k, budget_ms)
+    if second_row1 is None:
+        for label, part in (("Kupling 1", parsed.kupling1), ("Kupling 2", parsed.kupling2)):
+            if part and part.strip():
+                suggestions[label] = suggest_catalog_entries(part, catalog, "coupling", k, budget_ms)
+    return {label: found for label, found in suggestions.items() if found}
+
+
+# Columns of the DataFrame returned by find_matches_for_many. The *_row
+# columns carry the matched catalog rows (Series) for building order lines.
+RESOLUTION_COLUMNS = [
+    "Slangebeskrivelse", "hose_prod_no", "coupling1_prod_no", "coupling2_prod_no",
+    "sheet_name", "size", "length", "material", "status",
+    "hose_row", "coupling1_row", "coupling2_row",
+]
+
+
+def _resolution_record(line, result):
+    selected_row, second_row1, second_row2, sheet_name, size_str, length_int, material = result
+    if selected_row is None:
+        status = "no_hose"
+    elif second_row1 is None:
+        status = "no_coupling"
+    else:
+        status = "ok"
+    return [
+        line,
+        selected_row["Prod.no"] if selected_row is not None else None,
+        second_row1["Prod.no"] if second_row1 is not None else None,
+        second_row2["Prod.no"] if second_row2 is not None else None,
+        sheet_name, size_str, length_int, material, status,
+        selected_row, second_row1, second_row2,
+    ]
+
+
+# Below this many distinct lines find_matches_for_many stays serial even when
+# workers are asked for. A spawned worker takes about a second to start (it
+# imports core, and with it pandas, and unpickles the catalog), while a line
+# resolves in under 0.1 ms, so four workers only win back their start-up from
+# roughly 20000 lines.
+PARALLEL_MIN_LINES = 20000
+
+_worker_catalog = None
+
+
+def _init_resolve_worker(catalog):
+    global _worker_catalog
+    _worker_catalog = catalog
+
+
+def _resolve_shard(keys, material_pref):
+    catalog = _worker_catalog
+    return [
+        _locate_matches(key, material_pref, catalog.hose_index, catalog.coupling_index)
+        for key in keys
+    ]
+
+
+def _resolve_keys(keys, catalog, material_pref, workers):
+    """find_matches_from_summary for every key, in order. With workers > 1
+    and enough lines, lines not already cached are sharded over a process
+    pool. Each worker receives the catalog once, when it starts, and sends
+    back row positions only; the rows are looked up here, in input order,
+    and put into the shared cache."""
+    def resolve(key):
+        return find_matches_from_summary(
+            key, catalog.df1, catalog.df2_all, material_pref, catalog=catalog
+        )
+
+    if workers:
+        workers = min(workers, os.cpu_count() or 1)
+    if not workers or workers <= 1 or len(keys) < PARALLEL_MIN_LINES:
+        return [resolve(key) for key in keys]
+
+    results = {}
+    todo = []
+    for key in keys:
+        cached = _summary_cache.get((key, material_pref or None), catalog.version)
+        if cached is not None:
+            results[key] = cached
+        else:
+            todo.append(key)
+
+    if todo:
+        shard_size = max(1, -(-len(todo) // (workers * 4)))
+        shards = [todo[i:i + shard_size] for i in range(0, len(todo), shard_size)]
+        # spawn, not fork: the Streamlit server is multi-threaded.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_resolve_worker,
+            initargs=(catalog,),
+        ) as pool:
+            shard_results = pool.map(_resolve_shard, shards, [material_pref] * len(shards))
+            for shard, shard_result in zip(shards, shard_results):
+                for key, located in zip(shard, shard_result):
+                    result = _materialize_matches(located, catalog.hose_index, catalog.coupling_index)
+                    results[key] = result
+                    _summary_cache.put((key, material_pref or None), catalog.version, result)
+
+    return [results[key] for key in keys]
+
+
+def find_matches_for_many(lines, catalog, material_pref=None, workers=None):
+    """Resolve a whole column of summary lines in one pass.
+
+    Lines are cleaned with vectorized string operations, every distinct
+    line is resolved once (through the same cache as
+    find_matches_from_summary) and the results are broadcast back to the
+    input rows. Blank and "nan" lines get status "empty"; the others "ok",
+    "no_hose" or "no_coupling". The result keeps the index of `lines`.
+
+    `workers` > 1 resolves large inputs in a process pool of at most
+    os.cpu_count() processes (see PARALLEL_MIN_LINES); the result is the
+    same as a serial run.
+    """
+    lines = lines if isinstance(lines, pd.Series) else pd.Series(list(lines), dtype=object)
+    text = lines.map(str).str.strip()
+    keys = text.str.replace("°", "", regex=False)
+    empty = (text == "") | (text.str.lower() == "nan")
 
-    return selected_row, second_row1, second_row2, sheet_name_found, size_str, length_int, detected_material
+    codes, uniques = pd.factorize(keys.where(~empty, ""))
+    todo = [key for key in uniques if key != ""]
+    resolved_by_key = dict(zip(todo, _resolve_keys(todo, catalog, material_pref, workers)))
+
+    records = []
+    for key in uniques:
+        if key == "":
+            records.append([""] + [None] * 7 + ["empty", None, None, None])
+        else:
+            records.append(_resolution_record(key, resolved_by_key[key]))
+
+    resolved = pd.DataFrame(records, columns=RESOLUTION_COLUMNS, dtype=object)
+    out = resolved.iloc[codes].reset_index(drop=True)
+    out.index = lines.index
+    out["Slangebeskrivelse"] = text.where(~empty, "").values
+    return out
+
+
+# -------------------------------------------------
+# ORDER BUILDING
+# -------------------------------------------------
+
+class OrderLine(namedtuple("OrderLine", "kind prod_no beskrivelse lager antall")):
+    """One Visma order line. `kind` says what the line is for ("pos",
+    "reference", "summary", "hose", "coupling", "hylse", "mont",
+    "prikling", "dnv", "trykktest", "abs", "separator"); as_row() gives
+    the [Prod.no, Beskrivelse, Lager, Antall] list used for output."""
+
+    __slots__ = ()
+
+    def as_row(self):
+        return [self.prod_no, self.beskrivelse, self.lager, self.antall]
+
+
+def assembly_summary_line(hose_row, length_int, coupling1_row, coupling2_row, material, angle=""):
+    """The hose/length/kupling1/kupling2[/angle°] line built from the
+    selected components (Full mode)."""
+    part1 = str(hose_row["Beskrivelse"])[:7] if hose_row is not None else ""
+    part2 = str(length_int if length_int else "")
+    part3 = adjust_length(str(coupling1_row["Beskrivelse"]), material) if coupling1_row is not None else ""
+    part4 = adjust_length(str(coupling2_row["Beskrivelse"]), material) if coupling2_row is not None else ""
+    if angle and angle.strip():
+        return f"{part1}/{part2}/{part3}/{part4}/{angle}°"
+    return f"{part1}/{part2}/{part3}/{part4}"
+
+
+def build_assembly_lines(
+    hose_row, coupling1_row, coupling2_row, sheet_name, size_str, length_int,
+    material, catalog, lager, antall=1, layout="single", pos=None,
+    reference=None, summary_line="", angle="", prikling=False,
+    pressure_test=False, dnv=False,
+):
+    """Order lines for one hose assembly.
+
+    layout="single" is the Quick/Full mode layout: Lager as int, "POS: n"
+    header, placeholder lines for missing parts, hose length rounded to
+    3 decimals and every quantity multiplied by `antall` at the end.
+    layout="batch" is the Excel batch layout: Lager as given, POS and
+    reference lines without quantity, the hose quantity per assembly and
+    antall applied to couplings, hylse, MONT and the add-on lines.
+
+    If `summary_line` is empty it is built from the components.
+    """
+    batch = layout == "batch"
+    if not batch:
+        lager = int(lager)
+    lines = []
+
+    if pos is not None:
+        if batch:
+            lines.append(OrderLine("pos", "1", pos, lager, ""))
+        else:
+            lines.append(OrderLine("pos", "1", f"POS: {pos}", lager, 1))
+    if reference is not None:
+        lines.append(OrderLine("reference", "1", reference if batch else f"{reference}", lager, "" if batch else 1))
+
+    if not summary_line:
+        summary_line = assembly_summary_line(
+            hose_row, length_int, coupling1_row, coupling2_row, material, angle
+        )
+    lines.append(OrderLine("summary", "1", summary_line, lager, 1))
+
+    per_hose = antall if batch else 1
+
+    if batch:
+        hose_qty = length_int / 1000 if length_int else 1
+        lines.append(OrderLine("hose", hose_row["Prod.no"], hose_row["Beskrivelse"], lager, hose_qty))
+    elif hose_row is not None:
+        try:
+            qty = round((length_int or 1000) / 1000, 3)
+            lines.append(OrderLine("hose", hose_row["Prod.no"], hose_row["Beskrivelse"], lager, qty))
+        except Exception:
+            lines.append(OrderLine(
+                "hose", hose_row.get("Prod.no", ""), hose_row.get("Beskrivelse", ""), lager, 1
+            ))
+    else:
+        lines.append(OrderLine("hose", "", "Fant ikke første produkt", lager, 1))
+
+    # Kupling 2 missing -> treat it as the same as Kupling 1.
+    if coupling1_row is not None and coupling2_row is None:
+        coupling2_row = coupling1_row
+
+    same_coupling = (
+        coupling1_row is not None
+        and coupling2_row is not None
+        and str(coupling1_row.get("Prod.no", "")).strip() == str(coupling2_row.get("Prod.no", "")).strip()
+    )
+
+    if same_coupling:
+        # Kupling 1 and Kupling 2 are the same product -> one line,
+        # Antall doubled, instead of two separate lines.
+        lines.append(OrderLine(
+            "coupling", coupling1_row["Prod.no"], coupling1_row["Beskrivelse"], lager, 2 * per_hose
+        ))
+    else:
+        for coupling_row, missing in (
+            (coupling1_row, "Fant ikke første kupling"),
+            (coupling2_row, "Fant ikke andre kupling"),
+        ):
+            if coupling_row is not None:
+                lines.append(OrderLine(
+                    "coupling", coupling_row["Prod.no"], coupling_row["Beskrivelse"], lager, per_hose
+                ))
+            elif not batch:
+                lines.append(OrderLine("coupling", "", missing, lager, 1))
+
+    gsm_count = sum(
+        1 for r in (coupling1_row, coupling2_row)
+        if r is not None and str(r.get("Beskrivelse", "")).startswith("GSM")
+    )
+
+    steel = material == "stål" if batch else material.lower() == "stål"
+    if hose_row is None:
+        mat_prod = mat_desc = ""
+    elif steel:
+        mat_prod = hose_row.get("Stål hylse(Posd.no)", "")
+        mat_desc = hose_row.get("Stål hylse(beskrivelse)", "")
+    else:
+        mat_prod = hose_row.get("316 hylse(Posd.no)", "")
+        mat_desc = hose_row.get("316 hylse(beskrivelse)", "")
+
+    if batch or sheet_name:
+        sheet_key = _extract_sheet_key_from_sheetname(sheet_name)
+    else:
+        sheet_key = "(st)" if material == "stål" else "(316)"
+    skip_staal_hylse = "(M-st)" in sheet_key or "(GSM)" in sheet_key
+
+    if gsm_count < 2 and not skip_staal_hylse and mat_prod:
+        hylse_qty = 2 if gsm_count == 0 else 1
+        lines.append(OrderLine("hylse", mat_prod, mat_desc, lager, hylse_qty * per_hose))
+
+    mont_row = get_mont_row(size_str, sheet_name if batch else sheet_key, catalog.mont_df)
+    if mont_row is not None:
+        lines.append(OrderLine("mont", mont_row["Prod.no"], mont_row["Beskrivelse"], lager, per_hose))
+
+    def add_on(kind, row):
+        if row is not None:
+            lines.append(OrderLine(kind, row.get("Prod.no", ""), row.get("Beskrivelse", ""), lager, per_hose))
+
+    if batch:
+        if pressure_test:
+            add_on("trykktest", get_trykktest_prodno(size_str, length_int, catalog.trykktest_df))
+        if prikling:
+            add_on("prikling", get_prikling_row(size_str, catalog.prikling_df))
+        if dnv:
+            add_on("dnv", catalog.get_cert_row("90003"))
+        lines.append(OrderLine("separator", 1, "", lager, ""))
+        return lines
+
+    if prikling and size_str:
+        add_on("prikling", get_prikling_row(size_str, catalog.prikling_df))
+    if dnv:
+        add_on("dnv", catalog.get_cert_row("90003"))
+    if pressure_test:
+        trykktest_row = get_trykktest_prodno(size_str, length_int or 1000, catalog.trykktest_df)
+        if trykktest_row is not None:
+            add_on("trykktest", trykktest_row)
+        else:
+            lines.append(OrderLine("trykktest", "", "Trykktest: Ja", lager, 1))
+    lines.append(OrderLine("separator", "1", "", lager, ""))
+
+    if antall and antall != 1:
+        lines = [
+            line._replace(antall=_multiply_row_quantity(line.as_row(), antall)[3])
+            for line in lines
+        ]
+    return lines
+
+
+BatchOrder = namedtuple("BatchOrder", "lines certificates unresolved")
+
+
+def batch_summary_lines(import_df):
+    """The Slangebeskrivelse column of a batch table (blank if missing)."""
+    if "Slangebeskrivelse" in import_df.columns:
+        return import_df["Slangebeskrivelse"]
+    return pd.Series("", index=import_df.index, dtype=object)
+
+
+# The filled MAL_slangebeskrivelse_flere_rader.xlsx calls the quantity
+# "Antall slanger"; the app's own batch table and the API call it "Antall".
+BATCH_ANTALL_COLUMNS = ("Antall slanger", "Antall")
+
+
+def batch_row_antall(row):
+    """Number of hoses on a batch row, from whichever of
+    BATCH_ANTALL_COLUMNS it has (1 when blank or missing)."""
+    for column in BATCH_ANTALL_COLUMNS:
+        value = row.get(column)
+        if not _is_blank_value(value):
+            return _batch_antall(value)
+    return 1
+
+
+def _batch_antall(value):
+    try:
+        return int(value)
+    except Exception:
+        try:
+            return int(float(str(value).replace(",", ".")))
+        except Exception:
+            return 1
+
+
+def _batch_cell(value):
+    """A POS.nr / Kundes delnummer cell, or None when blank."""
+    if value and str(value).lower() != "nan":
+        return value
+    return None
+
+
+def batch_order_key(import_df, catalog, **options):
+    """Content hash of a batch table, the build_batch_order options and the
+    catalog version. Two tables with the same key build the same order, so
+    a cached BatchOrder can be reused (certificate dates included, because
+    the key also covers today's date)."""
+    h = hashlib.sha256()
+    h.update(catalog.version.encode())
+    h.update(dt.now().strftime("%d.%m.%Y").encode())
+    h.update(repr(sorted(options.items(), key=lambda kv: kv[0])).encode())
+    h.update(repr([str(c) for c in import_df.columns]).encode())
+    for row in import_df.itertuples(index=False, name=None):
+        h.update(repr(row).encode())
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def build_batch_order(
+    import_df, catalog, trykktest=False, prikling=False, abs_cert=False,
+    dnv=False, pressure_details=None, workers=None,
+):
+    """Resolve and build the order for an Excel batch table (columns
+    Slangebeskrivelse, Antall slanger or Antall, POS.nr, Kundes delnummer,
+    Lager).
+
+    Returns a BatchOrder: `lines` (OrderLine, with the ABS/DNV lines for
+    the whole order at the end), `certificates` (certificate cell data per
+    assembly when `trykktest` is set) and `unresolved` (resolution records,
+    see find_matches_for_many, for lines where the hose or Kupling 1 was
+    not found; lines without a hose are left out of the order).
+    """
+    pressure_details = pressure_details or {}
+    resolved = find_matches_for_many(batch_summary_lines(import_df), catalog, workers=workers)
+
+    lines = []
+    certificates = []
+    unresolved = []
+    for (_, row), res in zip(import_df.iterrows(), resolved.to_dict("records")):
+        if res["status"] == "empty":
+            continue
+
+        hose_row, coupling1_row, coupling2_row = res["hose_row"], res["coupling1_row"], res["coupling2_row"]
+        if hose_row is None or coupling1_row is None:
+            unresolved.append(res)
+            if hose_row is None:
+                continue
+
+        antall = batch_row_antall(row)
+        kundes_del_nr = row.get("Kundes delnummer", "")
+        lines.extend(build_assembly_lines(
+            hose_row, coupling1_row, coupling2_row, res["sheet_name"], res["size"],
+            res["length"], res["material"], catalog, row.get("Lager", ""),
+            antall=antall, layout="batch", pos=_batch_cell(row.get("POS.nr", "")),
+            reference=_batch_cell(kundes_del_nr), summary_line=res["Slangebeskrivelse"],
+            prikling=prikling, pressure_test=trykktest, dnv=dnv,
+        ))
+
+        if trykktest:
+            if coupling1_row is not None and coupling2_row is None:
+                coupling2_row = coupling1_row
+            row_pressure_details = pressure_details.copy()
+            row_pressure_details["antall_slanger"] = antall
+            row_pressure_details["kundes_del_nr"] = kundes_del_nr
+            certificates.append(fill_pressure_test_certificate_data(
+                row_pressure_details, hose_row, [coupling1_row, coupling2_row],
+                res["size"], res["length"], ""
+            ))
+
+    if lines:
+        last_lager = lines[-1].lager
+        for wanted, prod_no, kind in ((abs_cert, "90478", "abs"), (dnv, "90003", "dnv")):
+            cert_row = catalog.get_cert_row(prod_no) if wanted else None
+            if cert_row is not None:
+                lines.append(OrderLine("separator", "1", "", last_lager, ""))
+                lines.append(OrderLine(
+                    kind, cert_row.get("Prod.no", ""), cert_row.get("Beskrivelse", ""), last_lager, 1
+                ))
+
+    return BatchOrder(lines, certificates, unresolved)
+
+
+# -------------------------------------------------
+# VISMA EXPORT
+# -------------------------------------------------
+
+OUTPUT_COLUMNS = ["Prod.no", "Beskrivelse", "Lager", "Antall"]
+
+# Text export formats: delimiter, and whether fields are CSV-quoted. TSV is
+# written raw (for pasting into Visma, where quotes would be kept literally);
+# CSV uses ";" since Antall has comma decimals.
+EXPORT_FORMATS = {
+    "tsv": ("\t", False),
+    "csv": (";", True),
+}
+
+
+def format_output_row(row):
+    """Formaterer en rad slik at:
+    - Prod.no alltid er hele tall (int) uten desimaler.
+    - Antall bruker komma (,) for desimaler.
+    """
+    pno, desc, lager, antall = row[0], row[1], row[2], row[3]
+
+    # 1. Prod.no -> Tving til heltall (int)
+    pno_str = ""
+    if pd.notna(pno) and str(pno).strip() != "":
+        try:
+            pno_str = str(int(float(str(pno).replace(",", "."))))
+        except (ValueError, TypeError):
+            pno_str = str(pno).strip()
+
+    # 2. Antall -> Bruk komma (,) for desimaler
+    antall_str = ""
+    if pd.notna(antall) and str(antall).strip() != "":
+        try:
+            f_val = float(str(antall).replace(",", "."))
+            if f_val.is_integer():
+                antall_str = str(int(f_val))
+            else:
+                antall_str = f"{f_val:.3f}".rstrip("0").rstrip(".").replace(".", ",")
+        except (ValueError, TypeError):
+            antall_str = str(antall).strip()
+
+    return [pno_str, desc, lager, antall_str]
+
+
+def format_output_df(rows):
+    """Output rows as a DataFrame of Visma-formatted strings (see
+    format_output_row)."""
+    return pd.DataFrame([format_output_row(r) for r in rows], columns=OUTPUT_COLUMNS)
+
+
+def _export_field(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return str(value)
+
+
+def _export_line(fields, delimiter, quoted):
+    fields = [_export_field(v) for v in fields]
+    if quoted:
+        fields = [
+            '"' + f.replace('"', '""') + '"' if any(c in f for c in (delimiter, '"', "\n", "\r")) else f
+            for f in fields
+        ]
+    else:
+        fields = [re.sub(r"[\t\r\n]+", " ", f) for f in fields]
+    return delimiter.join(fields) + "\r\n"
+
+
+def iter_order_text(rows, fmt="tsv", header=True):
+    """Output rows as Visma-ready text lines (each ending in a newline),
+    formatted like format_output_df. `fmt` is a key of EXPORT_FORMATS."""
+    delimiter, quoted = EXPORT_FORMATS[fmt]
+    if header:
+        yield _export_line(OUTPUT_COLUMNS, delimiter, quoted)
+    for row in rows:
+        yield _export_line(format_output_row(row), delimiter, quoted)
+
+
+def order_text(rows, fmt="tsv"):
+    """iter_order_text as bytes for a download (UTF-8; CSV with a BOM so
+    Excel reads æøå correctly)."""
+    text = "".join(iter_order_text(rows, fmt))
+    return text.encode("utf-8-sig" if fmt == "csv" else "utf-8")
 
 
 # -------------------------------------------------
@@ -481,32 +1766,353 @@ def fill_pressure_test_certificate_data(
 
 
 # -------------------------------------------------
-# EXCEL OUTPUT
+# CERTIFICATE INPUT
 # -------------------------------------------------
 
-def copy_sheet_with_formatting(source_wb, source_sheet_name, target_wb, target_sheet_name):
-    """Copy entire sheet with all formatting, images, and structure preserved"""
-    source_ws = source_wb[source_sheet_name]
-    target_ws = target_wb.create_sheet(target_sheet_name)
+# One row of certificate-mode input (the MAL_Lim_inn_rader_for_Sertifikat
+# block: the Visma lines of one or more assemblies, split by "1" rows).
+CertificateRow = namedtuple("CertificateRow", "prod_no beskrivelse antall")
+
+# A finished assembly: the hose row, the rows after it up to the next "1"
+# row, the number of hoses (from the MONT row's Antall) and the length of
+# each hose in mm.
+Assembly = namedtuple("Assembly", "hose components hose_count length_mm")
+
+
+def _is_blank(value):
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip() == ""
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _make_assembly(hose, components):
+    # Number of physical hoses, taken from the MONT row's Antall
+    hose_count = 1
+    for comp in components:
+        if normalize_prod_no(comp.prod_no) in MONT_NUMBERS:
+            try:
+                hose_count = int(float(str(comp.antall).replace(",", ".")))
+                break
+            except Exception:
+                hose_count = 1
+
+    # Length per hose = (total quantity / number of hoses) * 1000
+    try:
+        total_qty = float(str(hose.antall).replace(",", "."))
+        length_mm = int((total_qty / hose_count) * 1000)
+    except Exception:
+        length_mm = 1000
+
+    return Assembly(hose, components, hose_count, length_mm)
+
+
+def iter_assemblies(rows):
+    """Group certificate input rows into assemblies as they are read.
+
+    `rows` is any iterable of (Prod.no, Beskrivelse, Antall) tuples, e.g.
+    iter_certificate_rows_xlsx or iter_certificate_rows_text. Rows with an
+    empty Prod.no are skipped; a "1" row ends the current assembly, and the
+    first row after it is the next hose. Each Assembly is yielded as soon
+    as it is complete, so only one is held at a time."""
+    hose = None
+    components = []
+    for prod_no, beskrivelse, antall in rows:
+        if _is_blank(prod_no):
+            continue
+        row = CertificateRow(prod_no, beskrivelse, antall)
+
+        if normalize_prod_no(prod_no) == "1":
+            if hose is not None:
+                yield _make_assembly(hose, components)
+            hose = None
+            components = []
+        elif hose is None:
+            hose = row
+            components = []
+        else:
+            components.append(row)
+
+    if hose is not None:
+        yield _make_assembly(hose, components)
+
+
+# Columns of MAL_Lim_inn_rader_for_Sertifikat.xlsx, assumed for input
+# without a header row.
+CERTIFICATE_TEMPLATE_COLUMNS = ("Prod.no", "Beskrivelse", "Lager", "Antall")
+CERTIFICATE_COLUMNS = ("Prod.no", "Beskrivelse", "Antall")
+
+
+def _certificate_columns(header, columns):
+    """Positions of `columns` in a header row, or None when it is not a
+    header."""
+    names = [str(v).strip() if v is not None else "" for v in header]
+    if "Prod.no" not in names:
+        return None
+    return tuple(names.index(c) if c in names else None for c in columns)
+
+
+def _certificate_rows(rows, columns=CERTIFICATE_COLUMNS):
+    positions = None
+    for i, values in enumerate(rows):
+        values = list(values)
+        if i == 0:
+            positions = _certificate_columns(values, columns)
+            if positions is not None:
+                continue
+            positions = tuple(CERTIFICATE_TEMPLATE_COLUMNS.index(c) for c in columns)
+        yield tuple(
+            values[p] if p is not None and p < len(values) else None for p in positions
+        )
+
+
+def iter_certificate_rows_xlsx(source, columns=CERTIFICATE_COLUMNS):
+    """(Prod.no, Beskrivelse, Antall) - or the given `columns` - for each
+    row of the first sheet of an xlsx (path or binary file), read with a
+    read-only openpyxl workbook so rows are parsed one at a time. The first
+    row is taken as the header if it has a Prod.no column; otherwise the
+    columns are those of CERTIFICATE_TEMPLATE_COLUMNS."""
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        yield from _certificate_rows(wb.worksheets[0].iter_rows(values_only=True), columns)
+    finally:
+        wb.close()
+
+
+def iter_certificate_rows_text(lines, delimiter="\t", columns=CERTIFICATE_COLUMNS):
+    """(Prod.no, Beskrivelse, Antall) - or the given `columns` - for each
+    line of pasted TSV (or CSV with another `delimiter`). `lines` is a
+    string or any iterable of lines, such as an open text file. Without a
+    header line the columns are taken as Prod.no, Beskrivelse, Lager,
+    Antall."""
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    rows = (row for row in csv.reader(lines, delimiter=delimiter) if any(v.strip() for v in row))
+    yield from _certificate_rows(rows, columns)
+
+
+def certificate_data_for_assembly(assembly, catalog, pressure_details):
+    """Certificate cell data for one Assembly, or None when its hose is not
+    in the hose sheet. Coupling rows are looked up in
+    catalog.coupling_prod_no_index; MONT and 900xxx service lines are not
+    couplings. `pressure_details` holds kunde, kundens_best_nr and
+    hydra_ordre_nr; antall_slanger comes from the assembly."""
+    hose_row = catalog.hose_prod_no_index().get(normalize_prod_no(assembly.hose.prod_no))
+    if hose_row is None:
+        return None
+    coupling_rows = catalog.coupling_prod_no_index()
+    hose_count = assembly.hose_count
+
+    # Find the (up to 2) coupling technical rows for the certificate.
+    c_tech_data = []
+    for comp in assembly.components:
+        c_pno = normalize_prod_no(comp.prod_no)
+        if c_pno in MONT_NUMBERS or c_pno.startswith("900"):
+            continue
+
+        tech_row = coupling_rows.get(c_pno)
+        if tech_row is None:
+            continue
+
+        try:
+            comp_qty = float(str(comp.antall).replace(",", "."))
+            per_hose_qty = round(comp_qty / hose_count) if hose_count else round(comp_qty)
+        except Exception:
+            per_hose_qty = 1
+
+        if per_hose_qty >= 2:
+            c_tech_data = [tech_row, tech_row]
+            break
+
+        c_tech_data.append(tech_row)
+        if len(c_tech_data) >= 2:
+            break
+
+    while len(c_tech_data) < 2:
+        c_tech_data.append(None)
+
+    # Auto-detect stål/syrefast from Kupling 1
+    kupling1_desc = c_tech_data[0].get("Beskrivelse", "") if c_tech_data[0] else ""
+    material = detect_material(kupling1_desc)
+
+    return fill_pressure_test_certificate_data(
+        dict(pressure_details, antall_slanger=hose_count),
+        hose_row,
+        c_tech_data,
+        str(hose_row.get("Dimensjon", "00")).zfill(2),
+        assembly.length_mm,
+        material,
+    )
+
+
+def iter_certificates(rows, catalog, pressure_details):
+    """(sheet_name, certificate_data) for each assembly in `rows` (see
+    iter_assemblies) whose hose is in the catalog, produced while the rows
+    are still being read. Sheets are named Cert_{n}_{hose Prod.no}, where
+    n counts every assembly, including skipped ones."""
+    for idx, assembly in enumerate(iter_assemblies(rows)):
+        certificate_data = certificate_data_for_assembly(assembly, catalog, pressure_details)
+        if certificate_data is not None:
+            h_pno = normalize_prod_no(assembly.hose.prod_no)
+            yield f"Cert_{idx + 1}_{h_pno}"[:31], certificate_data
+
+
+# -------------------------------------------------
+# EXCEL OUTPUT
+# -------------------------------------------------
 
-    # Copy all cell data and formatting
+class SheetTemplate:
+    """A parsed template workbook, shared read-only by every sheet cloned
+    from it. The image bytes are kept separately: openpyxl closes an
+    image's stream when it is saved, so each clone gets fresh Image
+    objects (see images())."""
+
+    __slots__ = ("path", "stamp", "workbook", "worksheet", "image_data")
+
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        self.stamp = (stat.st_size, stat.st_mtime_ns)
+        self.workbook = openpyxl.load_workbook(path)
+        self.worksheet = self.workbook[self.workbook.sheetnames[0]]
+        self.image_data = [
+            (image._data(), image.anchor, image.width, image.height)
+            for image in self.worksheet._images
+        ]
+
+    def images(self):
+        """Fresh Image objects for the template sheet's images."""
+        images = []
+        for data, anchor, width, height in self.image_data:
+            image = Image(io.BytesIO(data))
+            image.width, image.height = width, height
+            image.anchor = copy(anchor)
+            images.append(image)
+        return images
+
+
+_template_cache = {}
+_template_lock = threading.Lock()
+
+
+def _load_cached_template(kind, template_path):
+    key = (kind, os.path.abspath(template_path))
+    try:
+        stat = os.stat(template_path)
+        stamp = (stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        stamp = None
+    with _template_lock:
+        template = _template_cache.get(key)
+        if template is None or template.stamp != stamp:
+            template = kind(template_path)
+            _template_cache[key] = template
+        return template
+
+
+def load_template(template_path):
+    """The SheetTemplate for `template_path`, parsed once per process and
+    re-parsed when the file's size or mtime changes."""
+    return _load_cached_template(SheetTemplate, template_path)
+
+
+def clear_template_cache():
+    with _template_lock:
+        _template_cache.clear()
+
+
+def _register_cell_style(source_cell, target_ws):
+    """Add the font, border, fill, number format, protection and alignment
+    of `source_cell` to the target workbook's style tables; returns the
+    resulting style ids (as a StyleArray)."""
+    scratch = Cell(target_ws)
+    scratch.font = copy(source_cell.font)
+    scratch.border = copy(source_cell.border)
+    scratch.fill = copy(source_cell.fill)
+    scratch.number_format = copy(source_cell.number_format)
+    scratch.protection = copy(source_cell.protection)
+    scratch.alignment = copy(source_cell.alignment)
+    return scratch._style
+
+
+# target workbook -> {template worksheet: clone plan}. The style ids in a
+# plan are only valid in the workbook they were registered in.
+_clone_plans = weakref.WeakKeyDictionary()
+
+
+def _copy_cells(source_ws, target_ws):
+    """Copy cell values, styles and merged ranges. Each distinct template
+    style is registered in the target workbook once; cells with that style
+    then just get its style ids."""
+    styles = {}
     for row in source_ws.iter_rows():
         for source_cell in row:
-            target_cell = target_ws[source_cell.coordinate]
-            target_cell.value = source_cell.value
-
+            style = None
             if source_cell.has_style:
-                target_cell.font = copy(source_cell.font)
-                target_cell.border = copy(source_cell.border)
-                target_cell.fill = copy(source_cell.fill)
-                target_cell.number_format = copy(source_cell.number_format)
-                target_cell.protection = copy(source_cell.protection)
-                target_cell.alignment = copy(source_cell.alignment)
-
-    # Copy merged cells
+                style = styles.get(source_cell._style)
+                if style is None:
+                    style = styles[source_cell._style] = _register_cell_style(source_cell, target_ws)
+            target_ws._add_cell(Cell(
+                target_ws, row=source_cell.row, column=source_cell.column,
+                value=source_cell.value, style_array=style,
+            ))
+
     for merged_range in source_ws.merged_cells.ranges:
         target_ws.merge_cells(str(merged_range))
 
+
+def _clone_plan(target_ws):
+    """Snapshot of a freshly copied sheet: every cell (merged placeholders
+    included, with the borders merge_cells gave them) and the merged
+    ranges."""
+    cells = [
+        (
+            row, column, cell._value, cell.data_type,
+            copy(cell._style) if cell.has_style else None,
+            isinstance(cell, MergedCell),
+        )
+        for (row, column), cell in target_ws._cells.items()
+    ]
+    return cells, [str(merged_range) for merged_range in target_ws.merged_cells.ranges]
+
+
+def _apply_clone_plan(plan, target_ws):
+    cells, merged_ranges = plan
+    target_cells = target_ws._cells
+    for row, column, value, data_type, style, merged in cells:
+        if merged:
+            cell = MergedCell(target_ws, row, column)
+            cell._style = copy(style)
+        else:
+            cell = Cell(target_ws, row=row, column=column, style_array=style)
+            cell._value = value
+            cell.data_type = data_type
+        target_cells[(row, column)] = cell
+    if cells:
+        target_ws._current_row = max(target_ws._current_row, max(c[0] for c in cells))
+    for coord in merged_ranges:
+        target_ws.merged_cells.add(MergedCellRange(target_ws, coord))
+
+
+def copy_sheet_with_formatting(source_wb, source_sheet_name, target_wb, target_sheet_name, images=None):
+    """Copy entire sheet with all formatting, images, and structure preserved.
+    `images` replaces copies of the source sheet's images (used for cached
+    templates, whose image streams cannot be reused)."""
+    source_ws = source_wb[source_sheet_name]
+    target_ws = target_wb.create_sheet(target_sheet_name)
+
+    plans = _clone_plans.setdefault(target_wb, {})
+    plan = plans.get(source_ws)
+    if plan is None:
+        _copy_cells(source_ws, target_ws)
+        plans[source_ws] = _clone_plan(target_ws)
+    else:
+        _apply_clone_plan(plan, target_ws)
+
     # Copy column widths
     for col_letter, col_dimension in source_ws.column_dimensions.items():
         target_col = target_ws.column_dimensions[col_letter]
@@ -518,18 +2124,21 @@ def copy_sheet_with_formatting(source_wb, source_sheet_name, target_wb, target_s
         target_row.height = row_dimension.height
 
     # Copy images/drawings
-    for image in source_ws._images:
-        target_ws.add_image(copy(image), image.anchor)
+    if images is None:
+        images = [copy(image) for image in source_ws._images]
+    for image in images:
+        target_ws.add_image(image, image.anchor)
 
     # Copy page setup and print settings
-    target_ws.page_setup = source_ws.page_setup
+    target_ws.page_setup = copy(source_ws.page_setup)
     target_ws.page_margins = copy(source_ws.page_margins)
 
     return target_ws
 
 
-def create_output_workbook(output_rows):
-    """Create output workbook with data"""
+def create_output_workbook(output_rows=()):
+    """Create output workbook with data. For large orders, create it
+    without rows and stream them in with save_output_workbook instead."""
     wb = openpyxl.Workbook()
     ws = wb.active
     ws.title = "Output"
@@ -551,18 +2160,101 @@ def create_output_workbook(output_rows):
     return wb
 
 
+def _output_sheet_rows(output_rows, date_styles, batch=500):
+    """<row> XML for the Output sheet's header and `output_rows`, joined
+    into chunks of `batch` rows. `date_styles` maps datetime/date to the
+    style id of its number format (see save_output_workbook)."""
+    rows = [[1, ["Prod.no", "Beskrivelse", "Lager", "Antall"]]]
+    for row_num, row_data in enumerate(output_rows, 2):
+        rows.append([row_num, row_data])
+        if len(rows) == batch:
+            yield _output_rows_xml(rows, date_styles)
+            rows = []
+    if rows:
+        yield _output_rows_xml(rows, date_styles)
+
+
+def _output_cell(ref, value, date_styles):
+    """Cell XML for one Output value, written the way openpyxl writes it:
+    blanks (None, "", NaN) are left out, dates get a date number format,
+    and text with characters XML cannot hold raises IllegalCharacterError."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if _is_blank_value(value):
+        return ""
+    if isinstance(value, str) and _ILLEGAL_XML_RE.search(value):
+        raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+    if isinstance(value, (dt, date)):
+        style = date_styles[dt if isinstance(value, dt) else date]
+        return f'<c r="{ref}" s="{style}"><v>{to_excel(value)}</v></c>'
+    return _xml_cell(ref, "", value)
+
+
+def _output_rows_xml(rows, date_styles):
+    return "".join(
+        f'<row r="{row_num}">'
+        + "".join(
+            _output_cell(f"{get_column_letter(col_num)}{row_num}", val, date_styles)
+            for col_num, val in enumerate(row_data, 1)
+        )
+        + "</row>"
+        for row_num, row_data in rows
+    )
+
+
+def save_output_workbook(output_wb, output, output_rows):
+    """Save a workbook from create_output_workbook() to `output` (path or
+    binary file), streaming `output_rows` (any iterable of rows) into its
+    Output sheet. The rows are written to the zip as they are read, so
+    memory stays flat however long the order is; the rest of the workbook
+    (certificates, sluttkontroll) is saved by openpyxl as usual."""
+    # Register the number formats openpyxl gives datetime and date values,
+    # so streamed dates can refer to them.
+    output_ws = output_wb["Output"]
+    date_styles = {}
+    for kind, number_format in ((dt, "yyyy-mm-dd h:mm:ss"), (date, "yyyy-mm-dd")):
+        scratch = Cell(output_ws)
+        scratch.number_format = number_format
+        date_styles[kind] = scratch.style_id
+
+    buffer = io.BytesIO()
+    output_wb.save(buffer)
+    with zipfile.ZipFile(buffer) as source:
+        workbook_xml = source.read("xl/workbook.xml").decode("utf-8")
+        rid = re.search(r'<sheet\b[^>]*?name="Output"[^>]*?r:id="([^"]+)"', workbook_xml).group(1)
+        target = next(
+            attrs["Target"]
+            for _, attrs in _rels(source.read("xl/_rels/workbook.xml.rels").decode("utf-8"))
+            if attrs["Id"] == rid
+        )
+        sheet_part = target.lstrip("/") if target.startswith("/") else _resolve_target("xl/workbook.xml", target)
+
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zf:
+            for info in source.infolist():
+                if info.filename != sheet_part:
+                    zf.writestr(info, source.read(info))
+                    continue
+                sheet_xml = source.read(info).decode("utf-8")
+                sheet_xml = re.sub(r"<dimension\b[^>]*?/>", "", sheet_xml)
+                head, tail = re.split(r"<sheetData\s*/>|<sheetData>.*?</sheetData>", sheet_xml, maxsplit=1, flags=re.S)
+                _zip_part(zf, sheet_part, itertools.chain(
+                    [head, "<sheetData>"], _output_sheet_rows(output_rows, date_styles), ["</sheetData>", tail]
+                ))
+
+
 
 
 
 def add_certificate_sheet(output_wb, template_path, certificate_data, sheet_name):
     """Add certificate sheet from template"""
-    template_wb = openpyxl.load_workbook(template_path)
-    
+    template = load_template(template_path)
+
     cert_ws = copy_sheet_with_formatting(
-        template_wb,
-        template_wb.sheetnames[0],
+        template.workbook,
+        template.worksheet.title,
         output_wb,
-        sheet_name
+        sheet_name,
+        images=template.images(),
     )
 
     # Fill in certificate data
@@ -577,13 +2269,14 @@ def add_certificate_sheet(output_wb, template_path, certificate_data, sheet_name
 
 def add_sluttkontroll_sheet(output_wb, template_path, kunde="", hydra_ordre_nr=""):
     """Add Sluttkontroll sheet from template"""
-    template_wb = openpyxl.load_workbook(template_path)
-    
+    template = load_template(template_path)
+
     slutt_ws = copy_sheet_with_formatting(
-        template_wb,
-        template_wb.sheetnames[0],
+        template.workbook,
+        template.worksheet.title,
         output_wb,
-        "Sluttkontroll Slanger"
+        "Sluttkontroll Slanger",
+        images=template.images(),
     )
 
     # Fill in data
@@ -594,3 +2287,455 @@ def add_sluttkontroll_sheet(output_wb, template_path, kunde="", hydra_ordre_nr="
         pass
 
     return output_wb
+
+
+def write_batch_workbook(order, output, cert_template, slutt_template, pressure_details=None):
+    """Write the workbook for a BatchOrder to `output` (path or binary
+    file): the Output sheet with the order lines, one "Sertifikat {n}"
+    sheet per entry in order.certificates, and the sluttkontroll sheet."""
+    pressure_details = pressure_details or {}
+    wb = create_output_workbook()
+    for i, certificate_data in enumerate(order.certificates, start=1):
+        wb = add_certificate_sheet(wb, cert_template, certificate_data, f"Sertifikat {i}")
+    wb = add_sluttkontroll_sheet(
+        wb, slutt_template,
+        kunde=pressure_details.get("kunde", ""),
+        hydra_ordre_nr=pressure_details.get("hydra_ordre_nr", ""),
+    )
+    save_output_workbook(wb, output, (line.as_row() for line in order.lines))
+
+
+# -------------------------------------------------
+# CERTIFICATE XML BACKEND
+# -------------------------------------------------
+
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+_SHEET_CT = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+_DRAWING_CT = "application/vnd.openxmlformats-officedocument.drawing+xml"
+_ZIP_DATE = (1980, 1, 1, 0, 0, 0)
+
+_RELATIONSHIP_RE = re.compile(r"<Relationship\b[^>]*?/>")
+_ATTR_RE = re.compile(r'(\w+(?::\w+)?)="([^"]*)"')
+_CELL_REF_RE = re.compile(r"[A-Z]{1,3}[1-9]\d*")
+_ILLEGAL_XML_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _rels(xml):
+    """Relationship elements of a .rels part as (xml, {attribute: value})."""
+    return [(m.group(0), dict(_ATTR_RE.findall(m.group(0)))) for m in _RELATIONSHIP_RE.finditer(xml)]
+
+
+def _rels_path(part):
+    folder, name = part.rsplit("/", 1)
+    return f"{folder}/_rels/{name}.rels"
+
+
+def _resolve_target(part, target):
+    parts = part.split("/")[:-1]
+    for piece in target.split("/"):
+        if piece == "..":
+            parts.pop()
+        elif piece != ".":
+            parts.append(piece)
+    return "/".join(parts)
+
+
+def _xml_text(value):
+    return xml_escape(str(value))
+
+
+def _is_blank_value(value):
+    """None, "", NaN, NaT or pd.NA - written as an empty cell."""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return True
+    if isinstance(value, str):
+        return value == ""
+    return isinstance(value, float) and math.isnan(value)
+
+
+def _xml_cell(ref, attrs, value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if _is_blank_value(value):
+        return f'<c r="{ref}"{attrs}/>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{attrs} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Number):
+        return f'<c r="{ref}"{attrs}><v>{value}</v></c>'
+    return f'<c r="{ref}"{attrs} t="inlineStr"><is><t xml:space="preserve">{_xml_text(value)}</t></is></c>'
+
+
+class TemplatePackage:
+    """The certificate template as raw xlsx parts. Stamped sheets are
+    produced by splicing cell XML into the template sheet's XML, without
+    building an openpyxl workbook; see write_certificate_workbook."""
+
+    __slots__ = ("path", "stamp", "parts", "content_types", "workbook_xml",
+                 "workbook_rels", "sheet_xml", "sheet_rels", "drawing_xml",
+                 "drawing_rels", "merged_hidden", "_plans")
+
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        self.stamp = (stat.st_size, stat.st_mtime_ns)
+        with zipfile.ZipFile(path) as zf:
+            raw = {name: zf.read(name) for name in zf.namelist()}
+
+        def text(part):
+            return raw[part].decode("utf-8") if part in raw else ""
+
+        self.content_types = text("[Content_Types].xml")
+        self.workbook_xml = text("xl/workbook.xml")
+        first_sheet = re.search(r"<sheet\b[^>]*?/>", self.workbook_xml).group(0)
+        sheet_rid = dict(_ATTR_RE.findall(first_sheet))["r:id"]
+
+        # Parts shared by every output sheet: whatever the package and the
+        # workbook refer to (styles, theme, shared strings, core
+        # properties), except the sheets, calcChain and app properties.
+        self.parts = {}
+        self.workbook_rels = []
+        sheet_part = None
+        for rel_xml, attrs in _rels(text("_rels/.rels")):
+            target = attrs["Target"].lstrip("/")
+            if target in raw and target not in ("xl/workbook.xml", "docProps/app.xml"):
+                self.parts[target] = raw[target]
+        for rel_xml, attrs in _rels(text(_rels_path("xl/workbook.xml"))):
+            target = _resolve_target("xl/workbook.xml", attrs["Target"])
+            rel_type = attrs["Type"][len(_REL_NS):]
+            if rel_type == "worksheet":
+                if attrs["Id"] == sheet_rid:
+                    sheet_part = target
+            elif rel_type in ("calcChain", "chartsheet", "externalLink"):
+                continue
+            else:
+                self.workbook_rels.append(rel_xml)
+                self.parts[target] = raw[target]
+        self.parts["_rels/.rels"] = raw["_rels/.rels"]
+
+        sheet_xml = text(sheet_part)
+        self.sheet_rels = []
+        self.drawing_xml = None
+        self.drawing_rels = ""
+        for rel_xml, attrs in _rels(text(_rels_path(sheet_part))):
+            rel_type = attrs["Type"][len(_REL_NS):]
+            if rel_type == "printerSettings":
+                # Printer driver blob; dropped, as openpyxl does.
+                sheet_xml = sheet_xml.replace(f' r:id="{attrs["Id"]}"', "")
+            elif rel_type == "drawing":
+                drawing_part = _resolve_target(sheet_part, attrs["Target"])
+                self.drawing_xml = raw[drawing_part]
+                self.drawing_rels = text(_rels_path(drawing_part))
+                for _, image_attrs in _rels(self.drawing_rels):
+                    if image_attrs["Type"] != _REL_NS + "image":
+                        raise ValueError(f"{path}: unsupported drawing relationship {image_attrs['Type']}")
+                    image_part = _resolve_target(drawing_part, image_attrs["Target"])
+                    self.parts[image_part] = raw[image_part]
+                self.sheet_rels.append((rel_xml, attrs["Target"]))
+            elif attrs.get("TargetMode") == "External":
+                self.sheet_rels.append((rel_xml, None))
+            else:
+                raise ValueError(f"{path}: unsupported sheet relationship {rel_type}")
+
+        self.sheet_xml = re.sub(r'(<sheetView\b[^>]*?) tabSelected="1"', r"\1", sheet_xml)
+        self.merged_hidden = set()
+        for ref in re.findall(r'<mergeCell ref="([A-Z]+\d+:[A-Z]+\d+)"/>', self.sheet_xml):
+            cells = list(CellRange(ref).cells)
+            self.merged_hidden.update(f"{get_column_letter(c)}{r}" for r, c in cells[1:])
+        self._plans = {}
+
+    def sheet_plan(self, refs):
+        """The template sheet XML split into literal chunks and holes for
+        `refs` (cell references). A hole is ("cell", ref, attrs, original)
+        or ("tab",) for the tabSelected flag of the first sheet; `original`
+        is the template's XML for the cell ("" if it has none)."""
+        refs = tuple(sorted(ref for ref in set(refs) - self.merged_hidden if _CELL_REF_RE.fullmatch(str(ref))))
+        plan = self._plans.get(refs)
+        if plan is not None:
+            return plan
+
+        xml = self.sheet_xml
+        edits = []  # (start, end, pieces)
+        view = re.search(r"<sheetView\b", xml)
+        if view:
+            edits.append((view.end(), view.end(), [("tab",)]))
+
+        by_row = {}
+        for ref in refs:
+            col, row = coordinate_from_string(ref)
+            by_row.setdefault(row, []).append((column_index_from_string(col), ref))
+
+        for row, cells in sorted(by_row.items()):
+            cells.sort()
+            m = re.search(rf'<row r="{row}"[^>]*?(/>|>(.*?)</row>)', xml, re.S)
+            if m is None:
+                after = next(
+                    (r for r in re.finditer(r'<row r="(\d+)"', xml) if int(r.group(1)) > row), None
+                )
+                pos = after.start() if after else xml.index("</sheetData>")
+                pieces = [f'<row r="{row}">'] + [("cell", ref, "", "") for _, ref in cells] + ["</row>"]
+                edits.append((pos, pos, pieces))
+                continue
+            if m.group(1) == "/>":
+                pos = m.end() - 2
+                pieces = [">"] + [("cell", ref, "", "") for _, ref in cells] + ["</row>"]
+                edits.append((pos, m.end(), pieces))
+                continue
+            inner_start = m.start(2)
+            existing = [
+                (column_index_from_string(c.group(1)), c)
+                for c in re.finditer(r'<c r="([A-Z]+)\d+"([^>]*?)(?:/>|>.*?</c>)', m.group(2), re.S)
+            ]
+            for col, ref in cells:
+                hit = next((c for idx, c in existing if idx == col), None)
+                if hit is not None:
+                    attrs = re.sub(r' t="[^"]*"', "", hit.group(2))
+                    edits.append((inner_start + hit.start(), inner_start + hit.end(), [("cell", ref, attrs, hit.group(0))]))
+                else:
+                    later = next((c for idx, c in existing if idx > col), None)
+                    pos = inner_start + (later.start() if later else len(m.group(2)))
+                    edits.append((pos, pos, [("cell", ref, "", "")]))
+
+        plan = []
+        pos = 0
+        for start, end, pieces in sorted(edits, key=lambda e: (e[0], e[1])):
+            plan.append(xml[pos:start])
+            plan.extend(pieces)
+            pos = end
+        plan.append(xml[pos:])
+        plan = [p.encode("utf-8") if isinstance(p, str) else p for p in plan]
+        self._plans[refs] = plan
+        return plan
+
+
+def load_template_package(template_path):
+    """The TemplatePackage for `template_path` (cached like load_template)."""
+    return _load_cached_template(TemplatePackage, template_path)
+
+
+def _zip_part(zf, name, chunks):
+    info = zipfile.ZipInfo(name, date_time=_ZIP_DATE)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    with zf.open(info, "w") as f:
+        for chunk in chunks:
+            f.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+
+
+def _encoded(chunks):
+    return b"".join(chunk.encode("utf-8") if isinstance(chunk, str) else chunk for chunk in chunks)
+
+
+def _certificate_sheet_parts(package, i, certificate_data):
+    """sheet{i}.xml and its rels for one certificate, as UTF-8 bytes."""
+    chunks = []
+    for piece in package.sheet_plan(certificate_data):
+        if isinstance(piece, bytes):
+            chunks.append(piece)
+        elif piece[0] == "tab":
+            if i == 1:
+                chunks.append(b' tabSelected="1"')
+        else:
+            _, ref, attrs, original = piece
+            value = certificate_data.get(ref)
+            if isinstance(value, str) and _ILLEGAL_XML_RE.search(value):
+                # openpyxl refuses these values and leaves the cell as is
+                chunks.append(original)
+            else:
+                chunks.append(_xml_cell(ref, attrs, value))
+
+    rels = []
+    for rel_xml, target in package.sheet_rels:
+        if target is not None:
+            rel_xml = rel_xml.replace(f'Target="{target}"', f'Target="../drawings/drawing{i}.xml"')
+        rels.append(rel_xml)
+    return _encoded(chunks), _encoded([
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">',
+        *rels, "</Relationships>",
+    ])
+
+
+# Below this many certificates write_certificate_workbook renders serially
+# even when workers are asked for. Only the sheet XML is rendered in the pool,
+# about 0.04 ms of the roughly 0.4 ms a certificate costs in all (compressing
+# and writing stay here), and a spawned worker takes over half a second to
+# start (it imports core, and with it pandas), so four workers only win back
+# their start-up from roughly 30000 certificates.
+PARALLEL_MIN_CERTIFICATES = 30000
+# Certificates sent to a worker at a time.
+CERTIFICATE_SHARD_SIZE = 500
+
+_worker_package = None
+
+
+def _init_certificate_worker(template_path):
+    global _worker_package
+    _worker_package = load_template_package(template_path)
+
+
+def _render_certificate_shard(start, certificate_data_list):
+    return [
+        _certificate_sheet_parts(_worker_package, i, certificate_data)
+        for i, certificate_data in enumerate(certificate_data_list, start=start)
+    ]
+
+
+def _rendered_certificate_sheets(package, template_path, data, workers):
+    """_certificate_sheet_parts for every certificate in the iterable
+    `data`, in order, consuming it as the sheets are written. With
+    workers > 1 and at least PARALLEL_MIN_CERTIFICATES certificates (only
+    that many are read ahead to decide), contiguous shards of
+    CERTIFICATE_SHARD_SIZE are rendered in a process pool, at most two per
+    worker in flight. The results are consumed in shard order and
+    compressed here like the serial ones, so the archive does not depend on
+    which worker finishes first."""
+    if workers:
+        workers = min(workers, os.cpu_count() or 1)
+    data = iter(data)
+    head = []
+    if workers and workers > 1:
+        head = list(itertools.islice(data, PARALLEL_MIN_CERTIFICATES))
+    if len(head) < PARALLEL_MIN_CERTIFICATES:
+        for i, certificate_data in enumerate(itertools.chain(head, data), start=1):
+            yield _certificate_sheet_parts(package, i, certificate_data)
+        return
+
+    data = itertools.chain(head, data)
+    # spawn, not fork: the Streamlit server is multi-threaded.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_certificate_worker,
+        initargs=(template_path,),
+    ) as pool:
+        pending = deque()
+        start = 1
+        for shard in iter(lambda: list(itertools.islice(data, CERTIFICATE_SHARD_SIZE)), []):
+            pending.append(pool.submit(_render_certificate_shard, start, shard))
+            start += len(shard)
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def write_certificate_workbook(template_path, certificates, output, workers=None):
+    """Write an xlsx with one stamped copy of the template's first sheet
+    per (sheet_name, certificate_data) in `certificates` to `output` (path
+    or seekable binary file). The template's styles, shared strings and
+    images are written once and shared by all sheets. Produces the same
+    cells as add_certificate_sheet (the openpyxl path), with text written
+    as inline strings. Two differences from that path: the template's
+    <definedNames> (print areas, named ranges) are dropped, since they point
+    at the template's own sheet, and the workbook keeps the template's
+    styles, so the default font of untouched cells is the template's
+    (Aptos Narrow) rather than openpyxl's Calibri.
+
+    `certificates` may be a generator such as iter_certificates: it is
+    consumed as the sheets are written, and only the sheet names are kept.
+    Returns the number of sheets; raises ValueError before anything is
+    written when there are none.
+
+    With `workers`, large jobs render the sheet XML in a process pool (see
+    PARALLEL_MIN_CERTIFICATES); every entry is still compressed and written
+    here through ZipFile, so the file is byte-identical to the serial one."""
+    package = load_template_package(template_path)
+    certificates = iter(certificates)
+    first = next(certificates, None)
+    if first is None:
+        raise ValueError("No certificates to write")
+    certificates = itertools.chain([first], certificates)
+    sheets = []
+    names = set()
+
+    def certificate_data_in_order():
+        for sheet_name, certificate_data in certificates:
+            if sheet_name in names:
+                raise ValueError(f"Duplicate sheet name: {sheet_name}")
+            names.add(sheet_name)
+            sheets.append(sheet_name)
+            yield certificate_data
+
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zf:
+        data = certificate_data_in_order()
+        rendered = _rendered_certificate_sheets(package, template_path, data, workers)
+        for i, (sheet, sheet_rels) in enumerate(rendered, start=1):
+            _zip_part(zf, f"xl/worksheets/sheet{i}.xml", [sheet])
+            _zip_part(zf, f"xl/worksheets/_rels/sheet{i}.xml.rels", [sheet_rels])
+            if package.drawing_xml is not None:
+                _zip_part(zf, f"xl/drawings/drawing{i}.xml", [package.drawing_xml])
+                _zip_part(zf, f"xl/drawings/_rels/drawing{i}.xml.rels", [package.drawing_rels])
+
+        sheet_elements = "".join(
+            f'<sheet name="{xml_escape(name, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rIdSheet{i}"/>'
+            for i, name in enumerate(sheets, start=1)
+        )
+        workbook_xml = re.sub(r"<sheets>.*?</sheets>", f"<sheets>{sheet_elements}</sheets>", package.workbook_xml, flags=re.S)
+        workbook_xml = re.sub(r"<definedNames>.*?</definedNames>", "", workbook_xml, flags=re.S)
+        _zip_part(zf, "xl/workbook.xml", [workbook_xml])
+        _zip_part(zf, "xl/_rels/workbook.xml.rels", [
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">',
+            *package.workbook_rels,
+            *(
+                f'<Relationship Id="rIdSheet{i}" Type="{_REL_NS}worksheet" Target="worksheets/sheet{i}.xml"/>'
+                for i in range(1, len(sheets) + 1)
+            ),
+            "</Relationships>",
+        ])
+
+        overrides = []
+        for i in range(1, len(sheets) + 1):
+            overrides.append(f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="{_SHEET_CT}"/>')
+            if package.drawing_xml is not None:
+                overrides.append(f'<Override PartName="/xl/drawings/drawing{i}.xml" ContentType="{_DRAWING_CT}"/>')
+        content_types = "".join(
+            m.group(0) for m in re.finditer(r"<Default\b[^>]*?/>|<Override\b[^>]*?/>", package.content_types)
+            if not m.group(0).startswith("<Override")
+            or re.search(r'PartName="/([^"]+)"', m.group(0)).group(1) in package.parts
+            or 'PartName="/xl/workbook.xml"' in m.group(0)
+            or 'PartName="/docProps/app.xml"' in m.group(0)
+        )
+        _zip_part(zf, "[Content_Types].xml", [
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">',
+            content_types, *overrides, "</Types>",
+        ])
+        _zip_part(zf, "docProps/app.xml", [
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+            "<Application>Microsoft Excel</Application></Properties>",
+        ])
+        for name, data in package.parts.items():
+            _zip_part(zf, name, [data])
+    return len(sheets)
+
+
+def build_certificate_workbook(template_path, certificates, backend="xml", workers=None):
+    """xlsx bytes with one certificate sheet per (sheet_name,
+    certificate_data). backend="xml" uses write_certificate_workbook (with
+    `workers`); backend="openpyxl" builds it with add_certificate_sheet,
+    the reference implementation."""
+    buffer = io.BytesIO()
+    if backend == "xml":
+        write_certificate_workbook(template_path, certificates, buffer, workers=workers)
+        return buffer.getvalue()
+    if backend != "openpyxl":
+        raise ValueError(f"Unknown certificate backend: {backend}")
+
+    output_wb = openpyxl.Workbook()
+    for sheet_name, certificate_data in certificates:
+        output_wb = add_certificate_sheet(output_wb, template_path, certificate_data, sheet_name)
+    if "Sheet" in output_wb.sheetnames and len(output_wb.sheetnames) > 1:
+        del output_wb["Sheet"]
+    output_wb.active = 0
+    output_wb.save(buffer)
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python core.py [Slanger_hylser.xlsx] [kuplinger_316.xlsx]
+    args = sys.argv[1:] or ["Slanger_hylser.xlsx", "kuplinger_316.xlsx"]
+    compile_catalog(*args)
+    print(f"Katalog kompilert til {CATALOG_CACHE_DIR}/")
@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 
 
+import hashlib
 import io
+import itertools
 import json
+import logging
+import os
 from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
-import openpyxl
 import streamlit as st
 
 import html
@@ -15,12 +18,15 @@ import streamlit.components.v1 as components
 
 import core
 
+logger = logging.getLogger(__name__)
+
 # =====================================================================
 # CONFIG
 # =====================================================================
 
 st.set_page_config(page_title="Slangeprogram", layout="wide", page_icon="assets/HP_icon.ico")
 
+BASE_DIR = Path(__file__).resolve().parent
 FIRST_FILE = "Slanger_hylser.xlsx"
 SECOND_FILE = "kuplinger_316.xlsx"
 CERT_TEMPLATE = "Mal Trykktest Sertikat.xlsx"
@@ -28,6 +34,27 @@ SLUTT_TEMPLATE = "Mal sluttkontroll slanger.xlsx"
 FLER_SLANGE_MAL = "MAL_slangebeskrivelse_flere_rader.xlsx"
 SERTIFIKAT_MAL = "MAL_Lim_inn_rader_for_Sertifikat.xlsx"
 
+
+def env_workers(name):
+    """Process count from the environment variable `name`. Unset, blank
+    or not a number means None (serial)."""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Ignoring %s=%r: not a whole number", name, value)
+        return None
+
+
+# Processes used to resolve very large batch uploads (see
+# core.PARALLEL_MIN_LINES); unset = serial.
+RESOLVE_WORKERS = env_workers("SLANGE_RESOLVE_WORKERS")
+# Processes used to render very large certificate jobs (see
+# core.PARALLEL_MIN_CERTIFICATES); unset = serial.
+CERTIFICATE_WORKERS = env_workers("SLANGE_CERTIFICATE_WORKERS")
+
 MODE_LABELS = {
     "quick": "⌨️ Skriv inn Slangebeskrivelse",
     "full": "🖱 Velg Slange og Kuplinger",
@@ -145,25 +172,32 @@ def inject_theme():
 # DATA LOADING
 # =====================================================================
 
-@st.cache_data
-def load_all():
+@st.cache_resource(max_entries=1)
+def _load_catalog(catalog_stamp):
+    """One CatalogStore per server process, shared by all sessions. Each
+    catalog workbook is read exactly once here - nothing else in the app
+    opens Slanger_hylser.xlsx or kuplinger_316.xlsx."""
     try:
-        df1, df2_all = core.load_main_data(FIRST_FILE, SECOND_FILE)
-        mont_df, trykktest_df, prikling_df = core.load_support_sheets(FIRST_FILE)
-        return df1, df2_all, mont_df, trykktest_df, prikling_df
+        return core.CatalogStore.load(
+            FIRST_FILE, SECOND_FILE, cache_dir=str(BASE_DIR / core.CATALOG_CACHE_DIR)
+        )
     except Exception as e:
         st.error(f"Feil ved lasting av data: {e}")
         st.info("Sørg for at Excel-filene er i samme mappe som appen")
         st.stop()
 
 
-def make_cert_row_lookup(abs_sert_df):
-    """Return a function that looks up a row in the ABS Sert. sheet by Prod.no."""
-    def get_cert_row(prod_no):
-        col_a = abs_sert_df.columns[0]  # Prod.no (column A)
-        matches = abs_sert_df[abs_sert_df[col_a].astype(str).str.strip() == str(prod_no)]
-        return matches.iloc[0] if not matches.empty else None
-    return get_cert_row
+def load_catalog():
+    """The shared catalog, reloaded when either workbook changes on disk.
+    A reload gets a new catalog version, which also retires every cached
+    summary-line lookup made against the old one."""
+    try:
+        catalog_stamp = tuple(
+            (Path(p).stat().st_size, Path(p).stat().st_mtime_ns) for p in (FIRST_FILE, SECOND_FILE)
+        )
+    except OSError:
+        catalog_stamp = None
+    return _load_catalog(catalog_stamp)
 
 
 # =====================================================================
@@ -340,14 +374,26 @@ def render_selection_table(df, visible_cols, key, hidden_cols=None, header_map=N
 
 
 
-def get_excel_rows():
+def suggestion_text(suggestions):
+    """Short "mente du ...?" text for the parts of a summary line that did
+    not resolve (see core.suggest_for_summary)."""
+    parts = []
+    for label, found in suggestions.items():
+        options = ", ".join(
+            f"{s['Beskrivelse']} ({core.normalize_prod_no(s['Prod.no'])})" for s in found[:3]
+        )
+        parts.append(f"{label} – mente du: {options}")
+    return "; ".join(parts)
+
+
+def get_excel_rows(catalog):
     """Henter nøyaktig de samme radene som skal inn i Excel-filen for Quick/Full Mode."""
     rows_for_excel = [r.copy() for r in st.session_state.output_rows]
 
     # Legg til ABS-sertifikat-rad hvis den er valgt (nøyaktig lik logikk som Excel-fila)
     if st.session_state.abs_selected_any:
         lager_value = rows_for_excel[-1][2] if rows_for_excel else 3
-        abs_row = st.session_state.get_cert_row("90478")
+        abs_row = catalog.get_cert_row("90478")
         if abs_row is not None:
             rows_for_excel.append(["1", "", lager_value, ""])
             rows_for_excel.append(
@@ -355,39 +401,6 @@ def get_excel_rows():
             )
     return rows_for_excel
 
-def format_output_df(rows):
-    """Formaterer rader slik at:
-    - Prod.no alltid er hele tall (int) uten desimaler.
-    - Antall bruker komma (,) for desimaler.
-    """
-    formatted_rows = []
-    for r in rows:
-        pno, desc, lager, antall = r[0], r[1], r[2], r[3]
-
-        # 1. Prod.no -> Tving til heltall (int)
-        pno_str = ""
-        if pd.notna(pno) and str(pno).strip() != "":
-            try:
-                pno_str = str(int(float(str(pno).replace(",", "."))))
-            except (ValueError, TypeError):
-                pno_str = str(pno).strip()
-
-        # 2. Antall -> Bruk komma (,) for desimaler
-        antall_str = ""
-        if pd.notna(antall) and str(antall).strip() != "":
-            try:
-                f_val = float(str(antall).replace(",", "."))
-                if f_val.is_integer():
-                    antall_str = str(int(f_val))
-                else:
-                    antall_str = f"{f_val:.3f}".rstrip("0").rstrip(".").replace(".", ",")
-            except (ValueError, TypeError):
-                antall_str = str(antall).strip()
-
-        formatted_rows.append([pno_str, desc, lager, antall_str])
-
-    return pd.DataFrame(formatted_rows, columns=["Prod.no", "Beskrivelse", "Lager", "Antall"])
-
 
 def render_jspreadsheet_preview(df):
     """Rendrer et ekte regneark (Excel / Google Sheets-klone) i Streamlit."""
@@ -546,141 +559,33 @@ def jspreadsheet_editor(df, key, height=380, min_rows=12):
 def process_and_add_hose(
     selected_row, second_row1, second_row2, sheet_name_found, size_str,
     length_int, material, lager, pos_mark, posnr, input_linje, inputlinje,
-    pressure_test, pressure_details, antall_slanger, mont_df, trykktest_df,
-    prikling_df, get_cert_row, prikling=False, first_line="", angle="", dnv=False,
+    pressure_test, pressure_details, antall_slanger, catalog,
+    prikling=False, first_line="", angle="", dnv=False,
 ):
     """Build the Visma output rows for one hose assembly and register it in
     session state. Used by Quick mode and Full mode alike."""
-    rows = []
     start_len = len(st.session_state.output_rows)
 
     if pos_mark and posnr:
-        rows.append(["1", f"POS: {posnr}", int(lager), 1])
         try:
             st.session_state.pos_counter = int(posnr) + 1
         except Exception:
             pass
 
-    if input_linje and inputlinje:
-        rows.append(["1", f"{inputlinje}", int(lager), 1])
-
-    if first_line:
-        # Quick mode - the summary line is used as-is
-        rows.append(["1", first_line, int(lager), 1])
-    else:
-        # Full mode - build the summary line from the selected components
-        part1 = str(selected_row["Beskrivelse"])[:7] if selected_row is not None else ""
-        part2 = str(length_int if length_int else "")
-        part3 = (
-            core.adjust_length(str(second_row1["Beskrivelse"]), material)
-            if second_row1 is not None else ""
-        )
-        part4 = (
-            core.adjust_length(str(second_row2["Beskrivelse"]), material)
-            if second_row2 is not None else ""
-        )
-        if angle and angle.strip():
-            first_line_display = f"{part1}/{part2}/{part3}/{part4}/{angle}°"
-        else:
-            first_line_display = f"{part1}/{part2}/{part3}/{part4}"
-        rows.append(["1", first_line_display, int(lager), 1])
-
-    if selected_row is not None:
-        try:
-            qty = round((length_int or 1000) / 1000, 3)
-            rows.append([selected_row["Prod.no"], selected_row["Beskrivelse"], int(lager), qty])
-        except Exception:
-            rows.append(
-                [selected_row.get("Prod.no", ""), selected_row.get("Beskrivelse", ""), int(lager), 1]
-            )
-    else:
-        rows.append(["", "Fant ikke første produkt", int(lager), 1])
+    lines = core.build_assembly_lines(
+        selected_row, second_row1, second_row2, sheet_name_found, size_str,
+        length_int, material, catalog, lager, antall=antall_slanger,
+        pos=posnr if pos_mark and posnr else None,
+        reference=inputlinje if input_linje and inputlinje else None,
+        summary_line=first_line, angle=angle, prikling=prikling,
+        pressure_test=pressure_test, dnv=dnv,
+    )
+    st.session_state.output_rows.extend(line.as_row() for line in lines)
 
     # Kupling 2 missing -> treat it as the same as Kupling 1.
     if second_row1 is not None and second_row2 is None:
         second_row2 = second_row1
 
-    same_coupling = (
-        second_row1 is not None
-        and second_row2 is not None
-        and str(second_row1.get("Prod.no", "")).strip() == str(second_row2.get("Prod.no", "")).strip()
-    )
-
-    if same_coupling:
-        # Kupling 1 and Kupling 2 are the same product (whether because
-        # Kupling 2 was left empty, or the same coupling was picked/typed
-        # for both ends) -> one line, Antall doubled, instead of two lines.
-        rows.append([second_row1["Prod.no"], second_row1["Beskrivelse"], int(lager), 2])
-    else:
-        if second_row1 is not None:
-            rows.append([second_row1["Prod.no"], second_row1["Beskrivelse"], int(lager), 1])
-        else:
-            rows.append(["", "Fant ikke første kupling", int(lager), 1])
-
-        if second_row2 is not None:
-            rows.append([second_row2["Prod.no"], second_row2["Beskrivelse"], int(lager), 1])
-        else:
-            rows.append(["", "Fant ikke andre kupling", int(lager), 1])
-
-    gsm_count = 0
-    if second_row1 is not None and str(second_row1.get("Beskrivelse", "")).startswith("GSM"):
-        gsm_count += 1
-    if second_row2 is not None and str(second_row2.get("Beskrivelse", "")).startswith("GSM"):
-        gsm_count += 1
-
-    if material.lower() == "stål" and selected_row is not None:
-        mat_prod = selected_row.get("Stål hylse(Posd.no)", "")
-        mat_desc = selected_row.get("Stål hylse(beskrivelse)", "")
-    elif selected_row is not None:
-        mat_prod = selected_row.get("316 hylse(Posd.no)", "")
-        mat_desc = selected_row.get("316 hylse(beskrivelse)", "")
-    else:
-        mat_prod = ""
-        mat_desc = ""
-
-    sheet_key = (
-        core._extract_sheet_key_from_sheetname(sheet_name_found)
-        if sheet_name_found else ("(st)" if material == "stål" else "(316)")
-    )
-    skip_staal_hylse = "(M-st)" in sheet_key or "(GSM)" in sheet_key
-
-    if gsm_count < 2 and not skip_staal_hylse and mat_prod:
-        stahl_value = 2 if gsm_count == 0 else 1
-        rows.append([mat_prod, mat_desc, int(lager), stahl_value])
-
-    mont_row = core.get_mont_row(size_str, sheet_key, mont_df)
-    if mont_row is not None:
-        rows.append([mont_row["Prod.no"], mont_row["Beskrivelse"], int(lager), 1])
-
-    if prikling and size_str:
-        prikling_row = core.get_prikling_row(size_str, prikling_df)
-        if prikling_row is not None:
-            rows.append([prikling_row["Prod.no"], prikling_row["Beskrivelse"], int(lager), 1])
-
-    if dnv:
-        dnv_cert_row = get_cert_row("90003")
-        if dnv_cert_row is not None:
-            rows.append(
-                [dnv_cert_row.get("Prod.no", ""), dnv_cert_row.get("Beskrivelse", ""), int(lager), 1]
-            )
-
-    if pressure_test:
-        trykktest_row = core.get_trykktest_prodno(size_str, length_int or 1000, trykktest_df)
-        if trykktest_row is not None:
-            rows.append(
-                [trykktest_row["Prod.no"], trykktest_row["Beskrivelse"], int(lager), 1]
-            )
-        else:
-            rows.append(["", "Trykktest: Ja", int(lager), 1])
-
-    rows.append(["1", "", int(lager), ""])
-
-    if antall_slanger and antall_slanger != 1:
-        for r in rows:
-            core._multiply_row_quantity(r, antall_slanger)
-
-    st.session_state.output_rows.extend(rows)
-
     if pressure_test:
         st.session_state.certificate_data_list.append({
             "selected_row": selected_row,
@@ -695,30 +600,38 @@ def process_and_add_hose(
     st.session_state.output_batches.append(end_len - start_len)
 
 
-def generate_excel():
-    # Bruker nå hjelpefunksjonen slik at vi får nøyaktig samme rader uansett om vi laster ned eller kopierer
-    rows_for_excel = get_excel_rows()
-
-    output_wb = core.create_output_workbook(
-        [[r[0], r[1], r[2], r[3]] for r in rows_for_excel]
-    )
-
-    # Add ABS cert row (only once, always at the bottom)
-    if st.session_state.abs_selected_any:
-        lager_value = rows_for_excel[-1][2] if rows_for_excel else 3
-        abs_row = st.session_state.get_cert_row("90478")
-        if abs_row is not None:
-            rows_for_excel.append(["1", "", lager_value, ""])
-            rows_for_excel.append(
-                [abs_row.get("Prod.no", ""), abs_row.get("Beskrivelse", ""), lager_value, 1]
-            )
-
-    output_wb = core.create_output_workbook(
-        [[r[0], r[1], r[2], r[3]] for r in rows_for_excel]
-    )
-
-    if st.session_state.certificate_data_list:
-        for idx, cert_info in enumerate(st.session_state.certificate_data_list, 1):
+def _state_repr(value):
+    """Plain, fully expanded form of a piece of session state (Series rows
+    included) for hashing; repr() of a Series may be truncated."""
+    if isinstance(value, pd.Series):
+        return tuple(value.items())
+    if isinstance(value, dict):
+        return sorted((key, _state_repr(v)) for key, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_state_repr(v) for v in value]
+    return value
+
+
+def order_state_key(rows_for_excel, certificate_data_list):
+    """Content hash of everything that goes into the output workbook: the
+    order rows, the certificate inputs and today's date (printed on the
+    certificates)."""
+    h = hashlib.sha256()
+    h.update(datetime.now().strftime("%d.%m.%Y").encode())
+    h.update(repr(rows_for_excel).encode())
+    h.update(repr(_state_repr(certificate_data_list)).encode())
+    return h.hexdigest()
+
+
+def generate_excel(rows_for_excel, certificate_data_list):
+    """Output workbook (Output sheet, certificates, sluttkontroll) as xlsx
+    bytes. Does not touch session state or st.* calls, so it can run as a
+    deferred download outside the script thread; a sheet that cannot be
+    added is logged and left out."""
+    output_wb = core.create_output_workbook()
+
+    if certificate_data_list:
+        for idx, cert_info in enumerate(certificate_data_list, 1):
             try:
                 cert_data = core.fill_pressure_test_certificate_data(
                     cert_info["pressure_details"],
@@ -731,40 +644,47 @@ def generate_excel():
                 if cert_data:
                     sheet_name = (
                         f"Sertifikat {idx}"
-                        if len(st.session_state.certificate_data_list) > 1
+                        if len(certificate_data_list) > 1
                         else "Trykktest Sertifikat"
                     )
                     output_wb = core.add_certificate_sheet(
                         output_wb, CERT_TEMPLATE, cert_data, sheet_name
                     )
-            except Exception as e:
-                st.warning(f"Kunne ikke legge til sertifikat {idx}: {e}")
+            except Exception:
+                logger.exception("Kunne ikke legge til sertifikat %s", idx)
 
     try:
         kunde = ""
         hydra_ordre_nr = ""
-        if st.session_state.certificate_data_list:
-            kunde = st.session_state.certificate_data_list[0]["pressure_details"].get("kunde", "")
-            hydra_ordre_nr = st.session_state.certificate_data_list[0]["pressure_details"].get(
+        if certificate_data_list:
+            kunde = certificate_data_list[0]["pressure_details"].get("kunde", "")
+            hydra_ordre_nr = certificate_data_list[0]["pressure_details"].get(
                 "hydra_ordre_nr", ""
             )
         output_wb = core.add_sluttkontroll_sheet(
             output_wb, SLUTT_TEMPLATE, kunde=kunde, hydra_ordre_nr=hydra_ordre_nr
         )
-    except Exception as e:
-        st.warning(f"Kunne ikke legge til sluttkontroll: {e}")
+    except Exception:
+        logger.exception("Kunne ikke legge til sluttkontroll")
 
     output_buffer = io.BytesIO()
-    output_wb.save(output_buffer)
-    output_buffer.seek(0)
-    return output_buffer
+    core.save_output_workbook(
+        output_wb, output_buffer, ([r[0], r[1], r[2], r[3]] for r in rows_for_excel)
+    )
+    return output_buffer.getvalue()
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_excel(order_key, _rows_for_excel, _certificate_data_list):
+    """generate_excel, memoized on order_state_key()."""
+    return generate_excel(_rows_for_excel, _certificate_data_list)
 
 
 # =====================================================================
 # QUICK MODE
 # =====================================================================
 
-def render_quick_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_row):
+def render_quick_mode(catalog):
     st.header("➕ Skriv in Slangebeskrivelse")
 
     c1, c2 = st.columns(2)
@@ -804,7 +724,9 @@ def render_quick_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert
             st.error("Første utdata-linje må oppgis!")
         else:
             try:
-                result = core.find_matches_from_summary(first_line, df1, df2_all)
+                result = core.find_matches_from_summary(
+                    first_line, catalog.df1, catalog.df2_all, catalog=catalog
+                )
                 if result and result[0] is not None:
                     (
                         selected_row, second_row1, second_row2,
@@ -822,19 +744,29 @@ def render_quick_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert
                         length_int, material, settings["lager"], settings["pos_mark"],
                         settings["posnr"], settings["input_linje"], settings["inputlinje"],
                         pressure_test, pressure_details, settings["antall_slanger"],
-                        mont_df, trykktest_df, prikling_df, get_cert_row,
-                        prikling=prikling, first_line=first_line, dnv=type_approval,
+                        catalog, prikling=prikling, first_line=first_line, dnv=type_approval,
                     )
 
                     if type_approval1:
                         st.session_state.abs_selected_any = True
 
                     st.success(f"✅ Slange lagt til! ({len(st.session_state.output_rows)} rader)")
+                    if second_row1 is None:
+                        hint = suggestion_text(
+                            core.suggest_for_summary(first_line, catalog, result=result)
+                        )
+                        if hint:
+                            st.info(f"💡 Fant ikke kupling. {hint}")
                 else:
                     st.error(
                         "❌ Kunne ikke tolke slangebeskrivelsen. "
                         "Sjekk at formatet er riktig (Slange-Lengde-Kupling-Kupling)."
                     )
+                    hint = suggestion_text(
+                        core.suggest_for_summary(first_line, catalog, result=result)
+                    )
+                    if hint:
+                        st.info(f"💡 {hint}")
             except Exception as e:
                 st.error(f"⚠️ En feil oppstod under tolking: {e}")
 
@@ -843,7 +775,7 @@ def render_quick_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert
 # FULL MODE
 # =====================================================================
 
-def render_full_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_row):
+def render_full_mode(catalog):
     st.header("📝 Velg Slange og Kuplinger")
     st.subheader("1️⃣ Velg slange")
 
@@ -855,7 +787,7 @@ def render_full_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_
 
     search = st.text_input("Søk etter slange", key="full_search")
 
-    filtered_df = df1.copy()
+    filtered_df = catalog.df1.copy()
     dnv_col, abs_col = "Type Approval", "Type Approval1"
 
     if type_approval and type_approval1:
@@ -914,14 +846,14 @@ def render_full_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_
 
     size = str(selected_row["Dimensjon"]).zfill(2)
     sheet_name = core.determine_coupling_sheet_name(
-        selected_row, material, type_approval, FIRST_FILE
+        selected_row, material, type_approval, catalog
     )
 
-    if sheet_name not in df2_all:
+    if sheet_name not in catalog.df2_all:
         st.error(f"Fant ikke ark: {sheet_name}")
         return
 
-    df2 = df2_all[sheet_name]
+    df2 = catalog.df2_all[sheet_name]
     st.session_state.full_df2 = df2
 
     st.divider()
@@ -996,8 +928,8 @@ def render_full_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_
             selected_row, row_c1, row_c2, sheet_name, size, length, material,
             settings["lager"], settings["pos_mark"], settings["posnr"],
             settings["input_linje"], settings["inputlinje"], pressure_test,
-            pressure_details, settings["antall_slanger"], mont_df, trykktest_df,
-            prikling_df, get_cert_row, prikling=prikling, first_line="",
+            pressure_details, settings["antall_slanger"], catalog,
+            prikling=prikling, first_line="",
             angle=angle, dnv=type_approval,
         )
 
@@ -1015,7 +947,7 @@ def render_full_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_
 # CERTIFICATE PASTE MODE
 # =====================================================================
 
-def render_certificate_mode(df1, df2_all, get_cert_row):
+def render_certificate_mode(catalog):
     st.header("📋 Lim inn rader for Sertifikat")
 
     with open(SERTIFIKAT_MAL, "rb") as file:
@@ -1035,12 +967,15 @@ def render_certificate_mode(df1, df2_all, get_cert_row):
     # Laster opp fil HVIS den finnes, ellers lager vi en tom tabell med riktig format
     if uploaded_cert_file is not None:
         try:
-            st.session_state.cert_df = pd.read_excel(uploaded_cert_file)
+            st.session_state.cert_df = pd.DataFrame(
+                core.iter_certificate_rows_xlsx(uploaded_cert_file, columns=core.CERTIFICATE_TEMPLATE_COLUMNS),
+                columns=core.CERTIFICATE_TEMPLATE_COLUMNS,
+            )
         except Exception as e:
             st.error(f"Kunne ikke lese Excel: {e}")
             return
     elif "cert_df" not in st.session_state:
-        st.session_state.cert_df = pd.DataFrame(columns=["Prod.no", "Beskrivelse", "Lager", "Antall"])
+        st.session_state.cert_df = pd.DataFrame(columns=core.CERTIFICATE_TEMPLATE_COLUMNS)
 
     st.subheader("Importerte rader (Rediger eller lim inn fra Excel)")
 
@@ -1074,126 +1009,29 @@ def render_certificate_mode(df1, df2_all, get_cert_row):
         st.warning("Tabellen er tom.")
         return
 
-    # 1. Group rows into hose/component blocks
-    assemblies = []
-    current_hose_row = None
-    current_components = []
-
-    for _, row in df_clean.iterrows():
-        p_no = core.normalize_prod_no(row["Prod.no"])
-
-        if p_no == "1":
-            if current_hose_row is not None:
-                assemblies.append({"hose": current_hose_row, "components": current_components})
-            current_hose_row = None
-            current_components = []
-            continue
-
-        if current_hose_row is None:
-            current_hose_row = row
-            current_components = []
-        else:
-            current_components.append(row)
-
-    if current_hose_row is not None:
-        assemblies.append({"hose": current_hose_row, "components": current_components})
-
-    # 2. Generate one certificate sheet per assembly
-    output_wb = openpyxl.Workbook()
-    success_count = 0
-
-    for idx, asm in enumerate(assemblies):
-        h_pno = core.normalize_prod_no(asm["hose"]["Prod.no"])
-        h_match = df1[df1["Prod.no"].apply(core.normalize_prod_no) == h_pno]
-
-        if h_match.empty:
-            continue
-
-        # Number of physical hoses, taken from the MONT row's Antall
-        real_antall = 1
-        for comp in asm["components"]:
-            if core.normalize_prod_no(comp["Prod.no"]) in core.MONT_NUMBERS:
-                try:
-                    val_str = str(comp["Antall"]).replace(",", ".")
-                    real_antall = int(float(val_str))
-                    break
-                except Exception:
-                    real_antall = 1
-
-        # Length per hose = (total quantity / number of hoses) * 1000
-        try:
-            hose_qty_str = str(asm["hose"]["Antall"]).replace(",", ".")
-            total_qty = float(hose_qty_str)
-            length_mm = int((total_qty / real_antall) * 1000)
-        except Exception:
-            length_mm = 1000
-
-        # Find the (up to 2) coupling technical rows for the certificate.
-        c_tech_data = []
-        for comp in asm["components"]:
-            c_pno = core.normalize_prod_no(comp["Prod.no"])
-            if c_pno in core.MONT_NUMBERS or c_pno.startswith("900"):
-                continue
-
-            tech_row = None
-            for sheet in df2_all.values():
-                m = sheet[sheet["Prod.no"].apply(core.normalize_prod_no) == c_pno]
-                if not m.empty:
-                    tech_row = m.iloc[0].to_dict()
-                    break
-
-            if tech_row is None:
-                continue
+    # Group the rows into assemblies ("1" rows end each one) and build one
+    # certificate per assembly whose hose is in the catalog.
+    columns = [
+        df_editor[c] if c in df_editor.columns else [None] * len(df_editor)
+        for c in ("Prod.no", "Beskrivelse", "Antall")
+    ]
+    pressure_details = {
+        "kunde": kunde,
+        "kundens_best_nr": kundens_best_nr,
+        "hydra_ordre_nr": hydra_ordre_nr,
+    }
+    certificates = core.iter_certificates(zip(*columns), catalog, pressure_details)
+    first = next(certificates, None)
 
-            try:
-                comp_qty = float(str(comp.get("Antall", 1)).replace(",", "."))
-                per_hose_qty = round(comp_qty / real_antall) if real_antall else round(comp_qty)
-            except Exception:
-                per_hose_qty = 1
-
-            if per_hose_qty >= 2:
-                c_tech_data = [tech_row, tech_row]
-                break
-
-            c_tech_data.append(tech_row)
-            if len(c_tech_data) >= 2:
-                break
-
-        if len(c_tech_data) == 1:
-            c_tech_data.append(None)
-
-        # Auto-detect stål/syrefast from Kupling 1
-        kupling1_desc = c_tech_data[0].get("Beskrivelse", "") if c_tech_data[0] else ""
-        material = core.detect_material(kupling1_desc)
-
-        cert_data = core.fill_pressure_test_certificate_data(
-            {
-                "kunde": kunde,
-                "kundens_best_nr": kundens_best_nr,
-                "hydra_ordre_nr": hydra_ordre_nr,
-                "antall_slanger": real_antall,
-            },
-            h_match.iloc[0].to_dict(),
-            c_tech_data,
-            str(h_match.iloc[0].get("Dimensjon", "00")).zfill(2),
-            length_mm,
-            material,
+    if first is not None:
+        buffer = io.BytesIO()
+        count = core.write_certificate_workbook(
+            CERT_TEMPLATE, itertools.chain([first], certificates), buffer, workers=CERTIFICATE_WORKERS
         )
-
-        sheet_name = f"Cert_{idx + 1}_{h_pno}"[:31]
-        output_wb = core.add_certificate_sheet(output_wb, CERT_TEMPLATE, cert_data, sheet_name)
-        success_count += 1
-
-    if success_count > 0:
-        if "Sheet" in output_wb.sheetnames:
-            del output_wb["Sheet"]
-        output_wb.active = 0
-        buf = io.BytesIO()
-        output_wb.save(buf)
-        st.success(f"✅ Generert {success_count} sertifikater med korrekt antall/lengde!")
+        st.success(f"✅ Generert {count} sertifikater med korrekt antall/lengde!")
         st.download_button(
             "⬇️ Last ned",
-            buf.getvalue(),
+            buffer.getvalue(),
             file_name=f"sertifikater_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             use_container_width=True,
@@ -1203,7 +1041,35 @@ def render_certificate_mode(df1, df2_all, get_cert_row):
 # EXCEL BATCH MODE
 # =====================================================================
 
-def render_excel_batch_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_row):
+def warn_unresolved(unresolved, catalog):
+    """One warning per batch line whose hose or Kupling 1 was not found,
+    with 'did you mean' suggestions."""
+    for res in unresolved:
+        summary_line = res["Slangebeskrivelse"]
+        hint = suggestion_text(core.suggest_for_summary(
+            summary_line, catalog, result=(res["hose_row"], res["coupling1_row"])
+        ))
+        what = "slange" if res["hose_row"] is None else "kupling"
+        st.warning(f"Fant ikke {what}: {summary_line}" + (f" – {hint}" if hint else ""))
+
+
+def batch_order(import_df, options, pressure_details, catalog):
+    """core.build_batch_order for the batch table, kept in session_state
+    under a content hash of the table, options and catalog version, so
+    "Generer Output" reuses the result of "Forhåndsvis Output" when
+    nothing has changed in between."""
+    key = core.batch_order_key(import_df, catalog, pressure_details=pressure_details, **options)
+    cached = st.session_state.get("batch_order")
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    order = core.build_batch_order(
+        import_df, catalog, pressure_details=pressure_details, workers=RESOLVE_WORKERS, **options
+    )
+    st.session_state.batch_order = (key, order)
+    return order
+
+
+def render_excel_batch_mode(catalog):
     st.header("📂 Excel – flere slanger")
 
     with open(FLER_SLANGE_MAL, "rb") as file:
@@ -1265,6 +1131,8 @@ def render_excel_batch_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, ge
         with c2:
             pressure_details["hydra_ordre_nr"] = st.text_input("Hydra Ordre.nr")
 
+    options = dict(trykktest=add_trykktest, prikling=add_prikling, abs_cert=add_abs, dnv=add_dnv)
+
     st.divider()
     
     st.divider()
@@ -1272,132 +1140,24 @@ def render_excel_batch_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, ge
     
     if st.button("🔍 Forhåndsvis Output", key="batch_preview_btn"):
         # Build output rows exactly as the generate flow does, but do not write files
-        preview_output_rows = []
-        preview_certificate_data_list = []
-    
-        for _, row in import_df.iterrows():
-            summary_line = str(row.get("Slangebeskrivelse", "")).strip()
-            if summary_line == "" or summary_line.lower() == "nan":
-                continue
-    
-            antall = row.get("Antall", 1)
-            try:
-                antall = int(antall)
-            except Exception:
-                try:
-                    antall = int(float(str(antall).replace(",", ".")))
-                except Exception:
-                    antall = 1
-    
-            pos_nr = row.get("POS.nr", "")
-            kundes_del_nr = row.get("Kundes delnummer", "")
-            lager_nr = row.get("Lager", "")
-    
-            selected_row, second_row1, second_row2, sheet_name, size_str, length_int, material = (
-                core.find_matches_from_summary(summary_line, df1, df2_all)
-            )
-    
-            if selected_row is None:
-                st.warning(f"Fant ikke slange: {summary_line}")
-                continue
-    
-            second_rows = [second_row1, second_row2]
-    
-            if pos_nr and str(pos_nr).lower() != "nan":
-                preview_output_rows.append(["1", pos_nr, lager_nr, ""])
-            if kundes_del_nr and str(kundes_del_nr).lower() != "nan":
-                preview_output_rows.append(["1", kundes_del_nr, lager_nr, ""])
-    
-            preview_output_rows.append(["1", summary_line, lager_nr, 1])
-    
-            hose_qty = length_int / 1000 if length_int else 1
-            preview_output_rows.append([selected_row["Prod.no"], selected_row["Beskrivelse"], lager_nr, hose_qty])
-    
-            # Kupling 2 missing -> treat it as the same as Kupling 1.
-            if second_row1 is not None and second_row2 is None:
-                second_row2 = second_row1
-                second_rows = [second_row1, second_row2]
-    
-            same_coupling = (
-                second_row1 is not None
-                and second_row2 is not None
-                and str(second_row1.get("Prod.no", "")).strip() == str(second_row2.get("Prod.no", "")).strip()
-            )
-    
-            if same_coupling:
-                preview_output_rows.append([second_row1["Prod.no"], second_row1["Beskrivelse"], lager_nr, 2 * antall])
-            else:
-                for r in second_rows:
-                    if r is None:
-                        continue
-                    preview_output_rows.append([r["Prod.no"], r["Beskrivelse"], lager_nr, antall])
-    
-            gsm_count = sum(
-                1 for r in second_rows if r is not None and str(r.get("Beskrivelse", "")).startswith("GSM")
-            )
-    
-            if material == "stål":
-                mat_prod = selected_row.get("Stål hylse(Posd.no)", "")
-                mat_desc = selected_row.get("Stål hylse(beskrivelse)", "")
-            else:
-                mat_prod = selected_row.get("316 hylse(Posd.no)", "")
-                mat_desc = selected_row.get("316 hylse(beskrivelse)", "")
-    
-            sheet_key = core._extract_sheet_key_from_sheetname(sheet_name)
-            skip_staal_hylse = "(M-st)" in sheet_key or "(GSM)" in sheet_key
-    
-            if gsm_count < 2 and not skip_staal_hylse and mat_prod:
-                hylse_qty = 2 if gsm_count == 0 else 1
-                preview_output_rows.append([mat_prod, mat_desc, lager_nr, hylse_qty * antall])
-    
-            mont_row = core.get_mont_row(size_str, sheet_name, mont_df)
-            if mont_row is not None:
-                preview_output_rows.append([mont_row["Prod.no"], mont_row["Beskrivelse"], lager_nr, antall])
-    
-            # Prikling / trykktest / DNV handled only if those options are set in the UI.
-            # For preview we use the current checkboxes in the batch UI: add_prikling, add_trykktest, add_dnv (already available)
-            if add_trykktest:
-                tryck_row = core.get_trykktest_prodno(size_str, length_int, trykktest_df)
-                if tryck_row is not None:
-                    preview_output_rows.append([tryck_row["Prod.no"], tryck_row["Beskrivelse"], lager_nr, antall])
-    
-            if add_prikling:
-                prikling_row = core.get_prikling_row(size_str, prikling_df)
-                if prikling_row is not None:
-                    preview_output_rows.append([prikling_row["Prod.no"], prikling_row["Beskrivelse"], lager_nr, antall])
-    
-            if add_dnv:
-                dnv_cert_row = get_cert_row("90003")
-                if dnv_cert_row is not None:
-                    preview_output_rows.append(
-                        [dnv_cert_row.get("Prod.no", ""), dnv_cert_row.get("Beskrivelse", ""), lager_nr, antall]
-                    )
-    
-            preview_output_rows.append([1, "", lager_nr, ""])
-    
+        order = batch_order(import_df, options, pressure_details, catalog)
+        warn_unresolved(order.unresolved, catalog)
+        preview_output_rows = [line.as_row() for line in order.lines]
+
         if not preview_output_rows:
             st.warning("Ingen rader generert for forhåndsvisning.")
         else:
-            # If ABS/DNV cert options are present, show that last rows would be appended (optional)
-            last_lager = preview_output_rows[-1][2] if preview_output_rows else ""
-            if add_abs:
-                abs_cert_row = get_cert_row("90478")
-                if abs_cert_row is not None:
-                    preview_output_rows.append(["1", "", last_lager, ""])
-                    preview_output_rows.append(
-                        [abs_cert_row.get("Prod.no", ""), abs_cert_row.get("Beskrivelse", ""), last_lager, 1]
-                    )
-            if add_dnv:
-                dnv_cert_row = get_cert_row("90003")
-                if dnv_cert_row is not None:
-                    preview_output_rows.append(["1", "", last_lager, ""])
-                    preview_output_rows.append(
-                        [dnv_cert_row.get("Prod.no", ""), dnv_cert_row.get("Beskrivelse", ""), last_lager, 1]
-                    )
-    
             # Format and render the exact same jspreadsheet preview as Quick/Full
-            preview_df = format_output_df(preview_output_rows)
+            preview_df = core.format_output_df(preview_output_rows)
             render_jspreadsheet_preview(preview_df)
+            st.download_button(
+                "📋 Last ned for Visma (TSV)",
+                core.order_text(preview_output_rows, "tsv"),
+                file_name=f"visma_{datetime.now().strftime('%Y%m%d_%H%M%S')}.tsv",
+                mime="text/tab-separated-values",
+                on_click="ignore",
+                key="batch_visma_tsv",
+            )
     
     
 
@@ -1409,152 +1169,15 @@ def render_excel_batch_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, ge
         st.warning("Tabellen er tom! Fyll inn eller lim inn slanger før du genererer output.")
         return
 
-    output_rows = []
-    certificate_data_list = []
-
-    for _, row in import_df.iterrows():
-        summary_line = str(row.get("Slangebeskrivelse", "")).strip()
-        if summary_line == "" or summary_line.lower() == "nan":
-            continue
+    order = batch_order(import_df, options, pressure_details, catalog)
+    warn_unresolved(order.unresolved, catalog)
 
-        antall = row.get("Antall", 1)
-        try:
-            antall = int(antall)
-        except Exception:
-            antall = 1
-
-        pos_nr = row.get("POS.nr", "")
-        kundes_del_nr = row.get("Kundes delnummer", "")
-        lager_nr = row.get("Lager", "")
-
-        selected_row, second_row1, second_row2, sheet_name, size_str, length_int, material = (
-            core.find_matches_from_summary(summary_line, df1, df2_all)
-        )
-
-        if selected_row is None:
-            st.warning(f"Fant ikke slange: {summary_line}")
-            continue
-
-        second_rows = [second_row1, second_row2]
-
-        if pos_nr and str(pos_nr).lower() != "nan":
-            output_rows.append(["1", pos_nr, lager_nr, ""])
-        if kundes_del_nr and str(kundes_del_nr).lower() != "nan":
-            output_rows.append(["1", kundes_del_nr, lager_nr, ""])
-
-        output_rows.append(["1", summary_line, lager_nr, 1])
-
-        hose_qty = length_int / 1000 if length_int else 1
-        output_rows.append([selected_row["Prod.no"], selected_row["Beskrivelse"], lager_nr, hose_qty])
-
-        # Kupling 2 missing -> treat it as the same as Kupling 1.
-        if second_row1 is not None and second_row2 is None:
-            second_row2 = second_row1
-            second_rows = [second_row1, second_row2]
-
-        same_coupling = (
-            second_row1 is not None
-            and second_row2 is not None
-            and str(second_row1.get("Prod.no", "")).strip() == str(second_row2.get("Prod.no", "")).strip()
-        )
-
-        if same_coupling:
-            # Kupling 1 and Kupling 2 are the same product -> one line,
-            # Antall doubled, instead of two separate lines.
-            output_rows.append([second_row1["Prod.no"], second_row1["Beskrivelse"], lager_nr, 2 * antall])
-        else:
-            for r in second_rows:
-                if r is None:
-                    continue
-                output_rows.append([r["Prod.no"], r["Beskrivelse"], lager_nr, antall])
-
-        gsm_count = sum(
-            1 for r in second_rows if r is not None and str(r.get("Beskrivelse", "")).startswith("GSM")
-        )
-
-        if material == "stål":
-            mat_prod = selected_row.get("Stål hylse(Posd.no)", "")
-            mat_desc = selected_row.get("Stål hylse(beskrivelse)", "")
-        else:
-            mat_prod = selected_row.get("316 hylse(Posd.no)", "")
-            mat_desc = selected_row.get("316 hylse(beskrivelse)", "")
-
-        sheet_key = core._extract_sheet_key_from_sheetname(sheet_name)
-        skip_staal_hylse = "(M-st)" in sheet_key or "(GSM)" in sheet_key
-
-        if gsm_count < 2 and not skip_staal_hylse and mat_prod:
-            hylse_qty = 2 if gsm_count == 0 else 1
-            output_rows.append([mat_prod, mat_desc, lager_nr, hylse_qty * antall])
-
-        mont_row = core.get_mont_row(size_str, sheet_name, mont_df)
-        if mont_row is not None:
-            output_rows.append([mont_row["Prod.no"], mont_row["Beskrivelse"], lager_nr, antall])
-
-        if add_trykktest:
-            trykk_row = core.get_trykktest_prodno(size_str, length_int, trykktest_df)
-            if trykk_row is not None:
-                output_rows.append([trykk_row["Prod.no"], trykk_row["Beskrivelse"], lager_nr, antall])
-
-        if add_prikling:
-            prikling_row = core.get_prikling_row(size_str, prikling_df)
-            if prikling_row is not None:
-                output_rows.append([prikling_row["Prod.no"], prikling_row["Beskrivelse"], lager_nr, antall])
-
-        if add_dnv:
-            dnv_cert_row = get_cert_row("90003")
-            if dnv_cert_row is not None:
-                output_rows.append(
-                    [dnv_cert_row.get("Prod.no", ""), dnv_cert_row.get("Beskrivelse", ""), lager_nr, antall]
-                )
-
-        output_rows.append([1, "", lager_nr, ""])
-
-        if add_trykktest:
-            row_pressure_details = pressure_details.copy()
-            row_pressure_details["antall_slanger"] = antall
-            row_pressure_details["kundes_del_nr"] = kundes_del_nr
-
-            certificate_data = core.fill_pressure_test_certificate_data(
-                row_pressure_details, selected_row, second_rows, size_str, length_int, ""
-            )
-            certificate_data_list.append(certificate_data)
-
-    if not output_rows:
+    if not order.lines:
         st.warning("Ingen rader generert.")
         return
 
-    last_lager = output_rows[-1][2] if output_rows else ""
-
-    if add_abs:
-        abs_cert_row = get_cert_row("90478")
-        if abs_cert_row is not None:
-            output_rows.append(["1", "", last_lager, ""])
-            output_rows.append(
-                [abs_cert_row.get("Prod.no", ""), abs_cert_row.get("Beskrivelse", ""), last_lager, 1]
-            )
-
-    if add_dnv:
-        dnv_cert_row = get_cert_row("90003")
-        if dnv_cert_row is not None:
-            output_rows.append(["1", "", last_lager, ""])
-            output_rows.append(
-                [dnv_cert_row.get("Prod.no", ""), dnv_cert_row.get("Beskrivelse", ""), last_lager, 1]
-            )
-
-    wb = core.create_output_workbook(output_rows)
-
-    if add_trykktest:
-        for i, cert_data in enumerate(certificate_data_list, start=1):
-            wb = core.add_certificate_sheet(wb, CERT_TEMPLATE, cert_data, f"Sertifikat {i}")
-
-    wb = core.add_sluttkontroll_sheet(
-        wb, SLUTT_TEMPLATE,
-        kunde=pressure_details.get("kunde", ""),
-        hydra_ordre_nr=pressure_details.get("hydra_ordre_nr", ""),
-    )
-
     buffer = io.BytesIO()
-    wb.save(buffer)
+    core.write_batch_workbook(order, buffer, CERT_TEMPLATE, SLUTT_TEMPLATE, pressure_details)
     buffer.seek(0)
 
     # Viser antall rader som faktisk hadde innhold
@@ -1573,7 +1196,7 @@ def render_excel_batch_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, ge
 # ORDER PREVIEW (common to Quick / Full / Excel batch)
 # =====================================================================
 
-def render_output_preview():
+def render_output_preview(catalog):
     st.divider()
     if st.session_state.input_mode == "quick":
         st.header("📊 Foreløpig slangestruktur i Visma")
@@ -1584,15 +1207,15 @@ def render_output_preview():
         return
 
     # Hent rader og formater (Prod.no som int, Antall med komma)
-    excel_rows = get_excel_rows()
-    output_df = format_output_df(excel_rows)
+    excel_rows = get_excel_rows(catalog)
+    output_df = core.format_output_df(excel_rows)
 
     st.caption("💡 **Ekte regneark:** Klikk og dra over cellene for å merke dem, og trykk **Ctrl + C** for å kopiere direkte til Visma/Excel.")
 
     # Viser regnearket
     render_jspreadsheet_preview(output_df)
 
-    c1, c2, c3 = st.columns(3)
+    c1, c2, c3, c4 = st.columns(4)
 
     with c1:
         if st.button("🗑️ Slett siste", use_container_width=True):
@@ -1610,15 +1233,37 @@ def render_output_preview():
             st.rerun()
 
     with c3:
-        excel_buffer = generate_excel()
+        # The workbook is built only when the button is clicked (and then
+        # reused until the order changes), not on every rerun.
+        certificate_data_list = list(st.session_state.certificate_data_list)
+        order_key = order_state_key(excel_rows, certificate_data_list)
         st.download_button(
             label="⬇️ Last ned Excel",
-            data=excel_buffer,
+            data=lambda: _cached_excel(order_key, excel_rows, certificate_data_list),
             file_name=f"output_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             use_container_width=True,
         )
 
+    with c4:
+        # Just the Visma block as text: no templates, no workbook.
+        with st.popover("📋 Last ned for Visma", use_container_width=True):
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            st.download_button(
+                label="TSV (tabulator)",
+                data=lambda: core.order_text(excel_rows, "tsv"),
+                file_name=f"visma_{stamp}.tsv",
+                mime="text/tab-separated-values",
+                use_container_width=True,
+            )
+            st.download_button(
+                label="CSV (semikolon)",
+                data=lambda: core.order_text(excel_rows, "csv"),
+                file_name=f"visma_{stamp}.csv",
+                mime="text/csv",
+                use_container_width=True,
+            )
+
 
 
 # =====================================================================
@@ -1640,18 +1285,12 @@ def main():
     inject_theme()
 
     try:
-        df1, df2_all, mont_df, trykktest_df, prikling_df = load_all()
+        catalog = load_catalog()
     except Exception as e:
         st.error(f"❌ Kunne ikke laste data: {str(e)}")
         st.stop()
 
-    abs_sert_df = core.clean_columns(pd.read_excel(FIRST_FILE, sheet_name="ABS Sert."))
-    get_cert_row = make_cert_row_lookup(abs_sert_df)
-
     init_session_state()
-    # generate_excel() needs the cert lookup but takes no arguments (kept for
-    # a stable, easy-to-call signature) - stash it in session state.
-    st.session_state.get_cert_row = get_cert_row
 
     if st.session_state.get("full_abs", False):
         st.session_state.abs_selected_any = True
@@ -1671,22 +1310,23 @@ def main():
         st.session_state.pop("cert_df", None)
     if st.session_state.input_mode != "excel_batch":
         st.session_state.pop("batch_df", None)
+        st.session_state.pop("batch_order", None)
         st.divider()
 
     mode = st.session_state.input_mode
 
     if mode == "certificate":
-        render_certificate_mode(df1, df2_all, get_cert_row)
+        render_certificate_mode(catalog)
         return  # certificate mode has its own download flow; no order preview
 
     if mode == "quick":
-        render_quick_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_row)
+        render_quick_mode(catalog)
     elif mode == "full":
-        render_full_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_row)
+        render_full_mode(catalog)
     elif mode == "excel_batch":
-        render_excel_batch_mode(df1, df2_all, mont_df, trykktest_df, prikling_df, get_cert_row)
+        render_excel_batch_mode(catalog)
 
-    render_output_preview()
+    render_output_preview(catalog)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+"""Synthetic catalogs and order files for load and scale testing.
+
+    python -m synthetic MAPPE [--hoses 120] [--couplings 1900] [--orders 1] [--rows 200]
+                              [--repeat-ratio 0.2] [--miss-ratio 0.05]
+                              [--pressure-test-share 0.5] [--seed 1]
+
+Writes MAPPE/katalog/Slanger_hylser.xlsx and kuplinger_316.xlsx with the
+same sheets and columns as the real catalog (the Slange+Hylse hose sheet
+with its hylse columns, MONT, Trykktest, Prikling, ABS Sert., and one
+"Kuplinger NN(variant)" sheet per coupling set), plus for each order, in
+MAPPE:
+
+    ordre_N.xlsx       a filled MAL_slangebeskrivelse_flere_rader.xlsx
+    sertifikat_N.xlsx  the Visma lines of the same assemblies, as a filled
+                       MAL_Lim_inn_rader_for_Sertifikat.xlsx
+
+Products, codes and descriptions are invented but follow the patterns of
+the real sheets, so summary lines resolve the same way. The MONT,
+Trykktest, Prikling and ABS Sert. rows are the fixed service articles core
+looks up by number. Everything is generated from --seed, so a run can be
+repeated exactly.
+
+--repeat-ratio is the share of order rows that repeat an earlier
+assembly, --miss-ratio the share that does not resolve (unknown hose or
+coupling code, unknown hose Prod.no in the certificate input) and
+--pressure-test-share the share of assemblies with a Trykktest line in
+the certificate input. In batch orders the pressure test is an option
+for the whole order (batch_convert --trykktest), not a column.
+
+Point batch_convert (--katalog) and benchmarks (--catalog) at
+MAPPE/katalog to use the synthetic catalog.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+
+import core
+from catalog_files import FIRST_FILE, SECOND_FILE
+
+# Dimensjon code -> inch label, as in the real hose descriptions.
+SIZES = {
+    "04": '1/4"', "06": '3/8"', "08": '1/2"', "10": '5/8"', "12": '3/4"',
+    "16": '1"', "20": '1.1/4"', "24": '1.1/2"', "32": '2"',
+}
+
+HOSE_COLUMNS = [
+    "Prod.no", "Beskrivelse", "Trykk(bar)", "Stål hylse(Posd.no)", "Stål hylse(beskrivelse)",
+    "316 hylse(Posd.no)", "316 hylse(beskrivelse)", "Dimensjon", "Beskrivelse_2",
+    "Type Approval", "produsent", "Kolonne1", "Type Approval1",
+]
+# Header of MAL_slangebeskrivelse_flere_rader.xlsx; build_batch_order reads
+# the hose count from "Antall slanger" (see core.BATCH_ANTALL_COLUMNS).
+BATCH_TEMPLATE_COLUMNS = ["Slangebeskrivelse", "Lager", "Antall slanger", "POS.nr", "Kundes delnummer"]
+
+# Hose families: (code, description text, WP at 1/4" in bar, sizes,
+# ferrule series, Gates, DNV, interlock). Interlock hoses take the 5-316
+# coupling set when syrefast, and have no stål hylse.
+HOSE_FAMILIES = [
+    ("2SC", "Basic {inch} TEKNO/2SC", 400, ("04", "06", "08", "10", "12", "16", "20", "24"), "399", False, False, False),
+    ("2SN", "{inch} EN853 2SN", 400, ("04", "06", "08", "10", "12", "16", "20", "24", "32"), "399", False, True, False),
+    ("4SP", "{inch} 4SP EN 856-SAE100 R12,", 445, ("06", "08", "10", "12", "16", "20", "24"), "499", False, True, False),
+    ("4SH", "{inch} 4SH EN856", 420, ("12", "16", "20", "24", "32"), "499", False, True, False),
+    ("G1", "{inch} GATES 1SN EN 853 SN", 225, ("04", "06", "08", "10", "12", "16", "20", "24", "32"), "399", True, True, False),
+    ("M3K", "MTF {inch} MegaTuff", 210, ("04", "06", "08", "10", "12", "16", "20", "24", "32"), "398", True, True, False),
+    ("M4K", "MTF {inch} MegaTUFF", 280, ("04", "06", "08", "10", "12", "16", "20", "24", "32"), "399", True, True, False),
+    ("G5K", "{inch} GATES EFG5K", 350, ("12", "16", "20", "24", "32"), "596", True, True, True),
+    ("G6K", "{inch} GATES EFG6K", 420, ("16", "20", "24", "32"), "596", True, True, True),
+    ("ProV", "{inch} Gates Smooth EN857 2SC", 400, ("04", "06", "08", "10", "12"), "399", True, True, False),
+    ("R7", "{inch} SAE100 R7 THERMOPLAST", 190, ("04", "06", "08", "10", "12"), "394", False, False, False),
+    ("R8", "{inch} SAE100 R8 THERMOPLASTIC", 350, ("04", "06", "08", "10", "12", "16"), "394", False, False, False),
+    ("T9", "{inch} PTFE Smooth SAE100 R14 1-Braid", 160, ("04", "06", "08", "10", "12", "16"), "395", False, False, False),
+]
+
+# Coupling sets: variant -> (sizes, weight in the catalog).
+COUPLING_VARIANTS = {
+    "316": (tuple(SIZES), 1.0),
+    "st": (tuple(SIZES), 1.2),
+    "GS": (("06", "08", "10", "12", "16", "20", "24", "32"), 1.0),
+    "GSM": (("24",), 0.5),
+    "5-316": (("12", "16", "20", "24", "32"), 0.3),
+    "M-st": (("04", "06", "08", "10", "12", "16", "20"), 1.1),
+}
+
+# Coupling series (the 3xx number of the stål codes) and their end.
+END_TYPES = [
+    (301, "BSP fem."), (302, "BSP male"), (303, "BSP 90°"), (305, "BSP 90° compact"),
+    (310, "BSP taper"), (311, "NPT male"), (313, "JIC fem."), (314, "JIC male"),
+    (316, "JIC 90°"), (317, "JIC 45°"), (323, "ORFS fem."), (326, "Standpipe 90°"),
+    (328, "Standpipe"), (333, "DKOL fem."), (334, "DKOL 90°"), (336, "DKOS fem."),
+    (338, "DKOS 45°"), (339, "DKOS 90°"), (343, "SAE3000"), (346, "SAE6000"),
+    (361, "ORFS fem. 90°"), (363, "ORFS 90°"),
+]
+THREADS = ["04", "06", "08", "10", "12", "16", "20", "24", "32", "15", "18", "22", "25", "28", "30", "38", "42"]
+
+# The service articles core looks up by Prod.no (MONT_NUMBERS,
+# get_trykktest_prodno, get_prikling_row, the ABS/DNV lines).
+SUPPORT_SHEETS = {
+    "MONT": [
+        (90011, 'MONT1 1/4"-5/8" merking, plugging'),
+        (90012, 'MONT2 3/4"-1" merking, plugging'),
+        (90013, 'MONT3 1.1/4"-2" merking, plugging'),
+        (90800, "MONT INTERLOCK skive innvendig og utvendig"),
+    ],
+    "Trykktest": [
+        (90094, 'Trykktest 1/4"-1/2" 0-3m 1,5 x WP vann'),
+        (90095, 'Trykktest 5/8"-1" 0-3m 1,5 x WP vann'),
+        (90096, 'Trykktest 1.1/4"-1.1/2" 0-3m 1,5 x WP vann'),
+        (90097, 'Trykktest 2" 0-3m 1,5 x WP vann'),
+        (90098, 'Trykktest 1/4"-1/2" 3-20m 1,5 x WP vann'),
+        (90099, 'Trykktest 5/8"-1" 3-20m 1,5 x WP vann'),
+        (900101, 'Trykktest 1.1/4"-1.1/2" 3-20m 1,5 x WP vann'),
+        (900102, 'Trykktest 2" 3-20m 1,5 x WP vann'),
+        (900103, 'Trykktest 1/4"-1/2" 21-50m 1,5 x WP vann'),
+    ],
+    "Prikling": [
+        (90015, "Prikling av slange 1/4¨- 5/8¨"),
+        (90016, "Prikling av slange 3/4¨- 1¨"),
+        (90017, "Prikling av slange 1 1/4¨- 2¨"),
+    ],
+    "ABS Sert.": [
+        (90478, "ABS Sertifisering/Bevitnelse"),
+        (90003, "Rengjøring 1 propp etter påpressing, plugges"),
+    ],
+}
+
+# Generated Prod.no values run from here and must stay below
+# UNKNOWN_PROD_NO, which is where the deliberate misses start.
+FIRST_PROD_NO = 110000
+UNKNOWN_PROD_NO = 800000
+
+LENGTHS = range(300, 6001, 50)
+ANGLES = ("90", "45")
+
+
+class _ProdNos:
+    """Sequential Prod.no values for one catalog."""
+
+    def __init__(self):
+        self._next = FIRST_PROD_NO
+
+    def __call__(self):
+        prod_no = self._next
+        if prod_no >= UNKNOWN_PROD_NO:
+            raise ValueError("too many products for the synthetic Prod.no range")
+        self._next += 1
+        return prod_no
+
+
+def _hose_specs(count):
+    """(family, family code, size) for `count` hoses: every family in every
+    size it comes in, then numbered copies of the families (G1x2, M3Kx3 ...)
+    once those run out."""
+    combos = [(family, size) for family in HOSE_FAMILIES for size in family[3]]
+    specs = []
+    for n in range(count):
+        family, size = combos[n % len(combos)]
+        round_no = n // len(combos)
+        code = family[0] if round_no == 0 else f"{family[0]}x{round_no + 1}"
+        specs.append((family, code, size))
+    return sorted(specs, key=lambda spec: (spec[1], spec[2]))
+
+
+def generate_hose_sheet(count, prod_nos, rng):
+    """The Slange+Hylse sheet with `count` hoses."""
+    ferrules = {}
+
+    def ferrule(series, size, steel):
+        key = (series, size, steel)
+        if key not in ferrules:
+            inch = SIZES[size]
+            if steel:
+                ferrules[key] = (prod_nos(), f"{series}-{size} {inch} FERRULE")
+            else:
+                ferrules[key] = (prod_nos(), f"HP{series}-{size}-316 Ferrule {inch} SS316")
+        return ferrules[key]
+
+    records = []
+    for family, code, size in _hose_specs(count):
+        _, text, wp, _, series, gates, dnv, interlock = family
+        inch = SIZES[size]
+        pressure = max(20, int(wp * 4 / (3 + int(size) ** 0.5)) // 5 * 5)
+        steel_no, steel_desc = ferrule(series, size, True) if not interlock else (float("nan"), None)
+        ss_no, ss_desc = ferrule(series, size, False)
+        records.append([
+            prod_nos(),
+            f"{code}-{size} {text.format(inch=inch)} WP{pressure}bar",
+            pressure,
+            steel_no,
+            steel_desc,
+            ss_no,
+            ss_desc,
+            int(size),
+            f"{code}-{size} {inch}",
+            "DNV" if dnv else None,
+            "Gates" if gates else None,
+            5.0 if interlock else float("nan"),
+            "ABS" if gates and rng.random() < 0.8 else None,
+        ])
+    return pd.DataFrame(records, columns=HOSE_COLUMNS)
+
+
+def _coupling_code(variant, series, thread, size):
+    if variant == "316":
+        return f"HP{series}-{thread}-{size}-316"
+    if variant == "5-316":
+        return f"HP{series + 200}-{thread}-{size}-316"
+    if variant == "GS":
+        return f"GS{series + 200}-{thread}-{size}"
+    if variant == "GSM":
+        return f"GSM{series + 200}-{thread}-{size}"
+    if variant == "M-st":
+        return f"M{series}-{thread}-{size}"
+    return f"{series}-{thread}-{size}"
+
+
+def _coupling_description(variant, code, end, thread, size):
+    thread_text = SIZES.get(thread, f"M{thread}")
+    inch = SIZES[size]
+    if variant == "316":
+        return f"{code} {end} {thread_text} x {inch} SS316"
+    if variant == "5-316":
+        return f"{code} {end} {thread_text} x {inch} INTERLOCK, SS316"
+    if variant == "GS":
+        return f"{code} {end} {thread_text}X{inch}"
+    if variant == "GSM":
+        return f"{code} 1-Pcs.G5-6K {end} {thread_text}X{inch}"
+    if variant == "M-st":
+        return f"{code} {end} {thread_text}x{inch} Megacrimp"
+    return f"{code} {thread_text} {end} x {inch} HOSE"
+
+
+def generate_coupling_sheet(variant, size, count, prod_nos, rng):
+    """One "Kuplinger NN(variant)" sheet with `count` couplings, each code
+    (series, thread) used once. The known series come first; beyond them
+    the series run on from 400 as plain adapters."""
+    ends = list(END_TYPES)
+    series_no = 400
+    while len(ends) * len(THREADS) < count:
+        ends.append((series_no, "Adapter"))
+        series_no += 1
+    pairs = [(series, end, thread) for series, end in ends for thread in THREADS]
+    known = len(END_TYPES) * len(THREADS)
+    chosen = rng.sample(pairs[:known], min(count, known)) + pairs[known:count]
+    chosen.sort(key=lambda pair: (pair[0], pair[2]))
+
+    records = []
+    for series, end, thread in chosen:
+        code = _coupling_code(variant, series, thread, size)
+        records.append([prod_nos(), _coupling_description(variant, code, end, thread, size)])
+    return pd.DataFrame(records, columns=["Prod.no", "Beskrivelse"])
+
+
+def generate_catalog(hoses=120, couplings=1900, seed=1):
+    """(first_sheets, second_sheets) of a synthetic catalog, ready for
+    core.CatalogStore or write_catalog: `hoses` hoses and about
+    `couplings` couplings spread over the coupling sets."""
+    rng = random.Random(seed)
+    prod_nos = _ProdNos()
+
+    first_sheets = {"Slange+Hylse": generate_hose_sheet(hoses, prod_nos, rng)}
+    for name, rows in SUPPORT_SHEETS.items():
+        first_sheets[name] = pd.DataFrame(rows, columns=["Prod.no", "Beskrivelse"])
+
+    total_weight = sum(weight * len(sizes) for sizes, weight in COUPLING_VARIANTS.values())
+    second_sheets = {}
+    for variant, (sizes, weight) in COUPLING_VARIANTS.items():
+        per_sheet = max(2, round(couplings * weight / total_weight))
+        for size in sizes:
+            second_sheets[f"Kuplinger {size}({variant})"] = generate_coupling_sheet(
+                variant, size, per_sheet, prod_nos, rng
+            )
+    return first_sheets, second_sheets
+
+
+def write_catalog(out_dir, first_sheets, second_sheets):
+    """Write the sheets as Slanger_hylser.xlsx and kuplinger_316.xlsx in
+    `out_dir`; returns the two paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = (out_dir / FIRST_FILE.name, out_dir / SECOND_FILE.name)
+    for path, sheets in zip(paths, (first_sheets, second_sheets)):
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            for name, df in sheets.items():
+                df.to_excel(writer, sheet_name=name, index=False)
+    return paths
+
+
+# -------------------------------------------------
+# ORDERS
+# -------------------------------------------------
+
+SyntheticAssembly = namedtuple(
+    "SyntheticAssembly",
+    "hose_row coupling1_row coupling2_row sheet_name size length angle antall lager pressure_test miss",
+)
+
+
+def _material(sheet_name):
+    return "syrefast" if "316" in sheet_name else "stål"
+
+
+def _coupling_sheets_by_size(catalog):
+    by_size = {}
+    for sheet_name, df in catalog.df2_all.items():
+        m = re.match(r"Kuplinger\s+(\d{1,3})", sheet_name)
+        if m and len(df):
+            by_size.setdefault(m.group(1).zfill(2), []).append(sheet_name)
+    return by_size
+
+
+def generate_assemblies(catalog, rows=200, repeat_ratio=0.2, miss_ratio=0.05, pressure_test_share=0.5, seed=1):
+    """`rows` SyntheticAssembly picks from `catalog` (any CatalogStore, the
+    real one included): a hose with two couplings from a coupling sheet of
+    its size. A `repeat_ratio` share repeats an earlier assembly, a
+    `miss_ratio` share is marked to be written so it does not resolve."""
+    rng = random.Random(seed)
+    sheets_by_size = _coupling_sheets_by_size(catalog)
+    hoses = [
+        pos for pos, size in enumerate(catalog.df1["Dimensjon"])
+        if str(size).zfill(2) in sheets_by_size
+    ]
+    if not hoses:
+        raise ValueError("no hose in the catalog has a coupling sheet of its size")
+
+    assemblies = []
+    for _ in range(rows):
+        if assemblies and rng.random() < repeat_ratio:
+            previous = rng.choice(assemblies)
+            assemblies.append(previous._replace(
+                antall=rng.randint(1, 4), lager=rng.choice(list(core.LAGER_OPTIONS))
+            ))
+            continue
+
+        hose_row = catalog.hose_index.row(rng.choice(hoses))
+        size = str(hose_row["Dimensjon"]).zfill(2)
+        sheet_name = rng.choice(sheets_by_size[size])
+        sheet = catalog.df2_all[sheet_name]
+        coupling1_row = sheet.iloc[rng.randrange(len(sheet))]
+        coupling2_row = coupling1_row if rng.random() < 0.3 else sheet.iloc[rng.randrange(len(sheet))]
+        assemblies.append(SyntheticAssembly(
+            hose_row, coupling1_row, coupling2_row, sheet_name, size,
+            rng.choice(LENGTHS), rng.choice(ANGLES) if rng.random() < 0.15 else "",
+            rng.randint(1, 4), rng.choice(list(core.LAGER_OPTIONS)),
+            rng.random() < pressure_test_share, rng.random() < miss_ratio,
+        ))
+    return assemblies
+
+
+def assembly_summary(assembly, index):
+    """The Slangebeskrivelse a user would type for `assembly`: the hose
+    code, the length and the coupling codes shortened as in Full mode. A
+    miss gets a hose (even `index`) or Kupling 1 (odd) code that is in no
+    catalog."""
+    material = _material(assembly.sheet_name)
+    hose = str(assembly.hose_row["Beskrivelse"]).split(" ", 1)[0]
+    kupling1 = core.adjust_length(str(assembly.coupling1_row["Beskrivelse"]), material)
+    kupling2 = core.adjust_length(str(assembly.coupling2_row["Beskrivelse"]), material)
+    if assembly.miss:
+        if index % 2 == 0:
+            hose = f"ZZ{hose}"
+        else:
+            kupling1 = f"ZZ{kupling1}"
+    if kupling2 == kupling1:
+        parts = [hose, str(assembly.length), kupling1, "x2"]
+    else:
+        parts = [hose, str(assembly.length), kupling1, kupling2]
+    if assembly.angle:
+        parts.append(assembly.angle)
+    return "/".join(parts)
+
+
+def batch_order_frame(assemblies):
+    """The rows of a filled MAL_slangebeskrivelse_flere_rader.xlsx, with
+    each assembly's hose count in Antall slanger."""
+    records = []
+    for i, assembly in enumerate(assemblies):
+        records.append([
+            assembly_summary(assembly, i), assembly.lager, assembly.antall,
+            (i + 1) * 10 if i % 3 else None, f"KD-{1000 + i}" if i % 5 == 0 else None,
+        ])
+    return pd.DataFrame(records, columns=BATCH_TEMPLATE_COLUMNS, dtype=object)
+
+
+def certificate_input_frame(assemblies, catalog):
+    """The rows of a filled MAL_Lim_inn_rader_for_Sertifikat.xlsx: each
+    assembly's Visma lines (build_assembly_lines, batch layout) with a
+    Trykktest line when its pressure_test is set. As in a Visma export the
+    hose line holds the meters for all of the assembly's hoses. A miss gets
+    a hose Prod.no that is in no catalog."""
+    records = []
+    for i, assembly in enumerate(assemblies):
+        lines = core.build_assembly_lines(
+            assembly.hose_row, assembly.coupling1_row, assembly.coupling2_row,
+            assembly.sheet_name, assembly.size, assembly.length,
+            _material(assembly.sheet_name), catalog, assembly.lager,
+            antall=assembly.antall, layout="batch", summary_line=assembly_summary(assembly, i),
+            angle=assembly.angle, pressure_test=assembly.pressure_test,
+        )
+        for line in lines:
+            if line.kind == "hose":
+                line = line._replace(antall=round(assembly.length * assembly.antall / 1000, 3))
+                if assembly.miss:
+                    line = line._replace(prod_no=UNKNOWN_PROD_NO + i)
+            records.append([line.prod_no, line.beskrivelse, line.lager, line.antall])
+    return pd.DataFrame(records, columns=core.CERTIFICATE_TEMPLATE_COLUMNS, dtype=object)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m synthetic", description=__doc__.split("\n\n")[0])
+    parser.add_argument("out", help="mappe for katalog og ordrefiler")
+    parser.add_argument("--hoses", type=int, default=120, help="slanger i katalogen")
+    parser.add_argument("--couplings", type=int, default=1900, help="kuplinger i katalogen (omtrent)")
+    parser.add_argument("--orders", type=int, default=1, help="antall ordrefiler")
+    parser.add_argument("--rows", type=int, default=200, help="rader per ordre")
+    parser.add_argument("--repeat-ratio", type=float, default=0.2, help="andel rader som gjentar en tidligere slange")
+    parser.add_argument("--miss-ratio", type=float, default=0.05, help="andel rader som ikke finnes i katalogen")
+    parser.add_argument("--pressure-test-share", type=float, default=0.5, help="andel slanger med trykktest")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    first_sheets, second_sheets = generate_catalog(args.hoses, args.couplings, args.seed)
+    out_dir = Path(args.out)
+    for path in write_catalog(out_dir / "katalog", first_sheets, second_sheets):
+        print(f"Skrev {path}")
+    catalog = core.CatalogStore(first_sheets, second_sheets)
+    print(
+        f"Katalog: {len(catalog.df1)} slanger, {sum(len(df) for df in catalog.df2_all.values())} kuplinger "
+        f"i {len(catalog.df2_all)} ark ({time.perf_counter() - start:.1f} s)"
+    )
+
+    for n in range(1, args.orders + 1):
+        assemblies = generate_assemblies(
+            catalog, args.rows, args.repeat_ratio, args.miss_ratio, args.pressure_test_share,
+            seed=args.seed * 1000 + n,
+        )
+        batch_order_frame(assemblies).to_excel(out_dir / f"ordre_{n}.xlsx", index=False)
+        certificate_input_frame(assemblies, catalog).to_excel(out_dir / f"sertifikat_{n}.xlsx", index=False)
+        print(f"Skrev ordre_{n}.xlsx og sertifikat_{n}.xlsx ({len(assemblies)} slanger)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
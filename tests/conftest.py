@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to this folder.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    """The shipped catalog, loaded once for the whole run."""
+    from catalog_files import load_catalog
+
+    return load_catalog()
@@ -0,0 +1,50 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from api_server import ApiRequestHandler, PooledHTTPServer
+
+
+class BrokenHolder:
+    def get(self):
+        raise KeyError("Prod.no")
+
+
+@pytest.fixture
+def server():
+    server = PooledHTTPServer(("127.0.0.1", 0), ApiRequestHandler, threads=2, catalog_holder=BrokenHolder())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _post(server, path, body, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=5)
+    conn.putrequest("POST", path)
+    for name, value in (headers or {"Content-Length": str(len(body))}).items():
+        conn.putheader(name, value)
+    conn.endheaders()
+    conn.send(body)
+    response = conn.getresponse()
+    result = response.status, json.loads(response.read())
+    conn.close()
+    return result
+
+
+def test_negative_content_length_is_a_bad_request(server):
+    status, payload = _post(server, "/resolve", b"", {"Content-Length": "-1"})
+    assert status == 400
+    assert "Content-Length" in payload["error"]
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b"{not json", b'{"lines": "Slange 1/2"}', b'{"lines": [], "material": 3}'])
+def test_malformed_bodies_are_bad_requests(server, body):
+    assert _post(server, "/resolve", body)[0] == 400
+
+
+def test_errors_inside_a_handler_are_server_errors(server):
+    assert _post(server, "/resolve", b'{"lines": ["Slange 1/2"]}')[0] == 500
@@ -0,0 +1,24 @@
+import openpyxl
+import pandas as pd
+
+import batch_convert
+
+# Header of MAL_slangebeskrivelse_flere_rader.xlsx
+TEMPLATE_COLUMNS = ["Slangebeskrivelse", "Lager", "Antall slanger", "POS.nr", "Kundes delnummer"]
+
+
+def _output_rows(tmp_path, catalog, antall):
+    path = tmp_path / f"ordre_{antall}.xlsx"
+    pd.DataFrame(
+        [["G1-12/1000/301-12-12/302-12-12", "3", antall, "10", None]], columns=TEMPLATE_COLUMNS
+    ).to_excel(path, index=False)
+    out_path, _ = batch_convert.convert_file(path, tmp_path / "output", catalog, {}, {})
+    wb = openpyxl.load_workbook(out_path)
+    return {row[0]: row[3] for row in wb["Output"].iter_rows(min_row=2, values_only=True)}
+
+
+def test_antall_slanger_scales_the_couplings(tmp_path, catalog):
+    single = _output_rows(tmp_path, catalog, 1)
+    triple = _output_rows(tmp_path, catalog, 3)
+    for prod_no in (26036, 26054, 26094, 90012):
+        assert triple[prod_no] == 3 * single[prod_no]
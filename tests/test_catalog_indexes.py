@@ -0,0 +1,71 @@
+import random
+
+import core
+
+
+def _scan_couplings(df2_all, part3, part4):
+    """The per-sheet iterrows scan CouplingIndex.find_candidates replaced,
+    returning row positions instead of rows."""
+    part3_nodash = core._strip_dashes(part3) if part3 else None
+    part4_nodash = core._strip_dashes(part4) if part4 else None
+    candidate_sheets, candidate_sheets_single = [], []
+    for sheet_name, df in df2_all.items():
+        found1 = found2 = None
+        descs = df["Beskrivelse"].tolist() if "Beskrivelse" in df.columns else [""] * len(df)
+        for pos, desc in enumerate(descs):
+            desc_nodash = core._strip_dashes(str(desc).strip())
+            if part3_nodash and part3_nodash in desc_nodash:
+                found1 = pos
+            if part4_nodash and part4_nodash in desc_nodash:
+                found2 = pos
+            if found1 is not None and (found2 is not None or not part4):
+                break
+        if found1 is not None and found2 is not None:
+            candidate_sheets.append((sheet_name, found1, found2))
+        elif found1 is not None and not part4:
+            candidate_sheets_single.append((sheet_name, found1))
+    return candidate_sheets, candidate_sheets_single
+
+
+def _coupling_codes(df):
+    codes = set()
+    for desc in df["Beskrivelse"].dropna().astype(str):
+        code = desc.split()[0] if desc.split() else desc
+        codes.update({code, code.replace("-", ""), code[:4], desc[:12]})
+    return sorted(codes)
+
+
+def test_coupling_index_matches_the_scan(catalog):
+    rng = random.Random(0)
+    by_sheet = [_coupling_codes(df) for df in catalog.df2_all.values() if "Beskrivelse" in df.columns]
+    codes = sorted({code for sheet_codes in by_sheet for code in sheet_codes})
+    queries = [(code, None) for code in rng.sample(codes, 150)]
+    queries += [(rng.choice(codes), rng.choice(codes)) for _ in range(50)]
+    queries += [tuple(rng.choice(sheet_codes) for _ in range(2)) for sheet_codes in rng.choices(by_sheet, k=150)]
+    queries += [("301-12-12", "302-12-12"), ("GSM501-24-24", "GSM503-24-24"), ("ZZ999", None), ("3-", "-12")]
+    for part3, part4 in queries:
+        assert catalog.coupling_index.find_candidates(part3, part4) == _scan_couplings(
+            catalog.df2_all, part3, part4
+        ), (part3, part4)
+
+
+def _scan_hoses(df1, part1):
+    """The df1.iterrows() scan HoseIndex replaced, as a row position."""
+    for pos, (_, row) in enumerate(df1.iterrows()):
+        b = str(row.get("Beskrivelse", "")).strip()
+        b2 = str(row.get("Beskrivelse_2", "")).strip()
+        if b.startswith(part1) or b2.startswith(part1) or part1 in b2 or part1 in b:
+            return pos
+    return None
+
+
+def test_hose_index_matches_the_scan(catalog):
+    rng = random.Random(0)
+    texts = [
+        str(text) for column in ("Beskrivelse", "Beskrivelse_2") for text in catalog.df1[column].dropna()
+    ]
+    queries = {text.split()[0] for text in texts if text.split()}
+    queries |= {text[start:start + size] for text in rng.sample(texts, 100) for start, size in ((0, 2), (3, 5))}
+    queries |= {"G1-12", "2SC-08", "nan", "ZZG1", "1/2"}
+    for part1 in sorted(queries):
+        assert catalog.hose_index.first_position(part1) == _scan_hoses(catalog.df1, part1), part1
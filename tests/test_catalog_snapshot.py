@@ -0,0 +1,50 @@
+import logging
+
+import pandas as pd
+
+import core
+from catalog_files import FIRST_FILE, SECOND_FILE
+
+
+def _workbook(tmp_path):
+    path = tmp_path / "katalog.xlsx"
+    pd.DataFrame({
+        "Prod.no": ["26852", "26853"],
+        "Beskrivelse": ["hose", "hose 2"],
+        "Type Approval": ["DNV", None],
+    }).to_excel(path, index=False)
+    return path
+
+
+def _assert_warm_matches_cold(path, cache_dir):
+    cold = pd.read_excel(path, sheet_name=None)
+    core.read_workbook_sheets(str(path), str(cache_dir))
+    warm = core.read_workbook_sheets(str(path), str(cache_dir))
+    assert list(warm) == list(cold)
+    for name in cold:
+        pd.testing.assert_frame_equal(warm[name], cold[name])
+        # assert_frame_equal takes None for NaN; the str() that the
+        # catalog indexes use does not.
+        pd.testing.assert_frame_equal(warm[name].astype(str), cold[name].astype(str))
+
+
+def test_snapshot_keeps_blank_object_cells_as_nan(tmp_path):
+    path = _workbook(tmp_path)
+    _assert_warm_matches_cold(path, tmp_path / "cache")
+    warm = core.read_workbook_sheets(str(path), str(tmp_path / "cache"))
+    assert str(warm["Sheet1"]["Type Approval"][1]) == "nan"
+
+
+def test_catalog_snapshot_matches_the_workbooks(tmp_path):
+    for path in (FIRST_FILE, SECOND_FILE):
+        _assert_warm_matches_cold(path, tmp_path / "cache")
+
+
+def test_unwritable_cache_is_logged_and_the_sheets_returned(tmp_path, caplog):
+    path = _workbook(tmp_path)
+    blocked = tmp_path / "cache"
+    blocked.write_text("not a folder")
+    with caplog.at_level(logging.WARNING, logger="core"):
+        sheets = core.compile_workbook_snapshot(str(path), str(blocked))
+    assert sheets["Sheet1"]["Prod.no"].tolist() == [26852, 26853]
+    assert "Could not write the catalog snapshot" in caplog.text
@@ -0,0 +1,27 @@
+import pandas as pd
+
+import core
+import synthetic
+
+PRESSURE_DETAILS = {"kunde": "Kunde AS", "kundens_best_nr": "", "hydra_ordre_nr": ""}
+
+
+def _certificate(first_sheets, second_sheets, hose, coupling):
+    catalog = core.CatalogStore(first_sheets, second_sheets)
+    rows = [(hose["Prod.no"], hose["Beskrivelse"], 1), (coupling["Prod.no"], coupling["Beskrivelse"], 2)]
+    (assembly,) = core.iter_assemblies(rows)
+    return core.certificate_data_for_assembly(assembly, catalog, PRESSURE_DETAILS)
+
+
+def test_coupling_also_on_the_hose_sheet_is_still_found():
+    first_sheets, second_sheets = synthetic.generate_catalog(hoses=10, couplings=40)
+    hose = first_sheets["Slange+Hylse"].iloc[0]
+    coupling = next(iter(second_sheets.values())).iloc[0]
+    expected = _certificate(first_sheets, second_sheets, hose, coupling)
+    assert expected is not None
+
+    hose_sheet = first_sheets["Slange+Hylse"]
+    shadow = hose_sheet.iloc[[1]].assign(**{"Prod.no": coupling["Prod.no"]})
+    first_sheets["Slange+Hylse"] = pd.concat([hose_sheet, shadow], ignore_index=True)
+
+    assert _certificate(first_sheets, second_sheets, hose, coupling) == expected
@@ -0,0 +1,87 @@
+import io
+from copy import copy
+from pathlib import Path
+
+import openpyxl
+import pytest
+
+import core
+
+CERT_TEMPLATE = Path(__file__).resolve().parent.parent / "Mal Trykktest Sertikat.xlsx"
+
+
+def _certificates(count):
+    return [
+        (f"Cert_{i}", {"A16": f"G1-12/{i}/301-12-12/302-12-12", "A22": str(1000 + i), "A40": "1"})
+        for i in range(1, count + 1)
+    ]
+
+
+def _written(certificates, workers=None):
+    buffer = io.BytesIO()
+    core.write_certificate_workbook(CERT_TEMPLATE, certificates, buffer, workers=workers)
+    return buffer.getvalue()
+
+
+def test_pooled_output_matches_serial(monkeypatch):
+    certificates = _certificates(12)
+    serial = _written(certificates)
+    monkeypatch.setattr(core, "PARALLEL_MIN_CERTIFICATES", 1)
+    monkeypatch.setattr(core, "CERTIFICATE_SHARD_SIZE", 5)
+    monkeypatch.setattr(core.os, "cpu_count", lambda: 2)
+    assert _written(iter(certificates), workers=2) == serial
+
+
+def test_duplicate_sheet_names_are_caught_while_streaming():
+    consumed = []
+
+    def certificates():
+        for sheet_name, certificate_data in _certificates(3):
+            consumed.append(sheet_name)
+            yield sheet_name, certificate_data
+        yield "Cert_2", {}
+
+    with pytest.raises(ValueError, match="Duplicate sheet name: Cert_2"):
+        _written(certificates())
+    assert consumed == ["Cert_1", "Cert_2", "Cert_3"]
+
+
+def test_written_workbook_opens_with_the_stamped_values():
+    wb = openpyxl.load_workbook(io.BytesIO(_written(iter(_certificates(3)))))
+    assert wb.sheetnames == ["Cert_1", "Cert_2", "Cert_3"]
+    assert wb["Cert_2"]["A16"].value == "G1-12/2/301-12-12/302-12-12"
+
+
+def test_no_certificates_leaves_no_file(tmp_path):
+    output = tmp_path / "sertifikater.xlsx"
+    with pytest.raises(ValueError, match="No certificates to write"):
+        core.write_certificate_workbook(CERT_TEMPLATE, iter([]), output)
+    assert not output.exists()
+
+
+def test_xml_backend_matches_openpyxl_backend(catalog):
+    rows = [
+        ("26852", "hose", 2), ("26036", "c1", 2), ("26054", "c2", 2), ("1", "", None),
+        ("26852", "hose", 1), ("26036", "c1", 2), ("1", "", None),
+    ]
+    pressure_details = {"kunde": "Kunde AS", "kundens_best_nr": "B-1", "hydra_ordre_nr": "H-2"}
+    certificates = list(core.iter_certificates(rows, catalog, pressure_details))
+    assert len(certificates) == 2
+
+    xml_wb, reference_wb = (
+        openpyxl.load_workbook(io.BytesIO(core.build_certificate_workbook(CERT_TEMPLATE, certificates, backend)))
+        for backend in ("xml", "openpyxl")
+    )
+    assert xml_wb.sheetnames == reference_wb.sheetnames
+    for name in reference_wb.sheetnames:
+        xml_ws, reference_ws = xml_wb[name], reference_wb[name]
+        assert {str(r) for r in xml_ws.merged_cells.ranges} == {str(r) for r in reference_ws.merged_cells.ranges}
+        assert len(xml_ws._images) == len(reference_ws._images)
+        for xml_row, reference_row in zip(xml_ws.iter_rows(), reference_ws.iter_rows(), strict=True):
+            for xml_cell, reference_cell in zip(xml_row, reference_row, strict=True):
+                assert xml_cell.value == reference_cell.value, xml_cell.coordinate
+                assert copy(xml_cell.border) == copy(reference_cell.border), xml_cell.coordinate
+                # Fonts are not compared: the xml backend keeps the
+                # template's styles.xml, so untouched cells use its default
+                # font (Aptos Narrow), where the openpyxl backend writes
+                # openpyxl's Calibri (see write_certificate_workbook).
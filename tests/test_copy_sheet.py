@@ -0,0 +1,67 @@
+from copy import copy
+from pathlib import Path
+
+import openpyxl
+import pytest
+
+import core
+
+ROOT = Path(__file__).resolve().parent.parent
+TEMPLATES = [ROOT / "Mal Trykktest Sertikat.xlsx", ROOT / "Mal sluttkontroll slanger.xlsx"]
+STYLE_ATTRIBUTES = ("font", "border", "fill", "number_format", "protection", "alignment")
+
+
+def _reference_copy(source_ws, target_wb, target_sheet_name):
+    """The per-cell copy copy_sheet_with_formatting replaced."""
+    target_ws = target_wb.create_sheet(target_sheet_name)
+    for row in source_ws.iter_rows():
+        for source_cell in row:
+            target_cell = target_ws[source_cell.coordinate]
+            target_cell.value = source_cell.value
+            if source_cell.has_style:
+                for name in STYLE_ATTRIBUTES:
+                    setattr(target_cell, name, copy(getattr(source_cell, name)))
+    for merged_range in source_ws.merged_cells.ranges:
+        target_ws.merge_cells(str(merged_range))
+    for col_letter, col_dimension in source_ws.column_dimensions.items():
+        target_ws.column_dimensions[col_letter].width = col_dimension.width
+    for row_num, row_dimension in source_ws.row_dimensions.items():
+        target_ws.row_dimensions[row_num].height = row_dimension.height
+    for image in source_ws._images:
+        target_ws.add_image(copy(image), image.anchor)
+    return target_ws
+
+
+def _cells(ws):
+    return {
+        cell.coordinate: (cell.value, *(copy(getattr(cell, name)) for name in STYLE_ATTRIBUTES))
+        for row in ws.iter_rows() for cell in row
+    }
+
+
+def _anchor(image):
+    marker = image.anchor._from
+    return marker.col, marker.colOff, marker.row, marker.rowOff
+
+
+@pytest.mark.parametrize("template", TEMPLATES, ids=lambda path: path.stem)
+def test_clones_match_the_per_cell_copy(template):
+    source_wb = openpyxl.load_workbook(template)
+    source_name = source_wb.sheetnames[0]
+    cloned_wb, reference_wb = openpyxl.Workbook(), openpyxl.Workbook()
+    for i in range(3):
+        cloned = core.copy_sheet_with_formatting(source_wb, source_name, cloned_wb, f"Ark {i}")
+        reference = _reference_copy(source_wb[source_name], reference_wb, f"Ark {i}")
+
+        assert _cells(cloned) == _cells(reference)
+        assert {str(r) for r in cloned.merged_cells.ranges} == {str(r) for r in reference.merged_cells.ranges}
+        assert {k: d.width for k, d in cloned.column_dimensions.items()} == {
+            k: d.width for k, d in reference.column_dimensions.items()
+        }
+        assert {k: d.height for k, d in cloned.row_dimensions.items()} == {
+            k: d.height for k, d in reference.row_dimensions.items()
+        }
+        assert [_anchor(image) for image in cloned._images] == [_anchor(image) for image in reference._images]
+        assert [(image.width, image.height) for image in cloned._images] == [
+            (image.width, image.height) for image in reference._images
+        ]
@@ -0,0 +1,49 @@
+import io
+from datetime import date, datetime
+
+import numpy as np
+import openpyxl
+import pytest
+from openpyxl.utils.exceptions import IllegalCharacterError
+
+import core
+
+
+def _reloaded(save):
+    buffer = io.BytesIO()
+    save(buffer)
+    buffer.seek(0)
+    ws = openpyxl.load_workbook(buffer)["Output"]
+    return [[cell.value for cell in row] for row in ws.iter_rows()], ws
+
+
+def _streamed(rows):
+    return _reloaded(lambda buffer: core.save_output_workbook(core.create_output_workbook(), buffer, rows))
+
+
+def test_streamed_rows_read_back_like_openpyxl_rows():
+    rows = [
+        ["1", "G1-12/1000/301-12-12/302-12-12", "3", 1],
+        [26852, 'G1-12 3/4" <Gates> & co', "3", 1.5],
+        [np.int64(28437), "tab\tand\nnewline", np.float64(2.0), np.bool_(True)],
+        ["", None, "5", -4],
+        [datetime(2026, 3, 1, 12, 30), date(2026, 3, 2), False, "  "],
+    ]
+    expected, expected_ws = _reloaded(core.create_output_workbook(rows).save)
+    streamed, streamed_ws = _streamed(rows)
+
+    assert streamed == expected
+    assert streamed_ws["A6"].number_format == expected_ws["A6"].number_format
+    assert streamed_ws["B6"].number_format == expected_ws["B6"].number_format
+
+
+def test_nan_is_written_as_an_empty_cell():
+    streamed, _ = _streamed([[float("nan"), "x", np.float64("nan"), None]])
+    assert streamed[1] == [None, "x", None, None]
+
+
+def test_illegal_characters_raise_like_openpyxl():
+    with pytest.raises(IllegalCharacterError):
+        core.create_output_workbook([["1", "bad\x0bline", "3", 1]])
+    with pytest.raises(IllegalCharacterError):
+        _streamed([["1", "bad\x0bline", "3", 1]])
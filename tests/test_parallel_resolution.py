@@ -0,0 +1,30 @@
+import pandas as pd
+
+import core
+import synthetic
+
+
+def _comparable(resolved):
+    return [
+        [(value.name, value.astype(str).to_dict()) if isinstance(value, pd.Series) else value for value in record]
+        for record in resolved.itertuples(index=True, name=None)
+    ]
+
+
+def test_parallel_resolution_equals_serial(catalog, monkeypatch):
+    assemblies = synthetic.generate_assemblies(catalog, rows=120, miss_ratio=0.1, seed=5)
+    lines = [synthetic.assembly_summary(assembly, i) for i, assembly in enumerate(assemblies)]
+    lines += ["", "nan", None, "G1-12 uten skråstrek", lines[0]]
+
+    core.clear_summary_cache()
+    serial = core.find_matches_for_many(lines, catalog)
+
+    monkeypatch.setattr(core, "PARALLEL_MIN_LINES", 1)
+    monkeypatch.setattr(core.os, "cpu_count", lambda: 2)
+    core.clear_summary_cache()
+    parallel = core.find_matches_for_many(lines, catalog, workers=2)
+
+    assert core.summary_cache_info()["size"] > 0
+    assert list(parallel.columns) == list(serial.columns)
+    assert _comparable(parallel) == _comparable(serial)
+    assert set(serial["status"]) >= {"ok", "empty", "no_hose"}
@@ -0,0 +1,82 @@
+import re
+
+import pytest
+
+import core
+
+
+def _split_parse(first_line):
+    """The str.split("/") parsing parse_summary_line replaced:
+    (hose, length text, length, Kupling 1, Kupling 2, angle)."""
+    part1 = part2 = part3 = part4 = angle = None
+    parts = first_line.strip().replace("°", "").split("/")
+    if len(parts) >= 4:
+        part1, part2, part3, part4 = parts[:4]
+        if len(parts) >= 5:
+            angle = parts[4]
+    else:
+        if len(parts) >= 2:
+            part1, part2 = parts[0], parts[1]
+        if len(parts) >= 3:
+            part3 = parts[2]
+    try:
+        length = int(re.sub(r"\D", "", part2)) if part2 is not None else None
+    except Exception:
+        length = None
+    if part3 and len(part3) > 2 and part3[-2:].lower() == "x2":
+        part3 = part3[:-2].rstrip("- ")
+    if part4 and part4.strip().lower() == "x2":
+        part4 = None
+    return part1, part2, length, part3, part4, angle
+
+
+LINES = [
+    "G1-12/1000/301-12-12/302-12-12",
+    "G12-24/1000/3011212/3021212/90°",
+    "G12-24/1000/3011212/3021212/45/extra",
+    "2SC-08 Basic/500/HP301-08-08-316x2",
+    "2SC-08 Basic/500/HP301-08-08-316-X2",
+    "2SC-08 Basic/500/HP301-08-08-316/x2",
+    "2SC-08 Basic/500/HP301-08-08-316/ X2 ",
+    "2SC-08 Basic/500/HP301-08-08-316/x2/90",
+    "G1-12/1000/x2",
+    "G1-12/1000/1x2/302-12-12",
+    "G1-12/2000°/301-12-12",
+    "G1-12/ca. 1,5 m/301-12-12",
+    "G1-12/1000",
+    "G1-12/",
+    "G1-12",
+    "",
+    "   ",
+    "///",
+    "G1-12/1000//302-12-12",
+    "G1-12/1000/301-12-12/",
+]
+
+
+@pytest.mark.parametrize("line", LINES)
+def test_parser_matches_the_split_code(line):
+    parsed = core.parse_summary_line(line)
+    assert (
+        parsed.hose, parsed.length_text, parsed.length, parsed.kupling1, parsed.kupling2, parsed.angle
+    ) == _split_parse(line)
+
+
+@pytest.mark.parametrize("line, doubled", [
+    ("2SC-08/500/HP301-08-08x2", True),
+    ("2SC-08/500/HP301-08-08/X2", True),
+    ("2SC-08/500/HP301-08-08/HP302-08-08", False),
+    ("2SC-08/500/x2", False),
+])
+def test_x2_marks_the_coupling_as_doubled(line, doubled):
+    assert core.parse_summary_line(line).doubled is doubled
+
+
+def test_no_slash_has_no_fields():
+    parsed = core.parse_summary_line("G1-12 1000 301-12-12")
+    assert (parsed.hose, parsed.length, parsed.kupling1, parsed.doubled) == (None, None, None, False)
+
+
+def test_parsed_summary_is_immutable():
+    with pytest.raises(AttributeError):
+        core.parse_summary_line("G1-12/1000").hose = "G2"
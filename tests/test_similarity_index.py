@@ -0,0 +1,47 @@
+import itertools
+import threading
+
+import core
+
+
+def _index(count):
+    return core.SimilarityIndex([(("G1-12 slange",), {"Prod.no": str(i)}) for i in range(count)] + [
+        (("301-12-12 kupling",), {"Prod.no": "kupling"}),
+    ])
+
+
+def test_best_match_first():
+    index = _index(3)
+    assert index.search("301-12-12", k=1)[0]["Prod.no"] == "kupling"
+
+
+def test_budget_is_checked_inside_a_posting_list(monkeypatch):
+    index = _index(2000)
+    clock = itertools.count(step=0.010)
+    monkeypatch.setattr(core.time, "perf_counter", lambda: next(clock))
+    # 25 ms budget, 10 ms per look at the clock: counting stops at 12.5 ms,
+    # after one stride.
+    results = index.search("g1-12", k=5000, budget_ms=25.0)
+    assert 0 < len(results) <= core.SimilarityIndex._BUDGET_STRIDE
+
+
+def test_budget_is_checked_while_scoring(monkeypatch):
+    index = _index(2000)
+    stride = core.SimilarityIndex._BUDGET_STRIDE
+    grams = [gram for gram in core._trigrams("g112") if gram in index._postings]
+    counting_looks = sum(-(-len(index._postings[gram]) // stride) for gram in grams)
+    # The clock stands still until every posting list is counted, then
+    # jumps past the deadline: only the first stride is scored.
+    looks = itertools.count()
+    monkeypatch.setattr(core.time, "perf_counter", lambda: 0.0 if next(looks) <= counting_looks else 1.0)
+    results = index.search("g112", k=5000, budget_ms=25.0)
+    assert 0 < len(results) <= stride
+
+
+def test_loaded_catalog_builds_its_suggestion_indexes_up_front(tmp_path):
+    from catalog_files import FIRST_FILE, SECOND_FILE
+
+    catalog = core.CatalogStore.load(str(FIRST_FILE), str(SECOND_FILE), cache_dir=str(tmp_path))
+    builder = next(t for t in threading.enumerate() if t.name == "suggestion-indexes")
+    builder.join(timeout=30)
+    assert set(catalog._suggestion_indexes) == {"hose", "coupling"}
@@ -0,0 +1,31 @@
+import core
+
+LINE = "G1-12/1000/301-12-12/302-12-12"
+
+
+def test_new_catalog_version_drops_cached_results():
+    cache = core.SummaryCache()
+    assert cache.get("line", "v1") is None
+    cache.put("line", "v1", "old result")
+    assert cache.get("line", "v1") == "old result"
+    assert cache.get("line", "v2") is None
+    cache.put("line", "v1", "late result for the old catalog")
+    assert cache.info()["size"] == 0
+
+
+def test_changed_catalog_is_not_served_from_the_cache(catalog):
+    core.clear_summary_cache()
+    before = core.find_matches_from_summary(LINE, catalog.df1, catalog.df2_all, catalog=catalog)
+    assert core.find_matches_from_summary(LINE, catalog.df1, catalog.df2_all, catalog=catalog) is before
+    assert core.summary_cache_info()["hits"] == 1
+
+    first_sheets = dict(catalog.first_sheets)
+    hose_sheet = catalog.df1.copy()
+    hose_sheet.loc[hose_sheet["Prod.no"] == before[0]["Prod.no"], "Prod.no"] = 99999
+    first_sheets[catalog.hose_sheet_name] = hose_sheet
+    changed = core.CatalogStore(first_sheets, catalog.df2_all)
+    assert changed.version != catalog.version
+
+    after = core.find_matches_from_summary(LINE, changed.df1, changed.df2_all, catalog=changed)
+    assert after[0]["Prod.no"] == 99999
+    assert after[3] == before[3]
@@ -0,0 +1,30 @@
+import core
+import synthetic
+
+
+def _catalog_and_assemblies():
+    catalog = core.CatalogStore(*synthetic.generate_catalog(hoses=40, couplings=300, seed=3))
+    assemblies = synthetic.generate_assemblies(catalog, rows=40, miss_ratio=0.0, pressure_test_share=1.0, seed=3)
+    return catalog, assemblies
+
+
+def test_order_and_certificate_input_agree_on_quantities():
+    catalog, assemblies = _catalog_and_assemblies()
+    assert len({assembly.antall for assembly in assemblies}) > 1
+
+    order = core.build_batch_order(synthetic.batch_order_frame(assemblies), catalog, trykktest=True)
+    certificate_rows = synthetic.certificate_input_frame(assemblies, catalog).itertuples(index=False, name=None)
+    certificates = core.iter_certificates(
+        ((prod_no, beskrivelse, antall) for prod_no, beskrivelse, _, antall in certificate_rows), catalog, {}
+    )
+
+    from_order = [data["A40"] for data in order.certificates]
+    from_input = [data["A40"] for _, data in certificates]
+    assert from_order == from_input == [str(assembly.antall) for assembly in assemblies]
+
+
+def test_order_lines_carry_the_hose_count():
+    catalog, assemblies = _catalog_and_assemblies()
+    order = core.build_batch_order(synthetic.batch_order_frame(assemblies), catalog)
+    mont_quantities = [line.antall for line in order.lines if line.kind == "mont"]
+    assert mont_quantities == [assembly.antall for assembly in assemblies]